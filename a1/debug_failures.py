@@ -8,12 +8,12 @@ import os
 import sys
 import json
 import pathlib
-import time
 from typing import List, Dict, Any
 
 # Import evaluation functions
 sys.path.append(str(pathlib.Path(__file__).parent.parent / 'eval'))
-from model_clients import ModelConfig, get_client
+from model_clients import ModelConfig, get_client, configure_rate_limit
+from sandbox import load_test_runner
 
 def load_failed_problems():
     """Load the failed problems from the evaluation results."""
@@ -113,11 +113,9 @@ def debug_problem(problem_data: Dict[str, Any], strategy: str = "debug") -> Dict
 
 def test_corrected_code(problem_name: str, corrected_code: str) -> tuple[bool, List[str]]:
     """Test the corrected code against the test suite."""
-    # Load test runner
+    # Load test runner (compiled once per suite)
     test_path = pathlib.Path(__file__).parent.parent / "tests" / f"test_{problem_name}.py"
-    spec = importlib.util.spec_from_file_location(test_path.stem, str(test_path))
-    mod = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(mod)
+    run_tests = load_test_runner(test_path)
     
     # Execute corrected code
     ns = {}
@@ -130,7 +128,7 @@ def test_corrected_code(problem_name: str, corrected_code: str) -> tuple[bool, L
     
     # Run tests
     try:
-        passed, failures = mod.run_tests(ns[func_name])
+        passed, failures = run_tests(ns[func_name])
         return passed, failures
     except Exception as e:
         return False, [f"Test execution error: {e}"]
@@ -146,6 +144,8 @@ def main():
         print("Error: GOOGLE_API_KEY not set!")
         return False
     
+    configure_rate_limit("google", rpm=5)
+    
     # Load failed problems
     failed_problems = load_failed_problems()
     print(f"Found {len(failed_problems)} failed problems to debug")
@@ -174,11 +174,6 @@ def main():
             print(f"❌ Corrected code still fails {len(failures)} tests:")
             for failure in failures:
                 print(f"  - {failure}")
-        
-        # Rate limiting
-        if i < len(failed_problems) - 1:
-            print("Waiting 12 seconds for rate limiting...")
-            time.sleep(12)
     
     # Save debug results
     with open("generated/debug_results.json", "w") as f:
@@ -193,6 +188,5 @@ def main():
     return True
 
 if __name__ == "__main__":
-    import importlib.util
     success = main()
     sys.exit(0 if success else 1)
@@ -8,12 +8,12 @@ import os
 import sys
 import json
 import pathlib
-import time
 from typing import List, Dict, Any
 
 # Import evaluation functions
 sys.path.append(str(pathlib.Path(__file__).parent.parent / 'eval'))
-from model_clients import ModelConfig, get_client
+from model_clients import ModelConfig, get_client, configure_rate_limit
+from sandbox import load_test_runner
 
 def create_test_driven_prompt(problem_spec: str) -> str:
     """Create a test-driven development prompt."""
@@ -157,9 +157,7 @@ def test_innovation_strategy(problem_name: str, strategy_name: str) -> Dict[str,
     
     # Test the code
     test_path = pathlib.Path(__file__).parent.parent / "tests" / f"test_{problem_name}.py"
-    spec = importlib.util.spec_from_file_location(test_path.stem, str(test_path))
-    mod = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(mod)
+    run_tests = load_test_runner(test_path)
     
     # Execute code
     ns = {}
@@ -190,7 +188,7 @@ def test_innovation_strategy(problem_name: str, strategy_name: str) -> Dict[str,
         }
     
     try:
-        passed, failures = mod.run_tests(ns[func_name])
+        passed, failures = run_tests(ns[func_name])
         return {
             "strategy": strategy_name,
             "problem": problem_name,
@@ -223,6 +221,8 @@ def compare_strategies():
         print("Error: GOOGLE_API_KEY not set!")
         return False
     
+    configure_rate_limit("google", rpm=5)
+    
     # Test problems (select a few representative ones)
     test_problems = ["cosine_similarity", "normalize_path", "top_k_frequent"]
     strategies = ["test_driven", "divide_conquer"]
@@ -242,9 +242,6 @@ def compare_strategies():
                 print(f"❌ {strategy}: FAILED ({len(result['failures'])} failures)")
                 for failure in result['failures'][:3]:  # Show first 3 failures
                     print(f"    - {failure}")
-            
-            # Rate limiting
-            time.sleep(12)
     
     # Save results
     with open("generated/innovation_results.json", "w") as f:
@@ -276,6 +273,5 @@ def main():
     return compare_strategies()
 
 if __name__ == "__main__":
-    import importlib.util
     success = main()
     sys.exit(0 if success else 1)
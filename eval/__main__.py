@@ -0,0 +1,20 @@
+"""python -m eval [run] [sweep.json] [flags] | python -m eval {problems,summary,latency,cases} [flags]"""
+import sys, pathlib
+
+# the eval modules import each other by plain name, as the scripts that put eval/ on sys.path do
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+
+REPORT_COMMANDS = ("problems", "summary", "latency", "cases")
+
+def main(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if argv and argv[0] in REPORT_COMMANDS:
+        import report
+        return report.main(argv)
+    if argv and argv[0] == "run":
+        argv = argv[1:]
+    import run_eval
+    return run_eval.main(argv)
+
+if __name__ == "__main__":
+    main()
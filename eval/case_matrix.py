@@ -0,0 +1,83 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+import numpy as np
+
+# Status codes in the matrix; 0 means the case didn't run for that sample (another problem's case,
+# or one skipped by fail-fast). Every code from "fail" up counts as a failure.
+STATUS_CODES = {"pass": 1, "fail": 2, "error": 3, "timeout": 4}
+ROW_FIELDS = ("model", "strategy", "problem")
+
+@dataclass
+class CaseMatrix:
+    """Per-case outcomes of every tested candidate in a sweep: one row per candidate, one column per case.
+
+    Rows are integer codes into the models/strategies/problems vocabularies,
+    status is uint8 (STATUS_CODES) and seconds float32, so a sweep of many
+    thousands of candidates loads and aggregates in milliseconds. A candidate
+    whose suite never ran (it didn't load, timed out or crashed) counts as an
+    error on every case of its problem.
+    """
+    vocab: Dict[str, List[str]]    # ROW_FIELDS -> names
+    row_codes: np.ndarray          # (rows, 4) int32: model, strategy, problem, sample (or repair round)
+    columns: List[Tuple[str, str]] # (problem, case_id)
+    status: np.ndarray             # (rows, columns) uint8
+    seconds: np.ndarray            # (rows, columns) float32
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> "CaseMatrix":
+        """Build from results.jsonl records (their history entries carry the case rows)."""
+        vocab: Dict[str, Dict[str, int]] = {f: {} for f in ROW_FIELDS}
+        codes, entries = [], []
+        col_of: Dict[Tuple[str, str], int] = {}
+        for r in records:
+            names = (f"{r['model']['provider']}:{r['model']['model']}", r["strategy"], r["problem"])
+            row = [vocab[f].setdefault(name, len(vocab[f])) for f, name in zip(ROW_FIELDS, names)]
+            for j, h in enumerate(r["history"]):
+                codes.append(row + [j])
+                entries.append((r["problem"], h.get("cases")))
+                for case in h.get("cases") or []:
+                    col_of.setdefault((r["problem"], case[0]), len(col_of))
+        status = np.zeros((len(codes), len(col_of)), dtype=np.uint8)
+        seconds = np.zeros((len(codes), len(col_of)), dtype=np.float32)
+        problem_cols: Dict[str, List[int]] = {}
+        for (problem, _), c in col_of.items():
+            problem_cols.setdefault(problem, []).append(c)
+        for i, (problem, cases) in enumerate(entries):
+            if cases is None:
+                status[i, problem_cols.get(problem, [])] = STATUS_CODES["error"]
+                continue
+            for case_id, name, secs, *_ in cases:
+                c = col_of[(problem, case_id)]
+                status[i, c] = STATUS_CODES[name]
+                seconds[i, c] = secs
+        return cls({f: list(v) for f, v in vocab.items()}, np.array(codes, dtype=np.int32).reshape(-1, 4),
+                   list(col_of), status, seconds)
+
+    def save(self, path: str):
+        # uncompressed: loading is a straight read, which matters more than a few MB on disk
+        np.savez(path, status=self.status, seconds=self.seconds, row_codes=self.row_codes,
+                 column_problems=np.array([p for p, _ in self.columns], dtype=str),
+                 column_cases=np.array([c for _, c in self.columns], dtype=str),
+                 **{f"vocab_{f}": np.array(self.vocab[f], dtype=str) for f in ROW_FIELDS})
+
+    @classmethod
+    def load(cls, path: str) -> "CaseMatrix":
+        with np.load(path) as f:
+            return cls({k: f[f"vocab_{k}"].tolist() for k in ROW_FIELDS}, f["row_codes"],
+                       list(zip(f["column_problems"].tolist(), f["column_cases"].tolist())), f["status"], f["seconds"])
+
+    def failure_rates(self, by: str = "model") -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Per value of `by` (a ROW_FIELDS name) and column: (names, failure rate, candidates that ran the case).
+
+        Rates are NaN where no candidate of the group ran the case.
+        """
+        groups = self.row_codes[:, ROW_FIELDS.index(by)]
+        names = self.vocab[by]
+        ran = np.zeros((len(names), len(self.columns)), dtype=np.int64)
+        failed = np.zeros_like(ran)
+        for g in range(len(names)):
+            block = self.status[groups == g]
+            ran[g] = (block > 0).sum(axis=0)
+            failed[g] = (block >= STATUS_CODES["fail"]).sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return names, failed / ran, ran
@@ -0,0 +1,89 @@
+import os, json, hashlib, threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+Key = Tuple[str, str, str, int]
+
+# model dict fields that pace requests but don't change what the model answers
+_PACING_FIELDS = {"provider", "model", "rpm", "tpm", "max_concurrency"}
+
+def model_key(model_dict: Dict[str, Any]) -> str:
+    """provider:model, plus a hash of the settings that change its answers (temperature, options, ...).
+
+    Two sweep cells with the same model but different settings get different
+    keys; a model dict with no such settings keeps the plain key.
+    """
+    base = f"{model_dict['provider']}:{model_dict['model']}"
+    settings = {k: v for k, v in model_dict.items() if k not in _PACING_FIELDS and v is not None}
+    if not settings:
+        return base
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    return f"{base}#{digest}"
+
+class CheckpointLog:
+    """Append-only JSONL log of finished samples, keyed by (model, strategy, problem, sample).
+
+    Every entry is flushed and fsync'd before record() returns, so a crash loses
+    at most the sample that was being written; a torn last line is ignored on
+    load and cut off before a resumed run appends. Opening without resume
+    truncates the log.
+    """
+    def __init__(self, path: str, resume: bool = False):
+        self.path = str(path)
+        self.done: Dict[Key, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)) or ".", exist_ok=True)
+        if resume and os.path.exists(self.path):
+            self._drop_torn_tail(self.path)
+            for entry in self.read(self.path):
+                self.done[self.key(entry["model"], entry["strategy"], entry["problem"], entry["sample"])] = entry
+        self._f = open(self.path, "a" if resume else "w")
+
+    @staticmethod
+    def _drop_torn_tail(path: str, block: int = 1 << 16):
+        """Cut a line left half-written by a crash, so the next record starts on a line of its own."""
+        with open(path, "rb+") as f:
+            end = f.seek(0, os.SEEK_END)
+            pos = end
+            while pos > 0:
+                start = max(0, pos - block)
+                f.seek(start)
+                newline = f.read(pos - start).rfind(b"\n")
+                if newline >= 0:
+                    pos = start + newline + 1
+                    break
+                pos = start
+            if pos < end:
+                f.truncate(pos)
+
+    @staticmethod
+    def read(path: str) -> Iterator[Dict[str, Any]]:
+        with open(path) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn write from a crash
+
+    @staticmethod
+    def key(model_dict: Dict[str, Any], strategy: str, problem: str, sample: int) -> Key:
+        return (model_key(model_dict), strategy, problem, sample)
+
+    def get(self, model_dict: Dict[str, Any], strategy: str, problem: str, sample: int) -> Optional[Dict[str, Any]]:
+        return self.done.get(self.key(model_dict, strategy, problem, sample))
+
+    def samples(self, model_dict: Dict[str, Any], strategy: str, problem: str, n: int) -> List[Optional[Dict[str, Any]]]:
+        """Entries for samples 0..n-1 of a cell, None where a sample has not finished."""
+        return [self.get(model_dict, strategy, problem, j) for j in range(n)]
+
+    def record(self, model_dict: Dict[str, Any], strategy: str, problem: str, sample: int, **fields):
+        entry = {"model": model_dict, "strategy": strategy, "problem": problem, "sample": sample, **fields}
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            self._f.write(line)
+            self._f.flush()
+            os.fsync(self._f.fileno())
+            self.done[self.key(model_dict, strategy, problem, sample)] = entry
+
+    def close(self):
+        with self._lock:
+            self._f.close()
@@ -0,0 +1,182 @@
+import os, ast, json, asyncio, hashlib, sqlite3, threading, functools, pathlib
+from typing import Dict, List, Optional, Tuple
+
+Result = Tuple[bool, List[str], Optional[List[list]]]  # (passed, failures, per-case rows), as sandbox.Result
+
+# Outcomes that depend on machine load rather than on the code; never reuse them.
+_FLAKY_PREFIXES = ("Timed out", "Sandbox worker crashed", "Exceeded CPU limit")
+
+def _strip_docstrings(tree: ast.AST) -> ast.AST:
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            body = node.body
+            if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+                    and isinstance(body[0].value.value, str):
+                node.body = body[1:] or [ast.Pass()]
+    return tree
+
+def normalize_code(code: str) -> str:
+    """Canonical form of a candidate: its AST without docstrings, comments or formatting.
+
+    Code that doesn't parse falls back to its stripped source, so identical
+    broken candidates still collapse together.
+    """
+    try:
+        tree = _strip_docstrings(ast.parse(code))
+    except (SyntaxError, ValueError):
+        return code.strip()
+    return ast.dump(tree, annotate_fields=False, include_attributes=False)
+
+def candidate_hash(code: str) -> str:
+    return hashlib.sha256(normalize_code(code).encode("utf-8")).hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def _file_hash(path: str, mtime_ns: int) -> str:
+    return hashlib.sha256(pathlib.Path(path).read_bytes()).hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def _local_imports(path: str, mtime_ns: int) -> Tuple[str, ...]:
+    """Modules next to `path` that it imports, as file paths (tests/harness.py for the suites)."""
+    try:
+        tree = ast.parse(pathlib.Path(path).read_bytes())
+    except (SyntaxError, ValueError):
+        return ()
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split(".")[0])
+    folder = os.path.dirname(path)
+    return tuple(sorted(p for p in (os.path.join(folder, f"{name}.py") for name in names) if os.path.isfile(p)))
+
+def suite_hash(test_path) -> str:
+    """Version of a test suite: the hash of its file and of the sibling modules it imports, transitively."""
+    todo, seen, parts = [os.path.abspath(str(test_path))], set(), []
+    while todo:
+        path = todo.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        mtime_ns = os.stat(path).st_mtime_ns
+        parts.append(f"{os.path.basename(path)}:{_file_hash(path, mtime_ns)}")
+        todo.extend(_local_imports(path, mtime_ns))
+    return hashlib.sha256("\n".join(sorted(parts)).encode("utf-8")).hexdigest()
+
+class VerdictCache:
+    """Persistent (suite hash, function, candidate hash) -> (passed, failures, case rows) store in SQLite."""
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS verdicts (
+            suite TEXT, func TEXT, candidate TEXT, passed INTEGER, failures TEXT, cases TEXT,
+            PRIMARY KEY (suite, func, candidate))""")
+        if "cases" not in [row[1] for row in self._db.execute("PRAGMA table_info(verdicts)")]:
+            self._db.execute("ALTER TABLE verdicts ADD COLUMN cases TEXT")  # caches from before per-case results
+        self._db.commit()
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[Result]:
+        with self._lock:
+            row = self._db.execute("SELECT passed, failures, cases FROM verdicts WHERE suite=? AND func=? AND candidate=?", key).fetchone()
+        return (bool(row[0]), json.loads(row[1]), json.loads(row[2]) if row[2] else None) if row else None
+
+    def put(self, key: Tuple[str, str, str], result: Result):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO verdicts (suite, func, candidate, passed, failures, cases) VALUES (?,?,?,?,?,?)",
+                             (*key, int(result[0]), json.dumps(result[1]), json.dumps(result[2]) if result[2] is not None else None))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+class DedupExecutor:
+    """Front for a SandboxPool that executes each distinct candidate once per test-suite version.
+
+    Candidates are compared by normalize_code, so samples that differ only in
+    comments, docstrings or formatting share one execution. Verdicts are reused
+    from memory, then from the persistent VerdictCache (shared across models and
+    runs), and concurrent duplicates wait on the one execution in flight.
+    """
+    def __init__(self, pool, verdicts: Optional[VerdictCache] = None):
+        self.pool = pool
+        self.verdicts = verdicts
+        self.workers = pool.workers
+        self._memo: Dict[Tuple[str, str, str], Result] = {}
+        self._inflight: Dict[Tuple[str, str, str], "asyncio.Future[Result]"] = {}
+        self.executed = 0
+        self.reused = 0
+
+    def _key(self, code: str, func_name: str, test_path) -> Tuple[str, str, str]:
+        suite = suite_hash(test_path)
+        variant = getattr(self.pool, "variant", "")
+        # a fail-fast verdict lists only the first failing case, so it can't stand in for a full one
+        return (f"{suite};{variant}" if variant else suite, func_name, candidate_hash(code))
+
+    def _known(self, key) -> Optional[Result]:
+        result = self._memo.get(key)
+        if result is None and self.verdicts is not None:
+            result = self.verdicts.get(key)
+            if result is not None:
+                self._memo[key] = result
+        return result
+
+    def _store(self, key, result: Result):
+        if result[1] and result[1][0].startswith(_FLAKY_PREFIXES):
+            return
+        if any(case[1] == "timeout" for case in result[2] or []):
+            return
+        self._memo[key] = result
+        if self.verdicts is not None:
+            self.verdicts.put(key, result)
+
+    def run(self, code: str, func_name: str, test_path, timeout: Optional[float] = None) -> Result:
+        key = self._key(code, func_name, test_path)
+        result = self._known(key)
+        if result is not None:
+            self.reused += 1
+            return result
+        result = self.pool.run(code, func_name, test_path, timeout)
+        self.executed += 1
+        self._store(key, result)
+        return result
+
+    def map(self, codes: List[str], func_name: str, test_path, timeout: Optional[float] = None) -> List[Result]:
+        keys = [self._key(c, func_name, test_path) for c in codes]
+        todo = {}
+        for key, code in zip(keys, codes):
+            if key not in todo and self._known(key) is None:
+                todo[key] = code
+        fresh = dict(zip(todo, self.pool.map(list(todo.values()), func_name, test_path, timeout)))
+        for key, result in fresh.items():
+            self.executed += 1
+            self._store(key, result)
+        self.reused += len(codes) - len(todo)
+        return [fresh[key] if key in fresh else self._known(key) for key in keys]
+
+    async def arun(self, code: str, func_name: str, test_path, timeout: Optional[float] = None) -> Result:
+        key = self._key(code, func_name, test_path)
+        result = self._known(key)
+        if result is not None:
+            self.reused += 1
+            return result
+        if key in self._inflight:
+            self.reused += 1
+            return await asyncio.shield(self._inflight[key])
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            result = await self.pool.arun(code, func_name, test_path, timeout)
+            self.executed += 1
+            self._store(key, result)
+            fut.set_result(result)
+            return result
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # waiters (if any) re-raise it; don't warn when there are none
+            raise
+        finally:
+            del self._inflight[key]
@@ -0,0 +1,102 @@
+from statistics import NormalDist
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+import numpy as np
+
+def pass_at_k(n, c, ks) -> np.ndarray:
+    """Unbiased pass@k, 1 - C(n-c, k) / C(n, k), for many cells and many k at once.
+
+    n and c are per-cell sample and success counts; the result has shape
+    (cells, len(ks)). The binomial ratio is evaluated as the product
+    prod_{i=n-c+1}^{n} (1 - k/i) in log space, which stays finite for n in the
+    thousands. Cells with n - c < k are exactly 1.0; cells with k > n are NaN.
+    """
+    n = np.atleast_1d(np.asarray(n, dtype=np.int64))
+    c = np.atleast_1d(np.asarray(c, dtype=np.int64))
+    ks = np.atleast_1d(np.asarray(ks, dtype=np.float64))
+    steps = np.arange(max(int(c.max(initial=0)), 1))
+    i = (n[:, None] - steps[None, :]).astype(np.float64)          # n, n-1, ..., one column per success
+    active = steps[None, :] < c[:, None]
+    safe_i = np.where(active & (i > 0), i, np.inf)                  # inactive terms contribute log1p(0)
+    ratio = -ks[None, None, :] / safe_i[:, :, None]
+    certain = (n - c)[:, None] < ks[None, :]                        # every k-subset contains a success
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_miss = np.log1p(np.where(certain[:, None, :], 0.0, ratio)).sum(axis=1)
+    out = np.where(certain, 1.0, 0.0 - np.expm1(log_miss))
+    return np.where(ks[None, :] > n[:, None], np.nan, out)
+
+def bootstrap_ci(values, n_boot: int = 10000, alpha: float = 0.05, seed: int = 0,
+                 block: int = 2000) -> Tuple[np.ndarray, np.ndarray]:
+    """Percentile bootstrap CI for the mean of per-cell values (shape (cells,) or (cells, K), no NaNs).
+
+    Resamples are drawn as multinomial count vectors and averaged with one matrix
+    product per block of resamples, so there is no Python loop per resample.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        nan = np.full(values.shape[1:], np.nan)
+        return nan, nan.copy()
+    flat = values.reshape(len(values), -1)
+    m = len(flat)
+    rng = np.random.default_rng(seed)
+    means = np.empty((n_boot, flat.shape[1]))
+    for start in range(0, n_boot, block):
+        stop = min(n_boot, start + block)
+        counts = rng.multinomial(m, np.full(m, 1.0 / m), size=stop - start)
+        means[start:stop] = counts @ flat / m
+    lo, hi = np.quantile(means, [alpha / 2, 1 - alpha / 2], axis=0)
+    return lo.reshape(values.shape[1:]), hi.reshape(values.shape[1:])
+
+def summarize_pass_at_k(records: Iterable[Dict[str, Any]], ks: Sequence[int], n_boot: int = 10000,
+                        alpha: float = 0.05) -> List[Dict[str, Any]]:
+    """Aggregate results.jsonl records into mean pass@k (+ bootstrap CI) per (model, strategy).
+
+    Each record contributes one cell with n samples (its "n" field, else the
+    length of its history) and c = successes; the mean is over the problems
+    whose cell has at least k samples ("problems", out of "cells"). A k that no
+    cell of a group reaches (e.g. k > 1 for self_repair) gets no row.
+    """
+    groups: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+    for r in records:
+        if "n" in r:
+            n = r["n"]
+        else:
+            n = 1 if r["strategy"] == "self_repair" else len(r.get("history", [])) or r["k"]
+        key = (f"{r['model']['provider']}:{r['model']['model']}", r["strategy"])
+        groups.setdefault(key, []).append((n, r["successes"]))
+    rows = []
+    for (model, strategy), cells in groups.items():
+        n, c = np.array(cells).T
+        est = pass_at_k(n, c, ks)
+        for j, k in enumerate(ks):
+            col = est[:, j][~np.isnan(est[:, j])]  # cells with fewer than k samples can't estimate pass@k
+            if not len(col):
+                continue
+            lo, hi = bootstrap_ci(col, n_boot=n_boot, alpha=alpha)
+            rows.append({
+                "model": model, "strategy": strategy, "k": int(k), "problems": len(col), "cells": len(cells),
+                "pass_at_k": float(col.mean()), "ci_low": float(lo), "ci_high": float(hi),
+            })
+    return rows
+
+def pass_at_k_interval(n, c, k: int, confidence: float = 0.95) -> Tuple[np.ndarray, np.ndarray]:
+    """Confidence interval for a cell's pass@k after c successes in n samples.
+
+    A Wilson score interval for the per-sample pass rate p is mapped through
+    pass@k = 1 - (1 - p)^k, which is monotone in p. Cells with n = 0 get [0, 1].
+    """
+    n = np.asarray(n, dtype=np.float64)
+    c = np.asarray(c, dtype=np.float64)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    safe_n = np.maximum(n, 1.0)
+    phat = c / safe_n
+    denom = 1 + z * z / safe_n
+    center = (phat + z * z / (2 * safe_n)) / denom
+    half = z * np.sqrt(phat * (1 - phat) / safe_n + z * z / (4 * safe_n * safe_n)) / denom
+    lo = np.where(n > 0, np.clip(center - half, 0.0, 1.0), 0.0)
+    hi = np.where(n > 0, np.clip(center + half, 0.0, 1.0), 1.0)
+    return 1 - (1 - lo) ** k, 1 - (1 - hi) ** k
+
+def is_settled(n, c, k: int, tolerance: float, confidence: float = 0.95) -> np.ndarray:
+    """True where the pass@k interval's half-width is within tolerance, i.e. more samples won't move it much."""
+    lo, hi = pass_at_k_interval(n, c, k, confidence)
+    return (hi - lo) / 2 <= tolerance
@@ -1,144 +1,1036 @@
+import os, asyncio, threading, time, random, contextvars
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from strategies import code_block_end
+import telemetry
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
 
-import os
-from dataclasses import dataclass
-from typing import List
+DEFAULT_TEMPERATURE = 0.6
+DEFAULT_MAX_TOKENS = 1024
 
 @dataclass
 class ModelConfig:
-    provider: str   # 'openai' | 'anthropic' | 'google' | 'openrouter' | 'huggingface'
+    provider: str   # 'openai' | 'anthropic' | 'google' | 'openrouter' | 'huggingface' | 'replay' | 'synthetic'
     model: str
-    temperature: float = 0.6
-    max_tokens: int = 1024
+    temperature: Optional[float] = None    # None = DEFAULT_TEMPERATURE; Gemini keeps its own default
+    max_tokens: Optional[int] = None       # None = DEFAULT_MAX_TOKENS; Gemini keeps its own default
+    rpm: Optional[float] = None            # provider requests/minute; None = unlimited
+    tpm: Optional[float] = None            # provider tokens/minute; None = unlimited
+    max_concurrency: Optional[int] = None  # provider requests in flight; None = unlimited
+    stream: bool = False                   # stream completions and stop at the first closed code block
+    options: Dict[str, Any] = field(default_factory=dict)  # provider-specific settings (max_fanout, offline providers)
+
+def sampling(cfg: ModelConfig) -> Tuple[Optional[float], Optional[int]]:
+    """(temperature, max_tokens) as sent to the provider: unset ones take the defaults, except on Gemini."""
+    if cfg.provider.lower() == "google":
+        return cfg.temperature, cfg.max_tokens
+    return (DEFAULT_TEMPERATURE if cfg.temperature is None else cfg.temperature,
+            cfg.max_tokens or DEFAULT_MAX_TOKENS)
+
+class RetriesExhausted(Exception):
+    """Raised when a retryable provider error persists through every retry."""
+
+class RateLimited(RetriesExhausted):
+    """Raised when a provider keeps answering 429 after the limiter has backed off."""
+
+# Error classes for the retry engine
+RATE_LIMIT, RETRYABLE, FATAL = "rate_limit", "retryable", "fatal"
+
+# SDK/transport exceptions that mean "try again", for errors that carry no HTTP status
+_TRANSIENT_ERROR_NAMES = {
+    "APITimeoutError", "APIConnectionError", "TimeoutException", "ConnectError", "ConnectTimeout",
+    "ReadTimeout", "ReadError", "RemoteProtocolError", "DeadlineExceeded", "ServiceUnavailable",
+}
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(exc, "code", None)  # google.api_core exceptions
+    try:
+        return int(code) if code is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    for name, scale in (("retry-after-ms", 1000.0), ("retry-after", 1.0)):
+        try:
+            return float(headers.get(name)) / scale
+        except (TypeError, ValueError):
+            continue
+    return None
+
+def classify_error(exc: BaseException) -> str:
+    """RATE_LIMIT (429), RETRYABLE (5xx, 408, timeouts, dropped connections) or FATAL (anything else)."""
+    code = _status_code(exc)
+    if code == 429:
+        # an exhausted quota/billing limit answers 429 too, but waiting won't fix it
+        return FATAL if "insufficient_quota" in str(exc) else RATE_LIMIT
+    if code is not None and (code >= 500 or code == 408):
+        return RETRYABLE
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return RETRYABLE
+    if any(cls.__name__ in _TRANSIENT_ERROR_NAMES for cls in type(exc).__mro__):
+        return RETRYABLE
+    return FATAL
+
+@dataclass
+class RetryPolicy:
+    """How often and how patiently ModelClient retries retryable errors (cfg.options["retry"] overrides fields)."""
+    max_retries: int = 6
+    base_delay: float = 1.0   # seconds; the backoff cap doubles from here each attempt ...
+    max_delay: float = 60.0   # ... up to this
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full jitter: uniform in [0, min(max_delay, base_delay * 2^attempt)], but never before the server's hint."""
+        delay = random.uniform(0.0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+class _Slots:
+    """Counting semaphore shared by threads and asyncio tasks on any event loop.
+
+    Waiters queue FIFO and release() hands the slot straight to the next one:
+    a thread is woken through its Event, a task through its future on its own
+    loop, so neither side polls.
+    """
+    def __init__(self, n: int):
+        self._lock = threading.Lock()
+        self._free = n
+        self._waiters: deque = deque()  # threading.Event | (loop, future)
+
+    def acquire(self):
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            fut = loop.create_future()
+            self._waiters.append((loop, fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            with self._lock:
+                queued = (loop, fut) in self._waiters
+                if queued:
+                    self._waiters.remove((loop, fut))
+            if not queued and fut.done() and not fut.cancelled():
+                self.release()  # granted just before the cancel; a cancelled grant is passed on by _grant
+            raise
+
+    def _grant(self, fut: asyncio.Future):
+        if fut.cancelled():
+            self.release()
+        else:
+            fut.set_result(None)
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                if isinstance(waiter, threading.Event):
+                    waiter.set()
+                    return
+                loop, fut = waiter
+                try:
+                    loop.call_soon_threadsafe(self._grant, fut)
+                    return
+                except RuntimeError:
+                    continue  # its loop has closed
+            self._free += 1
+
+class RateLimiter:
+    """Token bucket over requests/min and tokens/min plus a cap on requests in flight.
+
+    Acquisitions reserve capacity up front (the buckets may go negative) and the
+    caller sleeps off the debt, so the same limiter serves threads and asyncio
+    tasks. A 429 pauses the bucket for Retry-After and halves the effective rate,
+    which then creeps back up with each success.
+    """
+    MIN_RATE_FRACTION = 0.1
+    RECOVERY_FRACTION = 0.05
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                 max_concurrency: Optional[int] = None, clock: Callable[[], float] = time.monotonic):
+        self._lock = threading.Lock()
+        self._clock = clock
+        self._limits: Optional[Tuple[Optional[float], Optional[float], Optional[int]]] = None
+        self.configure(rpm, tpm, max_concurrency)
+
+    def configure(self, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                  max_concurrency: Optional[int] = None):
+        """(Re)set the limits; change them while no requests are in flight.
+
+        Re-applying the current limits (every get_client call with limits in
+        its ModelConfig does) keeps the buckets and the slots in use.
+        """
+        with self._lock:
+            if self._limits == (rpm, tpm, max_concurrency):
+                return
+            self._limits = (rpm, tpm, max_concurrency)
+            self.rpm, self.tpm = rpm, tpm
+            self._slots = _Slots(max_concurrency) if max_concurrency else None
+            self._scale = 1.0
+            self._req_level = rpm or 0.0
+            self._tok_level = tpm or 0.0
+            self._stamp = self._clock()
+            self._blocked_until = 0.0
+            self._strikes = 0
+
+    def _refill(self, now: float):
+        dt, self._stamp = now - self._stamp, now
+        if self.rpm:
+            self._req_level = min(self.rpm, self._req_level + dt * self.rpm * self._scale / 60.0)
+        if self.tpm:
+            self._tok_level = min(self.tpm, self._tok_level + dt * self.tpm * self._scale / 60.0)
+
+    def reserve(self, requests: int = 1, tokens: int = 0) -> float:
+        """Take capacity for one call and return how long the caller must wait before sending it."""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            wait = max(0.0, self._blocked_until - now)
+            if self.rpm:
+                self._req_level -= requests
+                wait = max(wait, -self._req_level * 60.0 / (self.rpm * self._scale))
+            if self.tpm:
+                self._tok_level -= min(tokens, self.tpm)
+                wait = max(wait, -self._tok_level * 60.0 / (self.tpm * self._scale))
+            return wait
+
+    def penalize(self, retry_after: Optional[float] = None) -> float:
+        """Record a 429: block new requests and halve the effective rate. Returns the pause length."""
+        with self._lock:
+            self._strikes += 1
+            delay = retry_after if retry_after is not None else min(60.0, 2.0 ** self._strikes)
+            self._blocked_until = max(self._blocked_until, self._clock() + delay)
+            self._scale = max(self.MIN_RATE_FRACTION, self._scale / 2)
+            return delay
+
+    def succeed(self):
+        with self._lock:
+            self._strikes = 0
+            self._scale = min(1.0, self._scale + self.RECOVERY_FRACTION)
+
+    def acquire_slot(self):
+        if self._slots:
+            self._slots.acquire()
+
+    async def aacquire_slot(self):
+        if self._slots:
+            await self._slots.aacquire()
+
+    def release_slot(self):
+        if self._slots:
+            self._slots.release()
+
+_RATE_LIMITERS: Dict[str, RateLimiter] = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    with _RATE_LIMITERS_LOCK:
+        return _RATE_LIMITERS.setdefault(provider.lower(), RateLimiter())
+
+def configure_rate_limit(provider: str, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                         max_concurrency: Optional[int] = None) -> RateLimiter:
+    """Set the shared limits for every client of `provider` in this process.
+
+    Set them to the account's quota (free tiers are often 5-20 rpm): requests
+    are then paced to stay under it rather than sent and retried, and a 429
+    still backs every client of the provider off.
+    """
+    limiter = get_rate_limiter(provider)
+    limiter.configure(rpm, tpm, max_concurrency)
+    return limiter
+
+@dataclass
+class HttpPoolSettings:
+    """Connection-pool settings for the shared HTTP clients (see configure_http_pool)."""
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 60.0  # seconds an idle connection stays open
+    http2: bool = False             # needs the h2 package (pip install httpx[http2])
+
+class ConnectionStats:
+    """Requests sent vs TCP connections opened by one shared HTTP client, counted from httpcore trace events."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+
+    def _on_event(self, event: str):
+        if event == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections += 1
+
+    def trace(self, event: str, info: Dict[str, Any]):
+        self._on_event(event)
+
+    async def atrace(self, event: str, info: Dict[str, Any]):
+        self._on_event(event)
+
+    def on_request(self, request):
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.trace
+
+    async def aon_request(self, request):
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.atrace
+
+    @property
+    def reused(self) -> int:
+        return max(0, self.requests - self.connections)
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"requests": self.requests, "connections": self.connections, "reused": self.reused}
+
+# response hooks fire once the headers are in, before the body is read
+def _on_response(response):
+    telemetry.first_byte()
+
+async def _aon_response(response):
+    telemetry.first_byte()
+
+_HTTP_SETTINGS = HttpPoolSettings()
+_SDK_CLIENTS: Dict[Tuple[str, Optional[str]], Any] = {}
+_HTTP_CLIENTS: Dict[Tuple[str, Optional[str]], Tuple[Any, Any]] = {}
+_CONNECTION_STATS: Dict[Tuple[str, Optional[str]], ConnectionStats] = {}
+_SDK_CLIENTS_LOCK = threading.RLock()
+
+def configure_http_pool(**settings) -> HttpPoolSettings:
+    """Change HttpPoolSettings fields (max_connections, http2, ...) for HTTP clients built from now on."""
+    for name, value in settings.items():
+        if not hasattr(_HTTP_SETTINGS, name):
+            raise TypeError(f"Unknown HTTP pool setting {name!r}")
+        setattr(_HTTP_SETTINGS, name, value)
+    return _HTTP_SETTINGS
+
+def http_clients(provider: str, base_url: Optional[str] = None) -> Tuple[Any, Any]:
+    """Shared keep-alive (httpx.Client, httpx.AsyncClient) pair for one provider endpoint.
+
+    Returns (None, None) when httpx is missing, so the SDK falls back to its own
+    client. The async client's pool belongs to the first event loop that uses it.
+    """
+    key = (provider.lower(), base_url)
+    with _SDK_CLIENTS_LOCK:
+        if key in _HTTP_CLIENTS:
+            return _HTTP_CLIENTS[key]
+        try:
+            import httpx  # type: ignore
+        except ImportError:
+            return None, None
+        s = _HTTP_SETTINGS
+        limits = httpx.Limits(max_connections=s.max_connections, max_keepalive_connections=s.max_keepalive_connections,
+                              keepalive_expiry=s.keepalive_expiry)
+        stats = _CONNECTION_STATS.setdefault(key, ConnectionStats())
+        pair = (httpx.Client(limits=limits, http2=s.http2,
+                             event_hooks={"request": [stats.on_request], "response": [_on_response]}),
+                httpx.AsyncClient(limits=limits, http2=s.http2,
+                                  event_hooks={"request": [stats.aon_request], "response": [_aon_response]}))
+        _HTTP_CLIENTS[key] = pair
+        return pair
+
+def shared_sdk_client(provider: str, scope: Optional[str], build: Callable[[], Any]) -> Any:
+    """The process-wide SDK client for (provider, scope), built by build() on first use.
+
+    scope is the endpoint's base URL (or the model name for SDKs that bind one).
+    get_client can then be called per problem without re-initializing the SDK or
+    re-doing TLS handshakes.
+    """
+    key = (provider.lower(), scope)
+    with _SDK_CLIENTS_LOCK:
+        if key not in _SDK_CLIENTS:
+            _SDK_CLIENTS[key] = build()
+        return _SDK_CLIENTS[key]
+
+def connection_stats() -> Dict[str, Dict[str, int]]:
+    """Connection reuse per shared HTTP client, as {"provider base_url": {requests, connections, reused}}."""
+    with _SDK_CLIENTS_LOCK:
+        return {" ".join(filter(None, key)): stats.as_dict() for key, stats in _CONNECTION_STATS.items()}
+
+def close_clients():
+    """Close the shared HTTP clients and hedge threads, and forget every cached SDK client."""
+    global _HEDGE_EXECUTOR
+    with _SDK_CLIENTS_LOCK:
+        pairs = list(_HTTP_CLIENTS.values())
+        _HTTP_CLIENTS.clear()
+        _SDK_CLIENTS.clear()
+        executor, _HEDGE_EXECUTOR = _HEDGE_EXECUTOR, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)  # abandoned hedges still running finish on their own
+    for sync_client, async_client in pairs:
+        sync_client.close()
+        try:
+            asyncio.run(async_client.aclose())
+        except RuntimeError:
+            pass  # called from inside an event loop; its connections close with the loop
+
+class CircuitBreaker:
+    """Per-provider breaker: after `threshold` consecutive retryable failures new requests wait out a cooldown.
+
+    Each time the breaker trips the cooldown doubles (up to max_cooldown). Once it
+    expires requests flow again half-open: one more failure trips it straight
+    back, one success closes it and resets the cooldown. Waiting rather than
+    failing fast lets a long sweep ride out a provider outage.
+    """
+    def __init__(self, threshold: int = 5, cooldown: float = 15.0, max_cooldown: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self._lock = threading.Lock()
+        self._clock = clock
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._failures = 0
+        self._trips = 0
+        self._open_until = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._open_until > self._clock():
+                return "open"
+            return "half-open" if self._trips else "closed"
+
+    def wait_time(self) -> float:
+        with self._lock:
+            return max(0.0, self._open_until - self._clock())
+
+    def failure(self):
+        with self._lock:
+            if self._open_until > self._clock():
+                return  # requests already in flight when it tripped
+            self._failures += 1
+            if self._failures >= self.threshold or self._trips:
+                self._open_until = self._clock() + min(self.max_cooldown, self.cooldown * 2 ** self._trips)
+                self._trips += 1
+                self._failures = 0
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._trips = 0
+
+_CIRCUIT_BREAKERS: Dict[str, CircuitBreaker] = {}
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    with _RATE_LIMITERS_LOCK:
+        return _CIRCUIT_BREAKERS.setdefault(provider.lower(), CircuitBreaker())
+
+def configure_circuit_breaker(provider: str, threshold: int = 5, cooldown: float = 15.0,
+                              max_cooldown: float = 300.0) -> CircuitBreaker:
+    """Replace the breaker shared by every client of `provider`; call while no requests are in flight."""
+    with _RATE_LIMITERS_LOCK:
+        breaker = _CIRCUIT_BREAKERS[provider.lower()] = CircuitBreaker(threshold, cooldown, max_cooldown)
+        return breaker
 
 class ModelClient:
-    """Base client interface."""
+    """Base client interface.
+
+    Subclasses implement _generate (and _agenerate when the SDK has a native async
+    API). Every provider request goes through the provider's shared RateLimiter
+    (one request's worth of rate and one concurrency slot) and the retry engine:
+    429s back the limiter off, other retryable errors (5xx, timeouts) sleep a
+    jittered exponential backoff and count towards the provider's
+    CircuitBreaker, and fatal errors propagate at once.
+    Providers without a native n (fans_out) send the samples as concurrent
+    requests through _fan_out, at most max_fanout at a time
+    (cfg.options["max_fanout"] overrides it); each request is limited and
+    retried on its own, so one 429 doesn't throw away the samples that arrived.
+
+    With cfg.stream, clients that implement _stream/_astream receive each sample as
+    a stream (one request per sample) and close it as soon as the first code block
+    has closed, so the prose models like to append is neither waited for nor,
+    where the provider stops on disconnect, billed.
+    """
+    max_fanout = 8
+    fans_out = False  # _generate sends several requests itself, each through _fan_out
+
     def __init__(self, cfg: ModelConfig):
         self.cfg = cfg
+        self.limiter = get_rate_limiter(cfg.provider)
+        self.breaker = get_circuit_breaker(cfg.provider)
+        self.retry = RetryPolicy(**cfg.options.get("retry", {}))
+        self.max_fanout = max(1, int(cfg.options.get("max_fanout", self.max_fanout)))
+        self.streaming = cfg.stream and type(self)._stream is not ModelClient._stream
 
-    def generate(self, prompt: str, n: int = 1) -> List[str]:
+    def _fan_out(self, fn, args: List[Any], prompt: str, samples: Callable[[Any], int] = lambda a: 1) -> List[Any]:
+        """[fn(a) for a in args] as separate provider requests (see _call), on up to max_fanout threads.
+
+        fn(a) sends one request for samples(a) completions; results keep the order of args.
+        """
+        def one(a):
+            return self._call(lambda: fn(a), prompt, samples(a))
+        if len(args) <= 1 or self.max_fanout == 1:
+            return [one(a) for a in args]
+        with ThreadPoolExecutor(max_workers=min(len(args), self.max_fanout)) as ex:
+            # each thread runs in a copy of this context so its request lands in the caller's trace
+            return list(ex.map(lambda a: contextvars.copy_context().run(one, a), args))
+
+    async def _afan_out(self, fn, args: List[Any], prompt: str, samples: Callable[[Any], int] = lambda a: 1) -> List[Any]:
+        """Async _fan_out: awaits fn(a) for every arg with at most max_fanout in flight."""
+        sem = asyncio.Semaphore(self.max_fanout)
+        async def one(a):
+            async with sem:
+                return await self._acall(lambda: fn(a), prompt, samples(a))
+        return list(await asyncio.gather(*(one(a) for a in args)))
+
+    def _generate(self, prompt: str, n: int) -> List[str]:
         raise NotImplementedError
 
+    async def _agenerate(self, prompt: str, n: int) -> List[str]:
+        return await asyncio.to_thread(self._generate, prompt, n)
+
+    def _stream(self, prompt: str) -> Iterator[str]:
+        """Yield one completion's text deltas; closing the generator must end the request."""
+        raise NotImplementedError
+
+    def _astream(self, prompt: str) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    def _generate_streamed(self, prompt: str, n: int) -> List[str]:
+        def one(_) -> str:
+            chunks, text = self._stream(prompt), ""
+            try:
+                for chunk in chunks:
+                    telemetry.first_byte()
+                    text += chunk
+                    if "`" in chunk:
+                        end = code_block_end(text)
+                        if end is not None:
+                            return text[:end]
+                return text
+            finally:
+                chunks.close()
+        return self._fan_out(one, range(n), prompt)
+
+    async def _agenerate_streamed(self, prompt: str, n: int) -> List[str]:
+        async def one(_) -> str:
+            chunks, text = self._astream(prompt), ""
+            try:
+                async for chunk in chunks:
+                    telemetry.first_byte()
+                    text += chunk
+                    if "`" in chunk:
+                        end = code_block_end(text)
+                        if end is not None:
+                            return text[:end]
+                return text
+            finally:
+                await chunks.aclose()
+        return await self._afan_out(one, range(n), prompt)
+
+    def requests_per_call(self, n: int) -> int:
+        """Provider requests one generate(n) call costs; clients without native n send n requests."""
+        return n
+
+    def _requests(self, n: int) -> int:
+        return n if self.streaming else self.requests_per_call(n)
+
+    def _request_tokens(self, prompt: str, samples: int) -> int:
+        # ~4 chars/token for the prompt, worst case for the completions
+        return len(prompt) // 4 + (sampling(self.cfg)[1] or DEFAULT_MAX_TOKENS) * samples
+
+    def _on_error(self, exc: BaseException, attempt: int) -> float:
+        """Re-raise exc unless it is worth retrying; otherwise return how long to back off first."""
+        kind = classify_error(exc)
+        if kind == FATAL:
+            raise exc
+        if kind == RATE_LIMIT:
+            if attempt >= self.retry.max_retries:
+                raise RateLimited(f"{self.cfg.provider} still rate limited after {attempt} retries") from exc
+            self.limiter.penalize(_retry_after(exc))
+            return 0.0  # the limiter holds off every client of this provider
+        self.breaker.failure()
+        if attempt >= self.retry.max_retries:
+            raise RetriesExhausted(f"{self.cfg.provider} still failing after {attempt} retries: {exc!r}") from exc
+        return self.retry.backoff(attempt, _retry_after(exc))
+
+    @staticmethod
+    def _queued(trace: Optional[telemetry.RequestTrace], since: float):
+        if trace is not None:
+            trace.queue_wait += time.monotonic() - since
+
+    def _count_tokens(self, trace: Optional[telemetry.RequestTrace], prompt: str, outs: List[str]):
+        if trace is not None and trace.output_tokens is None:  # the SDK reported no usage
+            trace.input_tokens = (len(prompt) // 4) * self._requests(len(outs))
+            trace.output_tokens = sum(len(o or "") for o in outs) // 4
+            trace.tokens_estimated = True
+
+    def _succeeded(self):
+        self.limiter.succeed()
+        self.breaker.success()
+
+    def _call(self, send: Callable[[], Any], prompt: str, samples: int) -> Any:
+        """send() as one provider request: paced by the limiter, holding a concurrency slot, retried on transient errors."""
+        trace = telemetry.current()
+        attempt = 0
+        while True:
+            since = time.monotonic()
+            time.sleep(self.breaker.wait_time())
+            time.sleep(self.limiter.reserve(1, self._request_tokens(prompt, samples)))
+            self.limiter.acquire_slot()
+            self._queued(trace, since)
+            try:
+                out = send()
+            except Exception as e:
+                backoff = self._on_error(e, attempt)  # re-raises fatal errors and the last retry's
+            else:
+                self._succeeded()
+                return out
+            finally:
+                self.limiter.release_slot()
+            if trace is not None:
+                trace.retries += 1
+            attempt += 1
+            time.sleep(backoff)  # outside the concurrency slot
+
+    async def _acall(self, send: Callable[[], Any], prompt: str, samples: int) -> Any:
+        """Async _call; send() returns an awaitable."""
+        trace = telemetry.current()
+        attempt = 0
+        while True:
+            since = time.monotonic()
+            await asyncio.sleep(self.breaker.wait_time())
+            await asyncio.sleep(self.limiter.reserve(1, self._request_tokens(prompt, samples)))
+            await self.limiter.aacquire_slot()
+            self._queued(trace, since)
+            try:
+                out = await send()
+            except Exception as e:
+                backoff = self._on_error(e, attempt)
+            else:
+                self._succeeded()
+                return out
+            finally:
+                self.limiter.release_slot()
+            if trace is not None:
+                trace.retries += 1
+            attempt += 1
+            await asyncio.sleep(backoff)
+
+    def generate(self, prompt: str, n: int = 1) -> List[str]:
+        with telemetry.request(self.cfg.provider, self.cfg.model, n) as trace:
+            if self.streaming:
+                outs = self._generate_streamed(prompt, n)
+            elif self.fans_out:
+                outs = self._generate(prompt, n)
+            else:
+                outs = self._call(lambda: self._generate(prompt, n), prompt, n)
+            self._count_tokens(trace, prompt, outs)
+            return outs
+
+    async def agenerate(self, prompt: str, n: int = 1) -> List[str]:
+        with telemetry.request(self.cfg.provider, self.cfg.model, n) as trace:
+            if self.streaming:
+                outs = await self._agenerate_streamed(prompt, n)
+            elif self.fans_out:
+                outs = await self._agenerate(prompt, n)
+            else:
+                outs = await self._acall(lambda: self._agenerate(prompt, n), prompt, n)
+            self._count_tokens(trace, prompt, outs)
+            return outs
+
 class OpenAIClient(ModelClient):
+    """Chat-completions client; OpenRouter and HuggingFace reuse it with their own endpoint."""
+    missing_msg = "openai package not installed"
+
     def __init__(self, cfg: ModelConfig):
         super().__init__(cfg)
+        kwargs = self._client_kwargs()
+        self._client, self._aclient = shared_sdk_client(cfg.provider, kwargs.get("base_url"), lambda: self._build(kwargs))
+
+    def _build(self, kwargs: Dict[str, Any]):
         try:
-            from openai import OpenAI  # type: ignore
-            self._client = OpenAI()
+            from openai import OpenAI, AsyncOpenAI  # type: ignore
         except Exception as e:
-            raise RuntimeError("openai package not installed") from e
+            raise RuntimeError(self.missing_msg) from e
+        http, ahttp = http_clients(self.cfg.provider, kwargs.get("base_url"))
+        try:
+            return OpenAI(**kwargs, http_client=http), AsyncOpenAI(**kwargs, http_client=ahttp)
+        except Exception as e:
+            raise RuntimeError(self.missing_msg) from e
 
-    def generate(self, prompt: str, n: int = 1) -> List[str]:
-        # Using the latest OpenAI API
-        completion = self._client.chat.completions.create(
+    def _client_kwargs(self) -> Dict[str, Any]:
+        return {}
+
+    def _request(self, prompt: str, n: int) -> Dict[str, Any]:
+        temperature, max_tokens = sampling(self.cfg)
+        return dict(
             model=self.cfg.model,
             messages=[{"role":"user","content":prompt}],
-            temperature=self.cfg.temperature,
+            temperature=temperature,
             n=n,
-            max_tokens=self.cfg.max_tokens,
+            max_tokens=max_tokens,
         )
-        outs = []
-        for choice in completion.choices:
-            outs.append(choice.message.content)
-        return outs
+
+    def requests_per_call(self, n: int) -> int:
+        return 1
+
+    @staticmethod
+    def _texts(completion) -> List[str]:
+        usage = getattr(completion, "usage", None)
+        if usage is not None:
+            telemetry.add_tokens(usage.prompt_tokens, usage.completion_tokens)
+        return [choice.message.content for choice in completion.choices]
+
+    def _generate(self, prompt: str, n: int) -> List[str]:
+        return self._texts(self._client.chat.completions.create(**self._request(prompt, n)))
+
+    async def _agenerate(self, prompt: str, n: int) -> List[str]:
+        return self._texts(await self._aclient.chat.completions.create(**self._request(prompt, n)))
+
+    @staticmethod
+    def _delta(chunk) -> str:
+        return (chunk.choices[0].delta.content or "") if chunk.choices else ""
+
+    def _stream(self, prompt: str) -> Iterator[str]:
+        stream = self._client.chat.completions.create(**self._request(prompt, 1), stream=True)
+        try:
+            for chunk in stream:
+                yield self._delta(chunk)
+        finally:
+            stream.close()  # drops the connection, which ends generation server-side
+
+    async def _astream(self, prompt: str) -> AsyncIterator[str]:
+        stream = await self._aclient.chat.completions.create(**self._request(prompt, 1), stream=True)
+        try:
+            async for chunk in stream:
+                yield self._delta(chunk)
+        finally:
+            await stream.close()
 
 class AnthropicClient(ModelClient):
+    fans_out = True
+
     def __init__(self, cfg: ModelConfig):
         super().__init__(cfg)
+        self._client, self._aclient = shared_sdk_client("anthropic", None, self._build)
+
+    @staticmethod
+    def _build():
         try:
             import anthropic  # type: ignore
-            self._client = anthropic.Anthropic()  # needs ANTHROPIC_API_KEY
         except Exception as e:
             raise RuntimeError("anthropic package not installed") from e
+        http, ahttp = http_clients("anthropic")
+        # needs ANTHROPIC_API_KEY
+        return anthropic.Anthropic(http_client=http), anthropic.AsyncAnthropic(http_client=ahttp)
 
-    def generate(self, prompt: str, n: int = 1) -> List[str]:
-        outs = []
-        for _ in range(n):
-            msg = self._client.messages.create(
-                model=self.cfg.model,
-                max_tokens=self.cfg.max_tokens,
-                temperature=self.cfg.temperature,
-                messages=[{"role":"user","content":prompt}],
-            )
-            text = "".join(getattr(block, "text", "") for block in getattr(msg, "content", []))
-            outs.append(text)
-        return outs
+    def _request(self, prompt: str) -> Dict[str, Any]:
+        temperature, max_tokens = sampling(self.cfg)
+        return dict(
+            model=self.cfg.model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            messages=[{"role":"user","content":prompt}],
+        )
+
+    @staticmethod
+    def _text(msg) -> str:
+        usage = getattr(msg, "usage", None)
+        if usage is not None:
+            telemetry.add_tokens(usage.input_tokens, usage.output_tokens)
+        return "".join(getattr(block, "text", "") for block in getattr(msg, "content", []))
+
+    # The Messages API has no n, so samples are fanned out as concurrent requests.
+    def _generate(self, prompt: str, n: int) -> List[str]:
+        request = self._request(prompt)
+        return self._fan_out(lambda _: self._text(self._client.messages.create(**request)), range(n), prompt)
+
+    async def _agenerate(self, prompt: str, n: int) -> List[str]:
+        request = self._request(prompt)
+        async def one(_):
+            return self._text(await self._aclient.messages.create(**request))
+        return await self._afan_out(one, range(n), prompt)
+
+    def _stream(self, prompt: str) -> Iterator[str]:
+        with self._client.messages.stream(**self._request(prompt)) as stream:
+            yield from stream.text_stream
+
+    async def _astream(self, prompt: str) -> AsyncIterator[str]:
+        async with self._aclient.messages.stream(**self._request(prompt)) as stream:
+            async for text in stream.text_stream:
+                yield text
 
 class GoogleClient(ModelClient):
+    """Gemini client; asks for up to max_candidates samples per request via candidate_count."""
+    max_candidates = 8  # Gemini's cap on candidate_count
+    fans_out = True      # one request per max_candidates samples
+
     def __init__(self, cfg: ModelConfig):
         super().__init__(cfg)
+        # genai keeps one gRPC channel per process; configure it once and reuse a model object per name.
+        self._model = shared_sdk_client("google", cfg.model, lambda: self._build(cfg.model))
+
+    @staticmethod
+    def _build(model: str):
         try:
             import google.generativeai as genai  # type: ignore
-            api_key = os.environ.get("GOOGLE_API_KEY") or os.environ.get("GOOGLE_API_TOKEN")
-            genai.configure(api_key=api_key)
-            self._model = genai.GenerativeModel(cfg.model)
+            shared_sdk_client("google", None, lambda: genai.configure(
+                api_key=os.environ.get("GOOGLE_API_KEY") or os.environ.get("GOOGLE_API_TOKEN")))
+            return genai.GenerativeModel(model)
         except Exception as e:
             raise RuntimeError("google-generativeai package not installed or API key missing") from e
 
-    def generate(self, prompt: str, n: int = 1) -> List[str]:
-        outs = []
-        for _ in range(n):
-            resp = self._model.generate_content(prompt)
-            outs.append(getattr(resp, "text", "") or "")
-        return outs
+    def _chunks(self, n: int) -> List[int]:
+        return [min(self.max_candidates, n - i) for i in range(0, n, self.max_candidates)]
 
-class OpenRouterClient(ModelClient):
-    def __init__(self, cfg: ModelConfig):
-        super().__init__(cfg)
+    def requests_per_call(self, n: int) -> int:
+        return len(self._chunks(n))
+
+    def _generation_config(self, count: int) -> Dict[str, Any]:
+        # temperature and the length cap only when the sweep sets them: Gemini's own defaults apply otherwise
+        temperature, max_tokens = sampling(self.cfg)
+        config: Dict[str, Any] = dict(candidate_count=count)
+        if temperature is not None:
+            config["temperature"] = temperature
+        if max_tokens is not None:
+            config["max_output_tokens"] = max_tokens
+        return config
+
+    @classmethod
+    def _texts(cls, resp, count: int) -> List[str]:
+        usage = getattr(resp, "usage_metadata", None)
+        if usage is not None:
+            telemetry.add_tokens(getattr(usage, "prompt_token_count", None), getattr(usage, "candidates_token_count", None))
+        return cls._candidate_texts(resp, count)
+
+    @staticmethod
+    def _candidate_texts(resp, count: int) -> List[str]:
+        # resp.text raises once there is more than one candidate, so read the parts directly
+        texts = ["".join(getattr(part, "text", "") for part in getattr(getattr(cand, "content", None), "parts", None) or [])
+                 for cand in getattr(resp, "candidates", None) or []]
+        return (texts + [""] * count)[:count]  # blocked/missing candidates come back empty
+
+    def _multi_candidate_unsupported(self, exc: BaseException, n: int) -> bool:
+        # Older models reject candidate_count > 1 with a 400; fall back to one sample per request.
+        if n > 1 and self.max_candidates > 1 and _status_code(exc) == 400 and "candidate" in str(exc).lower():
+            self.max_candidates = 1
+            return True
+        return False
+
+    def _generate(self, prompt: str, n: int) -> List[str]:
+        def chunk(count: int) -> List[str]:
+            return self._texts(self._model.generate_content(prompt, generation_config=self._generation_config(count)), count)
         try:
-            from openai import OpenAI  # type: ignore
-            self._client = OpenAI(
-                base_url="https://openrouter.ai/api/v1",
-                api_key=os.environ.get("OPENROUTER_API_KEY")
-            )
+            chunks = self._fan_out(chunk, self._chunks(n), prompt, samples=int)
         except Exception as e:
-            raise RuntimeError("openai package not installed or OpenRouter API key missing") from e
+            if not self._multi_candidate_unsupported(e, n):
+                raise
+            chunks = self._fan_out(chunk, self._chunks(n), prompt, samples=int)
+        return [text for texts in chunks for text in texts]
 
-    def generate(self, prompt: str, n: int = 1) -> List[str]:
-        # Using OpenRouter API with OpenAI client
-        completion = self._client.chat.completions.create(
-            model=self.cfg.model,
-            messages=[{"role":"user","content":prompt}],
-            temperature=self.cfg.temperature,
-            n=n,
-            max_tokens=self.cfg.max_tokens,
-        )
-        outs = []
-        for choice in completion.choices:
-            outs.append(choice.message.content)
-        return outs
-
-class HuggingFaceClient(ModelClient):
-    def __init__(self, cfg: ModelConfig):
-        super().__init__(cfg)
+    async def _agenerate(self, prompt: str, n: int) -> List[str]:
+        async def chunk(count: int) -> List[str]:
+            resp = await self._model.generate_content_async(prompt, generation_config=self._generation_config(count))
+            return self._texts(resp, count)
         try:
-            from openai import OpenAI  # type: ignore
-            self.api_key = os.environ.get("HUGGINGFACE_API_KEY")
-            if not self.api_key:
-                raise RuntimeError("HUGGINGFACE_API_KEY not set")
-            # Use OpenAI-compatible client with new Hugging Face router
-            self._client = OpenAI(
-                base_url="https://router.huggingface.co/v1",
-                api_key=self.api_key
-            )
+            chunks = await self._afan_out(chunk, self._chunks(n), prompt, samples=int)
         except Exception as e:
-            raise RuntimeError("openai package not installed or HuggingFace API key missing") from e
+            if not self._multi_candidate_unsupported(e, n):
+                raise
+            chunks = await self._afan_out(chunk, self._chunks(n), prompt, samples=int)
+        return [text for texts in chunks for text in texts]
+
+    # Gemini streams over gRPC without a cancel handle; abandoning the iterator stops reading it.
+    def _stream(self, prompt: str) -> Iterator[str]:
+        for resp in self._model.generate_content(prompt, generation_config=self._generation_config(1), stream=True):
+            yield self._candidate_texts(resp, 1)[0]  # stream chunks carry running usage totals; not counted
+
+    async def _astream(self, prompt: str) -> AsyncIterator[str]:
+        async for resp in await self._model.generate_content_async(prompt, generation_config=self._generation_config(1), stream=True):
+            yield self._candidate_texts(resp, 1)[0]  # stream chunks carry running usage totals; not counted
+
+class OpenRouterClient(OpenAIClient):
+    missing_msg = "openai package not installed or OpenRouter API key missing"
+
+    def _client_kwargs(self) -> Dict[str, Any]:
+        return {"base_url": "https://openrouter.ai/api/v1", "api_key": os.environ.get("OPENROUTER_API_KEY")}
+
+class HuggingFaceClient(OpenAIClient):
+    missing_msg = "openai package not installed or HuggingFace API key missing"
+
+    def _client_kwargs(self) -> Dict[str, Any]:
+        self.api_key = os.environ.get("HUGGINGFACE_API_KEY")
+        if not self.api_key:
+            raise RuntimeError("HUGGINGFACE_API_KEY not set")
+        # Use OpenAI-compatible client with new Hugging Face router
+        return {"base_url": "https://router.huggingface.co/v1", "api_key": self.api_key}
+
+_HEDGE_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+def _hedge_executor() -> ThreadPoolExecutor:
+    """Threads every HedgedClient races sync requests on; close_clients shuts them down."""
+    global _HEDGE_EXECUTOR
+    with _SDK_CLIENTS_LOCK:
+        if _HEDGE_EXECUTOR is None:
+            _HEDGE_EXECUTOR = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+        return _HEDGE_EXECUTOR
+
+@dataclass
+class HedgePolicy:
+    """When HedgedClient sends a second request, and to whom."""
+    backups: List[ModelConfig] = field(default_factory=list)  # equivalent models to fail over to; empty = resend to the primary
+    quantile: float = 0.95       # hedge once the primary is slower than this quantile of its recent latencies
+    initial_delay: float = 10.0  # hedge delay (seconds) until min_samples latencies have been seen
+    min_samples: int = 20
+    window: int = 200            # recent primary latencies the quantile is taken over
+    budget: float = 0.1          # hedges allowed per primary request ...
+    burst: int = 2               # ... plus this many up front
+
+class HedgedClient(ModelClient):
+    """Races a backup request against a primary that is slower than usual, and fails over on errors.
+
+    A call that hasn't returned after the policy's latency quantile gets one
+    hedge: the same request to the next backup (or to the primary again when
+    there are no backups), and whichever answers first wins. Hedges are capped
+    at budget * requests + burst so a slow provider can't double the load. A
+    primary that fails is retried on the backups in order, outside the budget.
+    Each request records into its own telemetry branch and only the ones that
+    finished before the call returned are merged into the call's trace.
+    """
+    def __init__(self, primary: ModelClient, backups: List[ModelClient], policy: HedgePolicy):
+        self.cfg = primary.cfg
+        self.primary = primary
+        self.backups = backups or [primary]
+        self.policy = policy
+        self._latencies: "deque[float]" = deque(maxlen=policy.window)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def _delay(self) -> float:
+        with self._lock:
+            self.requests += 1
+            if len(self._latencies) < self.policy.min_samples:
+                return self.policy.initial_delay
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(self.policy.quantile * len(ordered)))]
+
+    def _take_hedge(self) -> bool:
+        with self._lock:
+            if self.hedges >= self.policy.budget * self.requests + self.policy.burst:
+                return False
+            self.hedges += 1
+            return True
+
+    def _finish(self, start: float, primary_done: bool, winner: ModelClient, hedged: bool):
+        with self._lock:
+            # a primary that lost the race is recorded at its elapsed time, a lower bound on its latency
+            self._latencies.append(time.monotonic() - start)
+            if hedged and not (primary_done and winner is self.primary):
+                self.hedge_wins += 1
+
+    def _failover(self):
+        with self._lock:
+            self.failovers += 1
 
     def generate(self, prompt: str, n: int = 1) -> List[str]:
-        # Using new Hugging Face Inference Providers API
-        completion = self._client.chat.completions.create(
-            model=self.cfg.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=self.cfg.temperature,
-            n=n,
-            max_tokens=self.cfg.max_tokens,
-        )
-        outs = []
-        for choice in completion.choices:
-            outs.append(choice.message.content)
-        return outs
+        with telemetry.request(self.cfg.provider, self.cfg.model, n):
+            return self._race(prompt, n)
 
-def get_client(cfg: ModelConfig) -> ModelClient:
+    async def agenerate(self, prompt: str, n: int = 1) -> List[str]:
+        with telemetry.request(self.cfg.provider, self.cfg.model, n):
+            return await self._arace(prompt, n)
+
+    def _submit(self, client: ModelClient, prompt: str, n: int, branches: Dict[Any, Any]):
+        branch = telemetry.fork()
+        fut = _hedge_executor().submit(contextvars.copy_context().run, telemetry.traced, branch, client.generate, prompt, n)
+        branches[fut] = branch
+        return fut
+
+    def _asubmit(self, client: ModelClient, prompt: str, n: int, branches: Dict[Any, Any]):
+        branch = telemetry.fork()
+        task = asyncio.ensure_future(telemetry.atraced(branch, client.agenerate, prompt, n))
+        branches[task] = branch
+        return task
+
+    def _race(self, prompt: str, n: int) -> List[str]:
+        start, delay = time.monotonic(), self._delay()
+        backups = iter(self.backups)
+        branches: Dict[Any, Any] = {}
+        primary = self._submit(self.primary, prompt, n, branches)
+        running = {primary: self.primary}
+        hedged, errors = False, []
+        while running:
+            done, _ = wait(running, timeout=None if hedged else max(0.0, start + delay - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                backup = next(backups, None)
+                hedged = True  # at most one hedge per call, whether or not the budget allowed it
+                if backup is not None and self._take_hedge():
+                    running[self._submit(backup, prompt, n, branches)] = backup
+                continue
+            for fut in done:
+                client = running.pop(fut)
+                telemetry.merge(branches[fut])
+                if fut.exception() is None:
+                    for other in running:
+                        other.cancel()  # abandoned requests that already started run to completion in the background
+                    self._finish(start, primary.done(), client, hedged)
+                    return fut.result()
+                errors.append(fut.exception())
+            if not running:
+                backup = next(backups, None)
+                if backup is not None and backup is not self.primary:
+                    self._failover()
+                    running[self._submit(backup, prompt, n, branches)] = backup
+        raise errors[0]
+
+    async def _arace(self, prompt: str, n: int) -> List[str]:
+        start, delay = time.monotonic(), self._delay()
+        backups = iter(self.backups)
+        branches: Dict[Any, Any] = {}
+        primary = self._asubmit(self.primary, prompt, n, branches)
+        running = {primary: self.primary}
+        hedged, errors = False, []
+        try:
+            while running:
+                done, _ = await asyncio.wait(running, timeout=None if hedged else max(0.0, start + delay - time.monotonic()),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    backup = next(backups, None)
+                    hedged = True
+                    if backup is not None and self._take_hedge():
+                        running[self._asubmit(backup, prompt, n, branches)] = backup
+                    continue
+                for task in done:
+                    client = running.pop(task)
+                    telemetry.merge(branches[task])
+                    if task.exception() is None:
+                        self._finish(start, primary.done(), client, hedged)
+                        return task.result()
+                    errors.append(task.exception())
+                if not running:
+                    backup = next(backups, None)
+                    if backup is not None and backup is not self.primary:
+                        self._failover()
+                        running[self._asubmit(backup, prompt, n, branches)] = backup
+            raise errors[0]
+        finally:
+            for task in running:
+                task.cancel()  # closes the losing request
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "hedges": self.hedges, "hedge_wins": self.hedge_wins, "failovers": self.failovers}
+
+def _provider_client(cfg: ModelConfig) -> ModelClient:
     p = cfg.provider.lower()
+    if cfg.rpm or cfg.tpm or cfg.max_concurrency:
+        configure_rate_limit(p, cfg.rpm, cfg.tpm, cfg.max_concurrency)
     if p == "openai":
         return OpenAIClient(cfg)
     if p == "anthropic":
@@ -149,4 +1041,26 @@ def get_client(cfg: ModelConfig) -> ModelClient:
         return OpenRouterClient(cfg)
     if p == "huggingface":
         return HuggingFaceClient(cfg)
+    if p in ("replay", "synthetic"):
+        from offline_clients import ReplayClient, SyntheticClient
+        return ReplayClient(cfg) if p == "replay" else SyntheticClient(cfg)
     raise ValueError(f"Unknown provider {cfg.provider}")
+
+def get_client(cfg: ModelConfig, cache=None, hedge: Optional[HedgePolicy] = None) -> ModelClient:
+    """Build the client for cfg.provider.
+
+    Pass a response_cache.ResponseCache to serve repeats from disk, and a
+    HedgePolicy to hedge slow requests and fail over to its backup models.
+    """
+    if cache is not None:
+        from response_cache import CachedClient
+        # A read-only (replay) cache never reaches the provider, so don't even build its SDK client.
+        return CachedClient(cfg, cache, None if cache.readonly else get_client(cfg, hedge=hedge))
+    client = _provider_client(cfg)
+    if hedge is not None:
+        return HedgedClient(client, [_provider_client(b) for b in hedge.backups], hedge)
+    return client
+
+async def aget_client(cfg: ModelConfig, cache=None, hedge: Optional[HedgePolicy] = None) -> ModelClient:
+    """Async get_client; SDK import and construction run off the event loop."""
+    return await asyncio.to_thread(get_client, cfg, cache, hedge)
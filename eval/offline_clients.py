@@ -0,0 +1,172 @@
+import re, json, time, random, asyncio, hashlib, pathlib
+from typing import Any, AsyncIterator, Dict, Iterator, List, Tuple
+from model_clients import ModelClient, ModelConfig
+from checkpoint import model_key
+
+BASE = pathlib.Path(__file__).resolve().parents[1]
+GENERATED_DIR = BASE / "a1" / "generated"
+SOLUTIONS_DIR = BASE / "solutions"
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+def _fence(code: str) -> str:
+    return f"```python\n{code}\n```"
+
+class ReplayMiss(KeyError):
+    """Raised when a replayed prompt was never recorded."""
+
+class ProviderError(Exception):
+    """Injected synthetic failure; carries status_code like the SDK errors do."""
+    def __init__(self, status_code: int):
+        super().__init__(f"synthetic HTTP {status_code}")
+        self.status_code = status_code
+
+def sample_latency(spec: Dict[str, Any], rng: random.Random) -> float:
+    """Draw one latency in seconds from a spec such as {"dist": "lognormal", "median_ms": 800, "sigma": 0.6}."""
+    dist = spec.get("dist", "fixed")
+    if dist == "fixed":
+        ms = spec.get("ms", 0.0)
+    elif dist == "uniform":
+        ms = rng.uniform(spec.get("low_ms", 0.0), spec.get("high_ms", 1000.0))
+    elif dist == "exponential":
+        ms = rng.expovariate(1.0 / spec.get("mean_ms", 500.0))
+    elif dist == "lognormal":
+        ms = spec.get("median_ms", 500.0) * rng.lognormvariate(0.0, spec.get("sigma", 0.5))
+    else:
+        raise ValueError(f"Unknown latency distribution {dist}")
+    return max(0.0, ms) / 1000.0
+
+class _OfflineClient(ModelClient):
+    """Shared latency/error injection for clients that never touch the network."""
+    def __init__(self, cfg: ModelConfig):
+        super().__init__(cfg)
+        self.rng = random.Random(cfg.options.get("seed"))
+        self.latency = cfg.options.get("latency", {"dist": "fixed", "ms": 0})
+        self.error_rate = cfg.options.get("error_rate", 0.0)
+        self.error_status = cfg.options.get("error_status", 503)
+
+    def requests_per_call(self, n: int) -> int:
+        return 1
+
+    def _respond(self, prompt: str, n: int) -> List[str]:
+        raise NotImplementedError
+
+    def _maybe_fail(self):
+        if self.error_rate and self.rng.random() < self.error_rate:
+            raise ProviderError(self.error_status)
+
+    def _generate(self, prompt: str, n: int) -> List[str]:
+        time.sleep(sample_latency(self.latency, self.rng))
+        self._maybe_fail()
+        return self._respond(prompt, n)
+
+    async def _agenerate(self, prompt: str, n: int) -> List[str]:
+        await asyncio.sleep(sample_latency(self.latency, self.rng))
+        self._maybe_fail()
+        return self._respond(prompt, n)
+
+    # Streams spread the sampled latency evenly over fixed-size chunks of the response.
+    stream_chunk_chars = 32
+
+    def _chunks(self, prompt: str):
+        total = sample_latency(self.latency, self.rng)
+        self._maybe_fail()
+        text = self._respond(prompt, 1)[0]
+        pieces = [text[i:i + self.stream_chunk_chars] for i in range(0, len(text), self.stream_chunk_chars)] or [""]
+        return pieces, total / len(pieces)
+
+    def _stream(self, prompt: str) -> Iterator[str]:
+        pieces, delay = self._chunks(prompt)
+        for piece in pieces:
+            time.sleep(delay)
+            yield piece
+
+    async def _astream(self, prompt: str) -> AsyncIterator[str]:
+        pieces, delay = self._chunks(prompt)
+        for piece in pieces:
+            await asyncio.sleep(delay)
+            yield piece
+
+def _results_pairs(generated_dir: pathlib.Path):
+    """Yield (prompts file, results file) pairs written by the evaluation scripts."""
+    for results in sorted(generated_dir.glob("*results.jsonl")):
+        stem = results.name[:-len("results.jsonl")]
+        prompts = generated_dir / (f"{stem}prompts.jsonl" if stem else "prompts_used.jsonl")
+        if prompts.exists():
+            yield prompts, results
+
+def _cell(rec: Dict[str, Any]) -> Tuple[str, str, str]:
+    return (model_key(rec["model"]), rec["strategy"], rec["problem"])
+
+def load_recordings(generated_dir: pathlib.Path = GENERATED_DIR) -> Dict[str, Dict[str, List[str]]]:
+    """Index recorded generations as {prompt hash: {model name: [code, ...]}}.
+
+    The runner logs a prompt when its cell starts and the result when the cell
+    finishes, so the two logs are in different orders; they are joined on
+    (model, strategy, problem). A row with no partner in the other log means
+    the logs don't belong together (or a run was cut short) and raises
+    ValueError rather than silently dropping recordings.
+    """
+    index: Dict[str, Dict[str, List[str]]] = {}
+    for prompts_path, results_path in _results_pairs(generated_dir):
+        with open(prompts_path) as f:
+            # a resumed run logs its cells' prompts again; the prompt is the same
+            prompts = {_cell(rec): rec["prompt"] for rec in map(json.loads, f)}
+        with open(results_path) as f:
+            results = [json.loads(line) for line in f]
+        orphans = sorted(set(prompts) ^ {_cell(rec) for rec in results})
+        if orphans:
+            raise ValueError(f"{prompts_path.name} and {results_path.name} don't match: "
+                             f"{len(orphans)} cells are logged in only one of them, e.g. {orphans[0]}")
+        for rrec in results:
+            codes = index.setdefault(prompt_hash(prompts[_cell(rrec)]), {}).setdefault(rrec["model"]["model"], [])
+            codes.extend(h["code"] for h in rrec.get("history", []) if h.get("code"))
+    return index
+
+class ReplayClient(_OfflineClient):
+    """Serves completions recorded in a1/generated/*_results.jsonl, looked up by prompt hash.
+
+    cfg.model picks whose recordings to serve ("*" = any model). Asking for more
+    samples than were recorded cycles through the recorded ones.
+    Options: generated_dir, plus the shared seed/latency/error_rate/error_status.
+    """
+    def __init__(self, cfg: ModelConfig):
+        super().__init__(cfg)
+        self.recordings = load_recordings(pathlib.Path(cfg.options.get("generated_dir", GENERATED_DIR)))
+
+    def _respond(self, prompt: str, n: int) -> List[str]:
+        by_model = self.recordings.get(prompt_hash(prompt), {})
+        if self.cfg.model == "*":
+            codes = [c for cs in by_model.values() for c in cs]
+        else:
+            codes = by_model.get(self.cfg.model, [])
+        if not codes:
+            raise ReplayMiss(f"no recording of this prompt for model {self.cfg.model!r}")
+        return [_fence(codes[i % len(codes)]) for i in range(n)]
+
+class SyntheticClient(_OfflineClient):
+    """Answers with the reference solution from solutions/ after a simulated latency.
+
+    The function is found from the first `def name(` in the prompt that has a
+    reference solution. With probability 1 - pass_rate the answer is a stub that
+    fails the tests instead. Options: pass_rate, epilogue (prose appended after
+    the code block, as chatty models do), plus the shared
+    seed/latency/error_rate/error_status.
+    """
+    def __init__(self, cfg: ModelConfig):
+        super().__init__(cfg)
+        self.pass_rate = cfg.options.get("pass_rate", 1.0)
+        self.epilogue = cfg.options.get("epilogue", "")
+        self.solutions = {p.stem: p.read_text() for p in SOLUTIONS_DIR.glob("*.py")}
+
+    def _respond(self, prompt: str, n: int) -> List[str]:
+        names = [m for m in re.findall(r"def (\w+)\s*\(", prompt) if m in self.solutions]
+        outs = []
+        for _ in range(n):
+            if names and self.rng.random() < self.pass_rate:
+                outs.append(_fence(self.solutions[names[0]]))
+            else:
+                name = names[0] if names else "solution"
+                outs.append(_fence(f"def {name}(*args, **kwargs):\n    raise NotImplementedError"))
+        return [out + self.epilogue for out in outs]
@@ -0,0 +1,143 @@
+import json, argparse, pathlib
+from typing import Any, Dict, List, Optional
+from telemetry import read_columns
+from strategies import load_problems
+
+# numpy (via metrics) is imported inside the commands that need it, so the CLI starts fast.
+
+BASE = pathlib.Path(__file__).resolve().parents[1]
+TELEMETRY_PATH = BASE / "a1" / "generated" / "telemetry.jsonl"
+CASE_RESULTS_PATH = BASE / "a1" / "generated" / "case_results.npz"
+RESULTS_PATH = BASE / "a1" / "generated" / "results.jsonl"
+
+def print_pass_at_k(records: List[Dict[str, Any]], ks: List[int]):
+    from metrics import summarize_pass_at_k
+    print(f"{'model':40} {'strategy':16} {'k':>4} {'pass@k':>7}  {'95% CI':16} problems")
+    for r in sorted(summarize_pass_at_k(records, ks), key=lambda r: (r["model"], r["strategy"], r["k"])):
+        # fewer problems than cells: some cells drew fewer than k samples and are left out of the mean
+        print(f"{r['model']:40} {r['strategy']:16} {r['k']:>4} {r['pass_at_k']:>7.3f}  "
+              f"[{r['ci_low']:.3f}, {r['ci_high']:.3f}]   {r['problems']}/{r['cells']}")
+
+def print_model_breakdown(records: List[Dict[str, Any]]):
+    """Per-model pass rate with the problems passed/failed, and where two models disagree."""
+    model_stats: Dict[str, Dict[str, Any]] = {}
+    for r in records:
+        stats = model_stats.setdefault(f"{r['model']['provider']}:{r['model']['model']}", {"total": 0, "passed": 0, "problems": []})
+        stats["total"] += 1
+        stats["passed"] += r["pass_at_k"] > 0
+        stats["problems"].append({"problem": r["problem"], "passed": r["pass_at_k"] > 0})
+
+    for model_key, stats in model_stats.items():
+        pass_rate = stats["passed"] / stats["total"] if stats["total"] > 0 else 0
+        print(f"{model_key}:")
+        print(f"  Pass Rate: {stats['passed']}/{stats['total']} ({pass_rate:.1%})")
+        passed_problems = [p["problem"] for p in stats["problems"] if p["passed"]]
+        failed_problems = [p["problem"] for p in stats["problems"] if not p["passed"]]
+        if passed_problems:
+            print(f"  Passed: {', '.join(passed_problems)}")
+        if failed_problems:
+            print(f"  Failed: {', '.join(failed_problems)}")
+        print()
+
+    if len(model_stats) == 2:
+        stats1, stats2 = model_stats.values()
+        print("Model Comparison:")
+        print("================")
+        problems1 = {p["problem"]: p["passed"] for p in stats1["problems"]}
+        problems2 = {p["problem"]: p["passed"] for p in stats2["problems"]}
+        differences = [problem for problem in problems1 if problems1[problem] != problems2.get(problem)]
+        if differences:
+            print(f"Problems where models differ: {', '.join(differences)}")
+        else:
+            print("Both models had identical results on all problems")
+
+def print_problems():
+    for p in load_problems():
+        suite = "" if pathlib.Path(p["test_path"]).exists() else "  (no test suite)"
+        print(f"{p['name']:28} {pathlib.Path(p['md_path']).relative_to(BASE)}{suite}")
+
+def summarize_results(path: str, ks: Optional[List[int]] = None):
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if not records:
+        print(f"No records in {path}")
+        return
+    print_pass_at_k(records, sorted(set(ks or [1, max(r["k"] for r in records)])))
+
+def _quantiles(values: List[Optional[float]], qs=(50, 95, 99)) -> List[float]:
+    import numpy as np
+    arr = np.array([v for v in values if v is not None], dtype=np.float64)
+    return list(np.percentile(arr, qs)) if len(arr) else [float("nan")] * len(qs)
+
+def latency_table(cols: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Per provider:model latency quantiles over the calls that reached the provider (not fully cached)."""
+    groups: Dict[str, List[int]] = {}
+    for i, (provider, model) in enumerate(zip(cols["provider"], cols["model"])):
+        groups.setdefault(f"{provider}:{model}", []).append(i)
+    rows = []
+    for name, idx in sorted(groups.items()):
+        live = [i for i in idx if cols["cache_hits"][i] < cols["n"][i] and cols["error"][i] is None]
+        p50, p95, p99 = _quantiles([cols["latency"][i] for i in live])
+        t50, t95, _ = _quantiles([cols["ttfb"][i] for i in live])
+        _, q95, _ = _quantiles([cols["queue_wait"][i] for i in live])
+        samples = sum(cols["n"][i] for i in idx)
+        rows.append({
+            "model": name, "calls": len(idx), "errors": sum(cols["error"][i] is not None for i in idx),
+            "cache_hit_rate": sum(cols["cache_hits"][i] for i in idx) / samples if samples else 0.0,
+            "p50": p50, "p95": p95, "p99": p99, "ttfb_p50": t50, "ttfb_p95": t95, "queue_p95": q95,
+            "retries": sum(cols["retries"][i] for i in idx),
+            "output_tokens": sum(cols["output_tokens"][i] or 0 for i in live),
+        })
+    return rows
+
+def print_latency(rows: List[Dict[str, Any]]):
+    print(f"{'model':40} {'calls':>6} {'err':>4} {'cache':>6} {'p50':>7} {'p95':>7} {'p99':>7} "
+          f"{'ttfb50':>7} {'ttfb95':>7} {'queue95':>7} {'retry':>5} {'out tok':>8}")
+    for r in rows:
+        print(f"{r['model']:40} {r['calls']:>6} {r['errors']:>4} {r['cache_hit_rate']:>6.1%} "
+              f"{r['p50']:>7.2f} {r['p95']:>7.2f} {r['p99']:>7.2f} {r['ttfb_p50']:>7.2f} {r['ttfb_p95']:>7.2f} "
+              f"{r['queue_p95']:>7.2f} {r['retries']:>5} {r['output_tokens']:>8}")
+    print("(seconds; latency quantiles over calls that reached the provider)")
+
+def print_case_failures(path: str, top: int = 20, by: str = "model"):
+    """The test cases failed by the most candidates, with the failure rate per model (or strategy)."""
+    import numpy as np
+    from case_matrix import CaseMatrix
+    m = CaseMatrix.load(path)
+    groups, rates, _ = m.failure_rates(by)
+    overall = (m.status >= 2).sum(axis=0) / np.maximum((m.status > 0).sum(axis=0), 1)
+    order = np.argsort(-overall, kind="stable")[:top]
+    print(f"{len(m.row_codes)} candidates x {len(m.columns)} cases; failure rate per {by}:")
+    for i, g in enumerate(groups):
+        print(f"  [{i}] {g}")
+    print(f"{'problem':24} {'case':20} {'all':>6} " + " ".join(f"{f'[{i}]':>6}" for i in range(len(groups))))
+    for c in order:
+        problem, case_id = m.columns[c]
+        cells = " ".join("     -" if r != r else f"{r:>6.1%}" for r in rates[:, c])
+        print(f"{problem:24} {case_id:20} {overall[c]:>6.1%} {cells}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Reports over evaluation logs")
+    sub = ap.add_subparsers(dest="command", required=True)
+    sub.add_parser("problems", help="list the problems and their test suites")
+    summ = sub.add_parser("summary", help="mean pass@k with bootstrap CIs per model/strategy from a results log")
+    summ.add_argument("--results", default=str(RESULTS_PATH), help="results log (default: %(default)s)")
+    summ.add_argument("--pass-k", type=int, nargs="+", help="k values (default: 1 and the run's k)")
+    lat = sub.add_parser("latency", help="p50/p95/p99 request latency per provider/model from the telemetry log")
+    lat.add_argument("--log", default=str(TELEMETRY_PATH), help="telemetry log (default: %(default)s)")
+    cases = sub.add_parser("cases", help="the test cases candidates fail most, per model or strategy")
+    cases.add_argument("--matrix", default=str(CASE_RESULTS_PATH), help="case results of a sweep (default: %(default)s)")
+    cases.add_argument("--top", type=int, default=20, help="how many cases to list (default: %(default)s)")
+    cases.add_argument("--by", choices=["model", "strategy"], default="model")
+    args = ap.parse_args(argv)
+    if args.command == "problems":
+        print_problems()
+    elif args.command == "summary":
+        summarize_results(args.results, args.pass_k)
+    elif args.command == "latency":
+        print_latency(latency_table(read_columns(args.log)))
+    elif args.command == "cases":
+        print_case_failures(args.matrix, args.top, args.by)
+
+if __name__ == "__main__":
+    main()
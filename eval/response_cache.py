@@ -0,0 +1,156 @@
+import os, json, time, hashlib, sqlite3, threading, pathlib
+from typing import Dict, Iterable, List, Optional, Tuple
+from model_clients import ModelClient, ModelConfig, sampling
+import telemetry
+
+class CacheMiss(KeyError):
+    """Raised in replay mode when a generation is not in the cache."""
+
+class ResponseCache:
+    """Content-addressed store of model completions in a single SQLite file.
+
+    Entries are keyed by a hash of (provider, model, prompt, temperature,
+    max_tokens, sample index, purpose) and evicted least-recently-used once the
+    stored text exceeds max_bytes. The first text stored under a key stays, so
+    every reader of a key sees the completion that was scored. readonly=True
+    opens the file read-only ("replay"): lookups never write and misses raise
+    CacheMiss instead of calling the model.
+    """
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024, readonly: bool = False):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.readonly = readonly
+        self._lock = threading.Lock()
+        if readonly:
+            uri = pathlib.Path(self.path).resolve().as_uri() + "?mode=ro"
+            self._db = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY, provider TEXT, model TEXT, text TEXT,
+                size INTEGER, created REAL, accessed REAL)""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+            self._db.commit()
+        self._bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @staticmethod
+    def key(cfg: ModelConfig, prompt: str, index: int, purpose: str = "") -> str:
+        """purpose separates generations that share a prompt but are used differently (e.g. self_repair
+        drafts vs scored samples); "" keeps the keys of caches written before it existed."""
+        parts = [cfg.provider.lower(), cfg.model, prompt, *sampling(cfg), index]
+        raw = json.dumps(parts + [purpose] if purpose else parts)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        if not keys:
+            return {}
+        marks = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._db.execute(f"SELECT key, text FROM responses WHERE key IN ({marks})", keys).fetchall()
+            if rows and not self.readonly:
+                self._db.execute(f"UPDATE responses SET accessed=? WHERE key IN ({marks})", [time.time(), *keys])
+                self._db.commit()
+        return dict(rows)
+
+    def put_many(self, cfg: ModelConfig, items: Iterable[Tuple[str, str]]) -> Dict[str, str]:
+        """Store completions under keys that have none yet; returns the stored text of every key.
+
+        A key that another caller (or process) filled first keeps its text, and
+        that is what comes back, so racing generations all settle on one answer.
+        """
+        if self.readonly:
+            raise RuntimeError("response cache is read-only")
+        now = time.time()
+        rows = [(k, cfg.provider.lower(), cfg.model, t or "", len((t or "").encode("utf-8")), now, now) for k, t in items]
+        if not rows:
+            return {}
+        marks = ",".join("?" * len(rows))
+        with self._lock:
+            for row in rows:
+                inserted = self._db.execute("INSERT OR IGNORE INTO responses VALUES (?,?,?,?,?,?,?)", row).rowcount
+                self._bytes += row[4] * inserted
+            stored = dict(self._db.execute(f"SELECT key, text FROM responses WHERE key IN ({marks})",
+                                           [row[0] for row in rows]).fetchall())
+            if self._bytes > self.max_bytes:
+                self._evict()
+            self._db.commit()
+        return stored
+
+    def _evict(self):
+        # Drop least-recently-used entries until we are back under 90% of the budget.
+        target = self.max_bytes * 0.9
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            if self._bytes <= target:
+                break
+            self._db.execute("DELETE FROM responses WHERE key=?", (key,))
+            self._bytes -= size
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"entries": entries, "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+class CachedClient(ModelClient):
+    """Serves generate() from a ResponseCache, calling the wrapped client only for missing samples.
+
+    Sample i of generate(prompt, n) is cached under index i, so raising k on a
+    rerun only pays for the new samples. With a read-only cache `client` may be
+    None: nothing is ever sent to a provider.
+    """
+    def __init__(self, cfg: ModelConfig, cache: ResponseCache, client: Optional[ModelClient] = None):
+        self.cfg = cfg
+        self.cache = cache
+        self.client = client
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, prompt: str, indices: List[int], purpose: str) -> Tuple[List[str], Dict[str, str], List[str]]:
+        n = len(indices)
+        keys = [ResponseCache.key(self.cfg, prompt, i, purpose) for i in indices]
+        found = self.cache.get_many(keys)
+        missing = [k for k in keys if k not in found]
+        self.hits += n - len(missing)
+        trace = telemetry.current()
+        if trace is not None:
+            trace.cache_hits += n - len(missing)
+        self.misses += len(missing)
+        if missing and (self.cache.readonly or self.client is None):
+            raise CacheMiss(f"{len(missing)}/{n} samples for {self.cfg.provider}:{self.cfg.model} not in {self.cache.path}")
+        return keys, found, missing
+
+    def _store(self, found: Dict[str, str], missing: List[str], texts: List[str]):
+        fresh = list(zip(missing, texts))
+        found.update(fresh)
+        found.update(self.cache.put_many(self.cfg, fresh))  # a concurrent writer's text wins over ours
+
+    def generate(self, prompt: str, n: int = 1) -> List[str]:
+        return self.generate_at(prompt, range(n))
+
+    async def agenerate(self, prompt: str, n: int = 1) -> List[str]:
+        return await self.agenerate_at(prompt, range(n))
+
+    def generate_at(self, prompt: str, indices: Iterable[int], purpose: str = "") -> List[str]:
+        """Samples with the given cache indices, e.g. only the ones a shard owns; misses are generated together.
+
+        purpose namespaces the cache keys (see ResponseCache.key).
+        """
+        indices = list(indices)
+        with telemetry.request(self.cfg.provider, self.cfg.model, len(indices)):
+            keys, found, missing = self._lookup(prompt, indices, purpose)
+            if missing:
+                self._store(found, missing, self.client.generate(prompt, n=len(missing)))
+            return [found[k] for k in keys]
+
+    async def agenerate_at(self, prompt: str, indices: Iterable[int], purpose: str = "") -> List[str]:
+        indices = list(indices)
+        with telemetry.request(self.cfg.provider, self.cfg.model, len(indices)):
+            keys, found, missing = self._lookup(prompt, indices, purpose)
+            if missing:
+                self._store(found, missing, await self.client.agenerate(prompt, n=len(missing)))
+            return [found[k] for k in keys]
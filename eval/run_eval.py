@@ -1,159 +1,632 @@
 
-import os, json, pathlib, importlib.util, time, csv
-from typing import Dict, Any, Tuple, List
-from dataclasses import dataclass
-from model_clients import ModelConfig, get_client
-from strategies import extract_python_code, build_problem_spec, fill_template
+import os, json, glob, heapq, pathlib, time, csv, asyncio, hashlib, argparse, contextlib, dataclasses, multiprocessing
+from typing import Dict, Any, Tuple, List, Optional
+from dataclasses import dataclass, field, fields
+from model_clients import (ModelConfig, HedgePolicy, HedgedClient, aget_client, close_clients, configure_http_pool,
+                           configure_rate_limit, connection_stats)
+from response_cache import ResponseCache
+from sandbox import SandboxPool
+from dedup import DedupExecutor, VerdictCache
+from checkpoint import CheckpointLog
+from work_queue import WorkQueue
+import telemetry
+from report import print_pass_at_k
+from strategies import extract_python_code, build_problem_spec, fill_template, get_templates, load_problems
 
 BASE = pathlib.Path(__file__).resolve().parents[1]
-PROBLEMS_DIR = BASE / "problems"
-TESTS_DIR = BASE / "tests"
-PROMPTS_DIR = BASE / "prompts"
 OUT_DIR = BASE / "a1" / "generated"
 
-# Load strategy templates segments
-full = (PROMPTS_DIR / "strategy_templates.md").read_text()
-def between(text, start, end):
-    a = text.index(start) + len(start)
-    b = text.index(end, a)
-    return text[a:b]
-
-TEMPLATES = {
-    "cot": between(full, "## 1) Chain-of-Thought (CoT)", "## 2) Stepwise Chain-of-Thought (SCoT)").strip(),
-    "scot_plan": between(full, "## 2) Stepwise Chain-of-Thought (SCoT)", "## 3) Self-Planning").strip(),
-    "self_planning": between(full, "## 3) Self-Planning", "## 4) Self-Debugging").strip(),
-    "self_debugging": between(full, "## 4) Self-Debugging", "## 5) Self-Edit").strip(),
-    "self_edit": between(full, "## 5) Self-Edit", "## 6) Self-Repair (Iterative)").strip(),
-    "self_repair": full.split("## 6) Self-Repair (Iterative)")[1].strip()
-}
-
 @dataclass
 class EvalConfig:
+    """One sweep: models x strategies x problems, k samples per cell. Sweep files set these fields by name."""
     models: List[Dict[str, Any]]
     strategies: List[str]
-    k: int = 3
+    problems: Optional[List[str]] = None  # problem names to run; None = every problem in problems/
+    k: int = 3              # samples drawn per (model, strategy, problem) cell
+    pass_ks: Optional[List[int]] = None  # k values to report pass@k for; None = [1, k]
     max_repairs: int = 2
+    repair_token_budget: Optional[int] = None  # est. tokens all self_repair chains may spend; None = no cap
     results_path: str = str(OUT_DIR / "results.jsonl")
     csv_summary_path: str = str(OUT_DIR / "summary.csv")
     log_prompts_path: str = str(OUT_DIR / "prompts_used.jsonl")
+    checkpoint_path: str = str(OUT_DIR / "checkpoint.jsonl")
+    telemetry_path: Optional[str] = str(OUT_DIR / "telemetry.jsonl")  # per-request timings (report.py latency); None = off
+    case_results_path: Optional[str] = str(OUT_DIR / "case_results.npz")  # per-case outcome matrix (report.py cases); None = off
+    resume: bool = False    # skip (model, strategy, problem, sample) cells already in the checkpoint
+    concurrency: int = 16   # max generate requests in flight across the whole grid
+    queue_size: int = 64    # generated candidates waiting for a sandbox worker
+    cache_path: Optional[str] = str(OUT_DIR / "response_cache.sqlite")  # None disables the cache
+    replay: bool = False    # serve only cached generations; never call a provider
+    stream: bool = False    # stream completions and stop each at its first closed code block
+    http_max_connections: int = 100     # per provider endpoint, shared by all clients in the process
+    http2: bool = False                 # multiplex requests over HTTP/2 (needs httpx[http2])
+    exec_workers: Optional[int] = None  # sandbox processes; None = one per core
+    exec_timeout: float = 10.0          # wall-clock seconds per candidate
+    exec_memory_mb: int = 1024          # address-space limit per sandbox worker
+    exec_case_timeout: Optional[float] = None  # wall-clock seconds per test case; None = only exec_timeout
+    exec_fail_fast: bool = False        # stop each suite at its first failing case (case results are partial)
+    exec_scale: bool = False            # also run the suites' stress cases (the scale tier)
+    exec_scale_timeout: float = 120.0   # wall-clock and CPU seconds per candidate with exec_scale, in place of exec_timeout
+    verdict_cache_path: Optional[str] = str(OUT_DIR / "verdicts.sqlite")  # None = dedup within this run only
+    adaptive: bool = False              # after max(k, adaptive_k) samples per cell, spend the rest on the least certain cells
+    adaptive_k: int = 1                 # which pass@k the stopping rule watches
+    adaptive_tolerance: float = 0.1     # a cell is settled once its CI half-width is at most this
+    adaptive_confidence: float = 0.95
+    adaptive_batch: int = 2             # samples drawn per round for an unsettled cell
+    adaptive_max_samples: Optional[int] = None  # per-cell cap; None = 4 * k
+    adaptive_budget: Optional[int] = None       # samples for the whole grid; None = twice every cell's reserve
+    rate_limits: Dict[str, Dict[str, Any]] = field(default_factory=dict)  # provider -> {rpm, tpm, max_concurrency}
+    hedge: Dict[str, Dict[str, Any]] = field(default_factory=dict)  # provider -> HedgePolicy fields; backups as model dicts
+    shard: Optional[List[int]] = None   # [index, count]: run only the samples this shard owns (see shard_of)
+    queue_path: str = str(OUT_DIR / "work_queue.sqlite")  # cells that --workers processes lease
+    lease_timeout: float = 300.0        # seconds without a heartbeat before a worker's cells are re-queued
+    worker: Optional[int] = None        # set by run_workers: run the cells leased from queue_path
 
-def load_test_runner(test_path: pathlib.Path):
-    spec = importlib.util.spec_from_file_location(test_path.stem, str(test_path))
-    mod = importlib.util.module_from_spec(spec)  # type: ignore
-    assert spec and spec.loader
-    spec.loader.exec_module(mod)  # type: ignore
-    return mod.run_tests
+def load_sweep(path: str, **overrides) -> EvalConfig:
+    """Read an EvalConfig from a JSON or YAML sweep file (YAML needs PyYAML); overrides win over the file."""
+    text = pathlib.Path(path).read_text()
+    if str(path).endswith((".yaml", ".yml")):
+        try:
+            import yaml  # type: ignore
+        except ImportError as e:
+            raise RuntimeError("PyYAML is needed for YAML sweep files (pip install pyyaml), or use JSON") from e
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+    data.update(overrides)
+    unknown = set(data) - {f.name for f in fields(EvalConfig)}
+    if unknown:
+        raise ValueError(f"Unknown sweep settings in {path}: {', '.join(sorted(unknown))}")
+    return EvalConfig(**data)
 
-def run_single_candidate(code: str, func_name: str, test_runner) -> Tuple[bool, List[str]]:
-    ns = {}
-    try:
-        exec(code, ns, ns)
-    except Exception as e:
-        return False, [f"Code failed to import: {e}"]
-    if func_name not in ns or not callable(ns[func_name]):
-        return False, [f"Function {func_name} not found after exec"]
-    try:
-        passed, failures = test_runner(ns[func_name])
-        return passed, failures
-    except Exception as e:
-        return False, [f"Test runner error: {e}"]
-
-def iter_self_repair(client, base_prompt, func_name, test_runner, templates, max_repairs=2):
-    texts = client.generate(base_prompt, n=1)
-    code = extract_python_code(texts[0])
-    passed, failures = run_single_candidate(code, func_name, test_runner)
-    history = [{"code": code, "passed": passed, "failures": failures}]
-    if passed:
-        return code, history
-
-    repair_tmpl = templates["self_repair"]
-    for _ in range(max_repairs):
-        repair_prompt = fill_template(repair_tmpl, "", CURRENT_CODE=code, TEST_ERRORS="\n".join(failures))
-        texts = client.generate(repair_prompt, n=1)
-        code = extract_python_code(texts[0])
-        passed, failures = run_single_candidate(code, func_name, test_runner)
-        history.append({"code": code, "passed": passed, "failures": failures})
+def hedge_policy(spec: Optional[Dict[str, Any]]) -> Optional[HedgePolicy]:
+    if spec is None:
+        return None
+    spec = dict(spec)
+    return HedgePolicy(backups=[ModelConfig(**b) for b in spec.pop("backups", [])], **spec)
+
+def plan_cells(cfg: EvalConfig) -> List[Tuple[Dict[str, Any], str, Dict[str, str]]]:
+    """The whole grid up front, as (model dict, strategy, problem) cells in report order."""
+    problems = load_problems()
+    if cfg.problems is not None:
+        known = {p["name"] for p in problems}
+        missing = [name for name in cfg.problems if name not in known]
+        if missing:
+            raise ValueError(f"Unknown problems: {', '.join(missing)}")
+        problems = [p for p in problems if p["name"] in cfg.problems]
+    return [(m, strat, p) for m in cfg.models for strat in cfg.strategies for p in problems]
+
+class TokenBudget:
+    """Tokens (prompt + completion, ~4 chars each) that repair rounds may still spend across the grid; None = no cap."""
+    def __init__(self, total: Optional[int]):
+        self.left = total
+
+    def spend(self, *texts: str):
+        if self.left is not None:
+            self.left -= sum(len(t) for t in texts) // 4
+
+    def exhausted(self) -> bool:
+        return self.left is not None and self.left <= 0
+
+async def self_repair(client, base_prompt: str, func_name: str, test_path, max_repairs: int, pool,
+                      gen_sem: asyncio.Semaphore, tokens: TokenBudget) -> Tuple[str, List[Dict[str, Any]]]:
+    """One repair chain: generate, test, and feed the failures back, up to max_repairs times.
+
+    Each round holds a generate slot only while generating and awaits its
+    sandbox run, so the chains of every cell interleave on one event loop. The
+    first attempt always runs; repair rounds stop once `tokens` is spent.
+    """
+    repair_tmpl = get_templates()["self_repair"]
+    prompt, history = base_prompt, []
+    for attempt in range(max_repairs + 1):
+        async with gen_sem:
+            if attempt and tokens.exhausted():
+                break
+            tokens.spend(prompt)  # charged up front, so chains starting together can't all overdraw
+            # its own cache namespace: attempt 0 shares the cot prompt and index with a scored cot sample
+            text = (await draw(client, prompt, [0], purpose="self_repair"))[0]
+        tokens.spend(text)
+        code = extract_python_code(text)
+        passed, failures, cases = await pool.arun(code, func_name, test_path)
+        history.append({"code": code, "passed": passed, "failures": failures, "cases": cases})
         if passed:
             break
+        prompt = fill_template(repair_tmpl, "", CURRENT_CODE=code, TEST_ERRORS="\n".join(failures))
     return code, history
 
-def main():
-    cfg = EvalConfig(
-        models=[
-            {"provider":"openai", "model":"gpt-4o-mini"},
-            {"provider":"anthropic", "model":"claude-3-5-sonnet"},
-        ],
-        strategies=["cot", "self_edit"],
-        k=3
+def cell_prompt(strat: str, p: Dict[str, str]) -> str:
+    # self_repair starts from a CoT attempt and then iterates on test feedback
+    return fill_template(get_templates()["cot" if strat == "self_repair" else strat], build_problem_spec(p["md_path"]))
+
+def report_ks(cfg: EvalConfig) -> List[int]:
+    return sorted(set(cfg.pass_ks or [1, cfg.k]))
+
+def make_record(cfg: EvalConfig, model_dict: Dict[str, Any], strat: str, p: Dict[str, str], history_all: List[Dict[str, Any]]):
+    """Build the results.jsonl record and summary.csv row for one finished cell."""
+    if strat == "self_repair":
+        # a repair chain is one sample that either ends passing or not
+        n, successes = 1, int(history_all[-1]["passed"] if history_all else 0)
+    else:
+        n, successes = len(history_all), sum(1 for h in history_all if h["passed"])
+    from metrics import pass_at_k  # numpy stays out of CLI startup
+    ks = report_ks(cfg)
+    est = pass_at_k(n, successes, ks)[0]
+    pass_at = {str(k): (None if v != v else float(v)) for k, v in zip(ks, est)}  # NaN (k > n) -> null
+    record = {
+        "ts": time.time(),
+        "problem": p["name"],
+        "model": model_dict,
+        "strategy": strat,
+        "k": cfg.k,
+        "n": n,
+        "successes": successes,
+        "pass_at_k": 1.0 if successes>0 else 0.0,
+        "pass_at": pass_at,
+        "history": history_all,
+    }
+    row = [p["name"], f"{model_dict['provider']}:{model_dict['model']}", strat, cfg.k, successes, 1 if successes>0 else 0]
+    row += ["" if pass_at[str(k)] is None else round(pass_at[str(k)], 4) for k in ks]
+    return record, row
+
+async def draw(client, prompt: str, indices: List[int], purpose: str = "") -> List[str]:
+    """Generate the completions for sample indices `indices` of one prompt (purpose: see ResponseCache.key)."""
+    if not indices:
+        return []
+    if hasattr(client, "agenerate_at"):
+        # cached samples keep their index, so only the missing indices are generated
+        texts = await client.agenerate_at(prompt, indices, purpose)
+    else:
+        texts = await client.agenerate(prompt, n=len(indices))
+    return texts + [""] * (len(indices) - len(texts))  # a completion the provider never returned counts as failed
+
+def shard_of(model_dict: Dict[str, Any], strategy: str, problem: str, sample: int, shards: int) -> int:
+    """Shard that owns one sample: a hash of its checkpoint key, identical on every machine."""
+    key = json.dumps(CheckpointLog.key(model_dict, strategy, problem, sample))
+    return int.from_bytes(hashlib.sha256(key.encode("utf-8")).digest()[:8], "big") % shards
+
+def shard_path(path: str, shard: List[int]) -> str:
+    """checkpoint.jsonl -> checkpoint.shard-2-of-8.jsonl, so shards sharing a disk don't collide."""
+    p = pathlib.Path(path)
+    return str(p.with_name(f"{p.stem}.shard-{shard[0]}-of-{shard[1]}{p.suffix}"))
+
+def sample_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """A checkpointed sample as a history entry; entries from before per-case results have no cases."""
+    return {"code": entry["code"], "passed": entry["passed"], "failures": entry["failures"], "cases": entry.get("cases")}
+
+def write_case_matrix(cfg: EvalConfig, records: List[Dict[str, Any]]):
+    if cfg.case_results_path:
+        from case_matrix import CaseMatrix  # numpy stays out of CLI startup
+        CaseMatrix.from_records(records).save(cfg.case_results_path)
+
+def write_summary_csv(cfg: EvalConfig, rows: List[List[Any]]):
+    with open(cfg.csv_summary_path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["problem","model","strategy","k","successes","pass@k (0/1)"] + [f"pass@{k}" for k in report_ks(cfg)])
+        w.writerows(rows)
+
+def sharded(cfg: EvalConfig) -> EvalConfig:
+    """cfg with per-shard log paths, after checking the shard spec."""
+    index, count = cfg.shard
+    if not 0 <= index < count:
+        raise ValueError(f"Shard index must be in 0..{count - 1}, got {index}")
+    if cfg.adaptive:
+        raise ValueError("Adaptive sampling reallocates samples across the whole grid and can't be sharded")
+    return dataclasses.replace(
+        cfg,
+        checkpoint_path=shard_path(cfg.checkpoint_path, cfg.shard),
+        log_prompts_path=shard_path(cfg.log_prompts_path, cfg.shard),
+        telemetry_path=cfg.telemetry_path and shard_path(cfg.telemetry_path, cfg.shard),
     )
 
-    problems = []
-    for md in sorted(PROBLEMS_DIR.glob("*.md")):
-        func_name = md.stem
-        problems.append({
-            "name": md.stem,
-            "md_path": str(md),
-            "func_name": func_name,
-            "test_path": str(TESTS_DIR / f"test_{md.stem}.py"),
-        })
+def worker_path(path: str, worker: Any) -> str:
+    p = pathlib.Path(path)
+    return str(p.with_name(f"{p.stem}.worker-{worker}{p.suffix}"))
+
+def as_worker(cfg: EvalConfig) -> EvalConfig:
+    """cfg with per-worker log paths, after checking the sweep can be split into leased cells."""
+    if cfg.adaptive:
+        raise ValueError("Adaptive sampling reallocates samples across the whole grid and can't be split across workers")
+    if cfg.shard is not None:
+        raise ValueError("--workers splits the whole grid; it can't be combined with --shard")
+    return dataclasses.replace(
+        cfg,
+        checkpoint_path=worker_path(cfg.checkpoint_path, cfg.worker),
+        log_prompts_path=worker_path(cfg.log_prompts_path, cfg.worker),
+        telemetry_path=cfg.telemetry_path and worker_path(cfg.telemetry_path, cfg.worker),
+    )
+
+def grid_fingerprint(cfg: EvalConfig, plan: List[Tuple[Dict[str, Any], str, Dict[str, str]]]) -> str:
+    """Identifies the grid behind a work queue, so workers never lease cells of a different sweep."""
+    cells = [CheckpointLog.key(model_dict, strat, p["name"], 0)[:3] for model_dict, strat, p in plan]
+    return hashlib.sha256(json.dumps([cfg.k, cells]).encode("utf-8")).hexdigest()
+
+def run_worker(cfg: EvalConfig):
+    try:
+        asyncio.run(amain(cfg))
+    finally:
+        close_clients()
+
+def run_workers(cfg: EvalConfig, workers: int) -> List[Dict[str, Any]]:
+    """Run the grid on `workers` local processes that lease cells from a work queue, then merge their logs.
+
+    Cells go to whichever worker is free, so one slow cell doesn't hold up a
+    static share of the grid; cells of a worker that dies are re-queued once
+    its lease times out. With resume, finished cells stay done.
+    """
+    as_worker(dataclasses.replace(cfg, worker=0))  # validate before starting anything
+    plan = plan_cells(cfg)
+    work = WorkQueue(cfg.queue_path)
+    work.fill(len(plan), grid_fingerprint(cfg, plan), reset=not cfg.resume)
+    if not cfg.resume:
+        for path in glob.glob(worker_path(cfg.checkpoint_path, "*")):
+            os.remove(path)
+    # spawn, not fork: the parent may already hold provider clients and threads
+    ctx = multiprocessing.get_context("spawn")
+    # concurrency is for the whole grid, so the workers split it
+    share = max(1, cfg.concurrency // workers)
+    procs = [ctx.Process(target=run_worker, args=(dataclasses.replace(cfg, worker=w, concurrency=share),), name=f"worker-{w}")
+             for w in range(workers)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    print(f"Work queue {cfg.queue_path}: {work.counts()}")
+    work.close()
+    crashed = [proc.name for proc in procs if proc.exitcode]
+    if crashed:
+        print(f"Warning: {', '.join(crashed)} exited with errors; rerun with --resume to finish their cells")
+    return merge_shards(cfg, sorted(glob.glob(worker_path(cfg.checkpoint_path, "*"))))
+
+def merge_shards(cfg: EvalConfig, checkpoint_paths: List[str]) -> List[Dict[str, Any]]:
+    """Combine shard checkpoint logs into results.jsonl and summary.csv for the whole grid."""
+    done: Dict[Any, Dict[str, Any]] = {}
+    for path in checkpoint_paths:
+        for entry in CheckpointLog.read(path):
+            done[CheckpointLog.key(entry["model"], entry["strategy"], entry["problem"], entry["sample"])] = entry
+    records, rows, missing = [], [], 0
+    for model_dict, strat, p in plan_cells(cfg):
+        samples = [0] if strat == "self_repair" else range(cfg.k)
+        entries = [done.get(CheckpointLog.key(model_dict, strat, p["name"], j)) for j in samples]
+        missing += sum(e is None for e in entries)
+        if all(e is None for e in entries):
+            continue
+        if strat == "self_repair":
+            history = entries[0]["history"]
+        else:
+            history = [sample_entry(e) for e in entries if e]
+        record, row = make_record(cfg, model_dict, strat, p, history)
+        records.append(record)
+        rows.append(row)
+    with open(cfg.results_path, "w") as f:
+        f.writelines(json.dumps(r) + "\n" for r in records)
+    write_summary_csv(cfg, rows)
+    write_case_matrix(cfg, records)
+    print_pass_at_k([{k: v for k, v in r.items() if k != "history"} for r in records], report_ks(cfg))
+    if missing:
+        print(f"Warning: {missing} samples of the grid are in none of the {len(checkpoint_paths)} checkpoint logs")
+    print(f"Merged {len(checkpoint_paths)} checkpoint logs into {cfg.results_path} and {cfg.csv_summary_path}")
+    return records
+
+async def amain(cfg: EvalConfig) -> List[Dict[str, Any]]:
+    """Run the sweep; returns the results.jsonl records in grid order (none for a shard, see merge_shards)."""
+    from metrics import is_settled, pass_at_k_interval
+    if cfg.shard is not None:
+        cfg = sharded(cfg)
+    if cfg.worker is not None:
+        cfg = as_worker(cfg)
+    partial = cfg.shard is not None or cfg.worker is not None
+    plan = plan_cells(cfg)
+    cache = ResponseCache(cfg.cache_path, readonly=cfg.replay) if cfg.cache_path else None
+    configure_http_pool(max_connections=cfg.http_max_connections, http2=cfg.http2)
+    for provider, limits in cfg.rate_limits.items():
+        configure_rate_limit(provider, **limits)
+    telemetry.start_log(cfg.telemetry_path)
+    clients = await asyncio.gather(*(aget_client(ModelConfig(**{"stream": cfg.stream, **m}), cache,
+                                                 hedge_policy(cfg.hedge.get(m["provider"])))
+                                     for m in cfg.models))
+    client_of = {id(m): c for m, c in zip(cfg.models, clients)}
+    cells = [(model_dict, client_of[id(model_dict)], strat, p) for model_dict, strat, p in plan]
+
+    # Cell tasks generate (network-bound) and push candidates onto a bounded queue that
+    # sandbox consumers (CPU-bound) drain, so both stay busy; each cell is written out
+    # as soon as its last sample has been tested, i.e. in completion order.
+    gen_sem = asyncio.Semaphore(cfg.concurrency)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=cfg.queue_size)
+    summary_rows: List[Tuple[int, List[Any]]] = []
+    records: List[Tuple[int, Dict[str, Any]]] = []
+    cell_counts: List[Dict[str, Any]] = []  # records without histories, for the pass@k summary
+    exec_timeout = cfg.exec_scale_timeout if cfg.exec_scale else cfg.exec_timeout
+    sandbox = SandboxPool(cfg.exec_workers, timeout=exec_timeout, cpu_seconds=int(exec_timeout), memory_mb=cfg.exec_memory_mb,
+                          case_timeout=cfg.exec_case_timeout, fail_fast=cfg.exec_fail_fast, scale=cfg.exec_scale)
+    # Duplicate candidates (same AST modulo docstrings) are executed once per suite version.
+    verdicts = VerdictCache(cfg.verdict_cache_path) if cfg.verdict_cache_path else None
+    pool = DedupExecutor(sandbox, verdicts)
+    # Every finished sample is fsync'd here; results.jsonl is rebuilt from it on --resume.
+    ckpt = CheckpointLog(cfg.checkpoint_path, resume=cfg.resume)
+    # In adaptive mode every sampling cell first draws its reserve, enough to estimate pass@k
+    # at the reported k; the rest of the grid's budget then goes to the widest intervals.
+    reserve = max(cfg.k, cfg.adaptive_k)
+    adaptive_cap = max(reserve, cfg.adaptive_max_samples or 4 * cfg.k)
+    adaptive_budget = cfg.adaptive_budget or 2 * reserve * sum(1 for c in cells if c[2] != "self_repair")
+    pooled: Dict[int, Tuple[Dict[int, Dict[str, Any]], Any]] = {}  # cell -> (history, run_samples), for allocate
+    repair_tokens = TokenBudget(cfg.repair_token_budget)
+
+    def mine(model_dict: Dict[str, Any], strat: str, p: Dict[str, str], j: int) -> bool:
+        return cfg.shard is None or shard_of(model_dict, strat, p["name"], j, cfg.shard[1]) == cfg.shard[0]
 
     os.makedirs(OUT_DIR, exist_ok=True)
-    with open(cfg.results_path, "w") as results_f, open(cfg.log_prompts_path, "w") as prompts_f:
-        summary_rows = []
-        for model_dict in cfg.models:
-            client = get_client(ModelConfig(**model_dict))
-
-            for strat in cfg.strategies:
-                for p in problems:
-                    test_runner = load_test_runner(pathlib.Path(p["test_path"]))
-                    prob_spec = build_problem_spec(p["md_path"])
-
-                    successes = 0
-                    history_all = []
-                    if strat == "self_repair":
-                        base_prompt = fill_template(TEMPLATES["cot"], prob_spec)
-                        code, history = iter_self_repair(client, base_prompt, p["func_name"], test_runner, TEMPLATES, max_repairs=cfg.max_repairs)
-                        successes = int(history[-1]["passed"] if history else 0)
-                        history_all = history
-                        prompts_f.write(json.dumps({
-                            "ts": time.time(), "model": model_dict, "strategy": strat,
-                            "prompt": base_prompt
-                        }) + "\n")
-                    else:
-                        prompt = fill_template(TEMPLATES[strat], prob_spec)
-                        texts = client.generate(prompt, n=cfg.k)
-                        prompts_f.write(json.dumps({
-                            "ts": time.time(), "model": model_dict, "strategy": strat,
-                            "prompt": prompt
-                        }) + "\n")
-                        for t in texts:
-                            code = extract_python_code(t)
-                            passed, failures = run_single_candidate(code, p["func_name"], test_runner)
-                            history_all.append({"code": code, "passed": passed, "failures": failures})
-                            if passed:
-                                successes += 1
-
-                    record = {
-                        "ts": time.time(),
-                        "problem": p["name"],
-                        "model": model_dict,
-                        "strategy": strat,
-                        "k": cfg.k,
-                        "successes": successes,
-                        "pass_at_k": 1.0 if successes>0 else 0.0,
-                        "history": history_all,
-                    }
-                    results_f.write(json.dumps(record)+"\n")
-                    summary_rows.append([p["name"], f"{model_dict['provider']}:{model_dict['model']}", strat, cfg.k, successes, 1 if successes>0 else 0])
-
-    # CSV summary
-    with open(OUT_DIR / "summary.csv", "w", newline="") as f:
-        import csv
-        w = csv.writer(f)
-        w.writerow(["problem","model","strategy","k","successes","pass@k (0/1)"])
-        w.writerows(summary_rows)
+    # a shard or worker holds only part of the grid, so it leaves results/summary to merge_shards
+    results_cm = open(cfg.results_path, "w") if not partial else contextlib.nullcontext()
+    with results_cm as results_f, open(cfg.log_prompts_path, "a" if cfg.resume else "w") as prompts_f:
+        def finish(i: int, history_all: List[Dict[str, Any]]):
+            if results_f is None:
+                return
+            model_dict, _, strat, p = cells[i]
+            record, row = make_record(cfg, model_dict, strat, p, history_all)
+            results_f.write(json.dumps(record)+"\n")
+            results_f.flush()
+            summary_rows.append((i, row))
+            records.append((i, record))
+            cell_counts.append({k: v for k, v in record.items() if k != "history"})
+
+        async def execute(i: int, j: int, code: str) -> Dict[str, Any]:
+            fut = asyncio.get_running_loop().create_future()
+            await queue.put((i, j, code, fut))
+            return await fut
+
+        async def produce(i: int):
+            model_dict, client, strat, p = cells[i]
+            if strat == "self_repair":
+                if not mine(model_dict, strat, p, 0):
+                    return
+                done = ckpt.get(model_dict, strat, p["name"], 0)
+                if done:
+                    finish(i, done["history"])
+                    return
+                prompt = cell_prompt(strat, p)
+                prompts_f.write(json.dumps({
+                    "ts": time.time(), "model": model_dict, "strategy": strat,
+                    "problem": p["name"], "prompt": prompt
+                }) + "\n")
+                code, history = await self_repair(client, prompt, p["func_name"], p["test_path"], cfg.max_repairs, pool,
+                                                  gen_sem, repair_tokens)
+                ckpt.record(model_dict, strat, p["name"], 0, history=history)
+                finish(i, history)
+                return
+
+            limit = adaptive_cap if cfg.adaptive else cfg.k
+            history = {}
+            for j, d in enumerate(ckpt.samples(model_dict, strat, p["name"], limit)):
+                if d:
+                    history[j] = sample_entry(d)
+            prompt = cell_prompt(strat, p)
+            logged = False
+
+            async def run_samples(indices: List[int]):
+                nonlocal logged
+                if not logged:
+                    prompts_f.write(json.dumps({
+                        "ts": time.time(), "model": model_dict, "strategy": strat,
+                        "problem": p["name"], "prompt": prompt
+                    }) + "\n")
+                    logged = True
+                async with gen_sem:
+                    texts = await draw(client, prompt, indices)
+                outcomes = await asyncio.gather(*(execute(i, j, extract_python_code(t)) for j, t in zip(indices, texts)))
+                history.update(zip(indices, outcomes))
+
+            todo = [j for j in range(reserve if cfg.adaptive else cfg.k) if j not in history and mine(model_dict, strat, p, j)]
+            if todo:
+                await run_samples(todo)
+            if cfg.adaptive:
+                pooled[i] = (history, run_samples)  # finished by allocate
+                return
+            finish(i, [history[j] for j in sorted(history)])
+
+        async def allocate():
+            """Spend the adaptive budget left after the reserves, widest pass@k interval first.
+
+            Each round grants one batch to each of the `concurrency` widest unsettled
+            cells, then re-ranks them on their new intervals.
+            """
+            left = adaptive_budget - sum(len(history) for history, _ in pooled.values())
+            while left > 0:
+                open_cells = []
+                for i, (history, _) in pooled.items():
+                    n, c = len(history), sum(1 for h in history.values() if h["passed"])
+                    if n < adaptive_cap and not is_settled(n, c, cfg.adaptive_k, cfg.adaptive_tolerance, cfg.adaptive_confidence):
+                        lo, hi = pass_at_k_interval(n, c, cfg.adaptive_k, cfg.adaptive_confidence)
+                        open_cells.append((float(lo - hi), i))  # widest first
+                if not open_cells:
+                    break
+                grants = []
+                for _, i in heapq.nsmallest(cfg.concurrency, open_cells):
+                    history, run_samples = pooled[i]
+                    take = min(cfg.adaptive_batch, adaptive_cap - len(history), left)
+                    if take <= 0:
+                        break
+                    left -= take
+                    grants.append(run_samples([j for j in range(adaptive_cap) if j not in history][:take]))
+                await asyncio.gather(*grants)
+            for i in sorted(pooled):
+                history = pooled[i][0]
+                finish(i, [history[j] for j in sorted(history)])
+
+        async def consume():
+            while True:
+                i, j, code, fut = await queue.get()
+                try:
+                    model_dict, _, strat, p = cells[i]
+                    passed, failures, cases = await pool.arun(code, p["func_name"], p["test_path"])
+                    ckpt.record(model_dict, strat, p["name"], j, code=code, passed=passed, failures=failures, cases=cases)
+                    fut.set_result({"code": code, "passed": passed, "failures": failures, "cases": cases})
+                except Exception as e:
+                    fut.set_exception(e)
+                finally:
+                    queue.task_done()
 
-    print("Done. See a1/generated/results.jsonl and a1/generated/summary.csv")
+        async def lease_cells(work: WorkQueue, name: str):
+            while True:
+                i = await asyncio.to_thread(work.lease, name, cfg.lease_timeout)
+                if i is None:
+                    if await asyncio.to_thread(work.finished):
+                        return
+                    await asyncio.sleep(min(1.0, cfg.lease_timeout / 10))  # other workers' leases may still expire
+                    continue
+                try:
+                    await produce(i)
+                except BaseException:
+                    work.release(i, name)
+                    raise
+                await asyncio.to_thread(work.complete, i)
+
+        async def heartbeat(work: WorkQueue, name: str):
+            while True:
+                await asyncio.sleep(cfg.lease_timeout / 3)
+                await asyncio.to_thread(work.renew, name, cfg.lease_timeout)
+
+        async def run_leased():
+            work = WorkQueue(cfg.queue_path)
+            work.check(grid_fingerprint(cfg, plan))
+            name = f"{cfg.worker}:{os.getpid()}"
+            # as many cells in flight as generate requests this worker may make
+            tasks = [asyncio.create_task(lease_cells(work, name)) for _ in range(cfg.concurrency)]
+            beat = asyncio.create_task(heartbeat(work, name))
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for t in tasks + [beat]:
+                    t.cancel()
+                await asyncio.gather(*tasks, beat, return_exceptions=True)
+                work.close()
+
+        consumers = [asyncio.create_task(consume()) for _ in range(pool.workers)]
+        try:
+            if cfg.worker is None:
+                await asyncio.gather(*(produce(i) for i in range(len(cells))))
+                if cfg.adaptive:
+                    await allocate()
+            else:
+                await run_leased()
+        finally:
+            for c in consumers:
+                c.cancel()
+            sandbox.close()
+            ckpt.close()
+            if verdicts:
+                verdicts.close()
+            telemetry.stop_log()
+
+    if cfg.shard is not None:
+        print(f"Shard {cfg.shard[0]}/{cfg.shard[1]} done: {len(ckpt.done)} samples in {cfg.checkpoint_path}")
+        print("Merge the shards' checkpoint logs with --merge once they have all finished")
+        return []
+    if cfg.worker is not None:
+        print(f"Worker {cfg.worker} done: {len(ckpt.done)} samples in {cfg.checkpoint_path}")
+        return []
+
+    # CSV summary, in grid order
+    write_summary_csv(cfg, [row for _, row in sorted(summary_rows, key=lambda r: r[0])])
+    ordered = [r for _, r in sorted(records, key=lambda r: r[0])]
+    write_case_matrix(cfg, ordered)
+    print_pass_at_k(cell_counts, report_ks(cfg))
+    print(f"Executed {pool.executed} candidates, reused {pool.reused} verdicts for duplicates")
+    for endpoint, stats in connection_stats().items():
+        print(f"{endpoint}: {stats['requests']} requests over {stats['connections']} connections ({stats['reused']} reused)")
+    for model_dict, client in zip(cfg.models, clients):
+        hedged = getattr(client, "client", client)  # behind the response cache, if any
+        if isinstance(hedged, HedgedClient):
+            print(f"Hedging {model_dict['provider']}:{model_dict['model']}: {hedged.stats()}")
+    print(f"Done. See {cfg.results_path} and {cfg.csv_summary_path}")
+    if cfg.telemetry_path:
+        print(f"Request timings: python -m eval latency --log {cfg.telemetry_path}")
+    if cfg.case_results_path:
+        print(f"Failing test cases: python -m eval cases --matrix {cfg.case_results_path}")
+    return ordered
+
+DEFAULT_SWEEP = pathlib.Path(__file__).resolve().parent / "sweeps" / "default.json"
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Evaluate models x strategies over problems/")
+    ap.add_argument("sweep", nargs="?", help="JSON/YAML sweep file of EvalConfig settings (default: eval/sweeps/default.json)")
+    ap.add_argument("--plan", action="store_true", help="print the grid and exit without running it")
+    ap.add_argument("--shard", help="i/N: run only the samples owned by shard i of N (0-based); merge afterwards")
+    ap.add_argument("--merge", nargs="*", metavar="CHECKPOINT",
+                    help="combine shard/worker checkpoint logs (default: the sweep's checkpoint.shard-*-of-*.jsonl "
+                         "and checkpoint.worker-*.jsonl) into results and summary")
+    ap.add_argument("--workers", type=int, help="run on N local processes that lease cells from a work queue")
+    ap.add_argument("--cache", default=EvalConfig.cache_path, help="response cache file (default: %(default)s)")
+    ap.add_argument("--no-cache", action="store_true", help="always call the provider")
+    ap.add_argument("--replay", action="store_true", help="serve generations from the cache only; fail on a miss")
+    ap.add_argument("--resume", action="store_true", help="continue from the checkpoint log, skipping finished samples")
+    ap.add_argument("--pass-k", type=int, nargs="+", help="k values to report unbiased pass@k for (default: 1 and k)")
+    ap.add_argument("--adaptive", action="store_true", help="after k samples per cell, spend the rest of the budget on the cells whose pass@k is least certain")
+    ap.add_argument("--stream", action="store_true", help="stream completions and stop at the first closed code block")
+    ap.add_argument("--http2", action="store_true", help="use HTTP/2 for provider connections (needs httpx[http2])")
+    ap.add_argument("--max-connections", type=int, help="connection pool size per provider endpoint")
+    ap.add_argument("--tolerance", type=float, help="adaptive: pass@k CI half-width to stop at")
+    ap.add_argument("--case-timeout", type=float, help="wall-clock seconds per test case")
+    ap.add_argument("--fail-fast", action="store_true", help="stop each test suite at its first failing case")
+    ap.add_argument("--scale", action="store_true", help="also run the stress cases that check candidates' efficiency")
+    args = ap.parse_args(argv)
+
+    # flags given on the command line override the sweep file
+    overrides: Dict[str, Any] = {}
+    if args.no_cache:
+        overrides["cache_path"] = None
+    elif args.cache != EvalConfig.cache_path:
+        overrides["cache_path"] = args.cache
+    for flag, name in (("replay", "replay"), ("resume", "resume"), ("adaptive", "adaptive"), ("stream", "stream"), ("http2", "http2"),
+                       ("fail_fast", "exec_fail_fast"), ("scale", "exec_scale")):
+        if getattr(args, flag):
+            overrides[name] = True
+    for flag, name in (("pass_k", "pass_ks"), ("max_connections", "http_max_connections"), ("tolerance", "adaptive_tolerance"),
+                       ("case_timeout", "exec_case_timeout")):
+        if getattr(args, flag) is not None:
+            overrides[name] = getattr(args, flag)
+    if args.shard:
+        try:
+            overrides["shard"] = [int(x) for x in args.shard.split("/")]
+            assert len(overrides["shard"]) == 2
+        except (ValueError, AssertionError):
+            ap.error(f"--shard expects i/N, got {args.shard!r}")
+    try:
+        cfg = load_sweep(args.sweep or str(DEFAULT_SWEEP), **overrides)
+        cells = plan_cells(cfg)
+        if cfg.shard is not None:
+            sharded(cfg)  # validate before starting anything
+        if args.workers:
+            as_worker(dataclasses.replace(cfg, worker=0))
+    except (OSError, ValueError, TypeError) as e:
+        ap.error(str(e))
+
+    if args.merge is not None:
+        paths = args.merge or sorted(glob.glob(shard_path(cfg.checkpoint_path, ["*", "*"]))
+                                     + glob.glob(worker_path(cfg.checkpoint_path, "*")))
+        if not paths:
+            ap.error("no shard checkpoint logs to merge")
+        merge_shards(cfg, paths)
+        return
+
+    if args.plan:
+        samples = sum(1 if strat == "self_repair" else cfg.k for _, strat, _ in cells)
+        problems = len({p["name"] for _, _, p in cells})
+        print(f"{len(cfg.models)} models x {len(cfg.strategies)} strategies x {problems} problems"
+              f" = {len(cells)} cells, {samples} samples")
+        if cfg.shard is not None:
+            owned = sum(shard_of(m, strat, p["name"], j, cfg.shard[1]) == cfg.shard[0]
+                        for m, strat, p in cells for j in range(1 if strat == "self_repair" else cfg.k))
+            print(f"shard {cfg.shard[0]}/{cfg.shard[1]} owns {owned} of them")
+        for model_dict, strat, p in cells:
+            print(f"  {model_dict['provider'] + ':' + model_dict['model']:40} {strat:16} {p['name']}")
+        return
+    if args.workers:
+        run_workers(cfg, args.workers)
+        return
+    try:
+        asyncio.run(amain(cfg))
+    finally:
+        close_clients()
 
 if __name__ == "__main__":
     main()
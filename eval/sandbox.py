@@ -0,0 +1,220 @@
+import os, io, sys, types, queue, signal, asyncio, pathlib, contextlib, multiprocessing
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dedup import suite_hash
+
+try:
+    import resource
+except ImportError:  # not available on Windows; run without rlimits
+    resource = None
+
+# [case_id, status, seconds, exception type, expected digest, actual digest] per case (tests/harness.py),
+# or None when the suite never ran: the candidate didn't load, timed out or crashed its worker
+CaseRows = Optional[List[list]]
+Result = Tuple[bool, List[str], CaseRows]
+
+# every suite module this process has loaded, by content hash
+_SUITES: Dict[str, types.ModuleType] = {}
+
+def load_suite(test_path) -> types.ModuleType:
+    """The suite module, compiled and executed once per process for each version of the file.
+
+    Suites build their case tables at module level, so after the first call a
+    candidate run costs only the candidate's own work. An edited suite has a
+    new hash, as does one whose helpers changed, and is loaded afresh.
+    """
+    key = suite_hash(test_path)
+    mod = _SUITES.get(key)
+    if mod is None:
+        path = pathlib.Path(test_path)
+        folder = str(path.resolve().parent)
+        for name, loaded in list(sys.modules.items()):
+            if os.path.dirname(getattr(loaded, "__file__", None) or "") == folder:
+                del sys.modules[name]  # re-import the suite's helpers (tests/harness.py) in case they changed
+        mod = types.ModuleType(path.stem)
+        mod.__file__ = str(path)
+        exec(compile(path.read_bytes(), str(path), "exec"), mod.__dict__)
+        _SUITES[key] = mod
+    return mod
+
+def load_test_runner(test_path) -> Callable:
+    """The suite's run_tests(impl) -> (passed, failures)."""
+    return load_suite(test_path).run_tests
+
+def execute_candidate(code: str, func_name: str, suite: types.ModuleType, options: Optional[Dict[str, Any]] = None) -> Result:
+    """exec the candidate and run the suite on it, in the current process.
+
+    options (case_timeout, fail_fast, scale) go to the suite's run_cases; suites
+    without run_cases ignore them.
+    """
+    ns = {}
+    try:
+        exec(code, ns, ns)
+    except MemoryError:
+        raise  # the worker reports the memory limit
+    except Exception as e:
+        return False, [f"Code failed to import: {e}"], None
+    if func_name not in ns or not callable(ns[func_name]):
+        return False, [f"Function {func_name} not found after exec"], None
+    try:
+        if not hasattr(suite, "run_cases"):
+            passed, failures = suite.run_tests(ns[func_name])
+            return passed, failures, None
+        cases = suite.run_cases(ns[func_name], **(options or {}))
+    except MemoryError:
+        raise
+    except Exception as e:
+        return False, [f"Test runner error: {e}"], None
+    # plain lists: the parent process can't unpickle the suite's CaseResult class
+    rows = [[c.case_id, c.status, round(c.duration, 6), c.exc_type, c.expected, c.actual] for c in cases]
+    failures = [c.message for c in cases if c.status != "pass"]
+    return not failures, failures, rows
+
+def _set_cpu_budget(seconds: int):
+    # RLIMIT_CPU counts the worker's lifetime CPU, so move the soft limit past what it has used so far.
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(usage.ru_utime + usage.ru_stime) + seconds + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+def _worker_main(conn, cpu_seconds: Optional[int], memory_bytes: Optional[int]):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C is the orchestrator's to handle
+    if resource and memory_bytes:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        code, func_name, test_path, options = job
+        if resource and cpu_seconds:
+            _set_cpu_budget(cpu_seconds)
+        try:
+            suite = load_suite(test_path)
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = execute_candidate(code, func_name, suite, options)
+        except MemoryError:
+            result = (False, ["Candidate exceeded the sandbox memory limit"], None)
+        conn.send(result)
+
+@dataclass
+class _Worker:
+    proc: Any
+    conn: Any
+    tasks: int = 0
+
+class SandboxPool:
+    """Pre-started worker processes that exec untrusted candidates and run their test suites.
+
+    Each candidate gets a wall-clock timeout (the worker is killed and replaced
+    when it expires), a CPU-seconds rlimit and an address-space rlimit. A crash
+    or sys.exit only takes down its worker. Workers are recycled after
+    max_tasks_per_worker candidates so leaked state does not pile up. run() is
+    blocking and thread-safe; submit()/arun() run candidates in parallel.
+
+    Within a candidate, case_timeout limits each test case (a case stuck in a
+    loop fails alone instead of eating the whole timeout) and fail_fast stops
+    the suite at the first case that doesn't pass. scale adds the suites' stress
+    cases, which need a timeout and cpu_seconds of a minute or two.
+    """
+    def __init__(self, workers: Optional[int] = None, timeout: float = 10.0, cpu_seconds: Optional[int] = 10,
+                 memory_mb: Optional[int] = 1024, max_tasks_per_worker: int = 200,
+                 case_timeout: Optional[float] = None, fail_fast: bool = False, scale: bool = False):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.options = {"case_timeout": case_timeout, "fail_fast": fail_fast, "scale": scale}
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_mb * 1024 * 1024 if memory_mb else None
+        self.max_tasks_per_worker = max_tasks_per_worker
+        methods = multiprocessing.get_all_start_methods()
+        # forkserver gives clean single-threaded parents even when the orchestrator runs threads/asyncio
+        self._ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sandbox")
+        self._closed = False
+        for _ in range(self.workers):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_worker_main, args=(child_conn, self.cpu_seconds, self.memory_bytes), daemon=True)
+        proc.start()
+        child_conn.close()
+        return _Worker(proc, parent_conn)
+
+    @staticmethod
+    def _kill(w: _Worker):
+        if w.proc.is_alive():
+            w.proc.kill()
+        w.proc.join()
+        w.conn.close()
+
+    def _crash_message(self, w: _Worker) -> str:
+        w.proc.join(1)
+        code = w.proc.exitcode
+        if code == -getattr(signal, "SIGXCPU", -1):
+            return f"Exceeded CPU limit of {self.cpu_seconds}s"
+        return f"Sandbox worker crashed (exit code {code})"
+
+    def run(self, code: str, func_name: str, test_path, timeout: Optional[float] = None) -> Result:
+        if self._closed:
+            raise RuntimeError("SandboxPool is closed")
+        timeout = self.timeout if timeout is None else timeout
+        w = self._idle.get()
+        healthy = False
+        try:
+            w.conn.send((code, func_name, str(test_path), self.options))
+            if w.conn.poll(timeout):
+                result = w.conn.recv()
+                healthy = True
+            else:
+                result = (False, [f"Timed out after {timeout}s"], None)
+        except (EOFError, OSError):
+            result = (False, [self._crash_message(w)], None)
+        finally:
+            w.tasks += 1
+            if not healthy or w.tasks >= self.max_tasks_per_worker:
+                self._kill(w)
+                w = self._spawn()
+            self._idle.put(w)
+        return result
+
+    @property
+    def variant(self) -> str:
+        """How the suites are run, as far as it changes their results; part of the verdict cache key."""
+        parts = [f"case_timeout={self.options['case_timeout']}"] if self.options["case_timeout"] else []
+        return ";".join(parts + [flag for flag in ("fail_fast", "scale") if self.options[flag]])
+
+    def submit(self, code: str, func_name: str, test_path, timeout: Optional[float] = None) -> "Future[Result]":
+        return self._executor.submit(self.run, code, func_name, test_path, timeout)
+
+    async def arun(self, code: str, func_name: str, test_path, timeout: Optional[float] = None) -> Result:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.run, code, func_name, test_path, timeout)
+
+    def map(self, codes: List[str], func_name: str, test_path, timeout: Optional[float] = None) -> List[Result]:
+        return [f.result() for f in [self.submit(c, func_name, test_path, timeout) for c in codes]]
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        while not self._idle.empty():
+            w = self._idle.get_nowait()
+            try:
+                w.conn.send(None)
+            except OSError:
+                pass
+            w.proc.join(1)
+            self._kill(w)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
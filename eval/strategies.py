@@ -1,15 +1,43 @@
 
-import re, pathlib
+import re, pathlib, functools
+from typing import Dict, List, Optional
+
+BASE = pathlib.Path(__file__).resolve().parents[1]
+PROBLEMS_DIR = BASE / "problems"
+TESTS_DIR = BASE / "tests"
+PROMPTS_DIR = BASE / "prompts"
+
+_FENCE = re.compile(r"```(?:python)?\s*(.+?)```", re.DOTALL|re.IGNORECASE)
 
 def extract_python_code(text: str) -> str:
     """
     Extract the first Python code block from a response; if none, return the whole text.
     """
-    fence = re.search(r"```(?:python)?\s*(.+?)```", text, re.DOTALL|re.IGNORECASE)
+    fence = _FENCE.search(text)
     if fence:
         return fence.group(1).strip()
     return text.strip()
 
+def code_block_end(text: str) -> Optional[int]:
+    """
+    Offset just past the closing fence of the first code block, or None while it is still open.
+    Everything after it is ignored by extract_python_code, so a stream can stop there.
+    """
+    fence = _FENCE.search(text)
+    return fence.end() if fence else None
+
+def load_problems() -> List[Dict[str, str]]:
+    problems = []
+    for md in sorted(PROBLEMS_DIR.glob("*.md")):
+        func_name = md.stem
+        problems.append({
+            "name": md.stem,
+            "md_path": str(md),
+            "func_name": func_name,
+            "test_path": str(TESTS_DIR / f"test_{md.stem}.py"),
+        })
+    return problems
+
 def build_problem_spec(md_path: str) -> str:
     return pathlib.Path(md_path).read_text()
 
@@ -18,3 +46,23 @@ def fill_template(tmpl: str, problem_spec: str, **kwargs) -> str:
     for k,v in kwargs.items():
         out = out.replace("{"+k+"}", v)
     return out
+
+def _between(text: str, start: str, end: str) -> str:
+    a = text.index(start) + len(start)
+    b = text.index(end, a)
+    return text[a:b]
+
+@functools.lru_cache(maxsize=None)
+def get_templates(path: str = str(PROMPTS_DIR / "strategy_templates.md")) -> Dict[str, str]:
+    """
+    Strategy name -> prompt template, split out of strategy_templates.md on first use and memoized.
+    """
+    full = pathlib.Path(path).read_text()
+    return {
+        "cot": _between(full, "## 1) Chain-of-Thought (CoT)", "## 2) Stepwise Chain-of-Thought (SCoT)").strip(),
+        "scot_plan": _between(full, "## 2) Stepwise Chain-of-Thought (SCoT)", "## 3) Self-Planning").strip(),
+        "self_planning": _between(full, "## 3) Self-Planning", "## 4) Self-Debugging").strip(),
+        "self_debugging": _between(full, "## 4) Self-Debugging", "## 5) Self-Edit").strip(),
+        "self_edit": _between(full, "## 5) Self-Edit", "## 6) Self-Repair (Iterative)").strip(),
+        "self_repair": full.split("## 6) Self-Repair (Iterative)")[1].strip()
+    }
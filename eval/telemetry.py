@@ -0,0 +1,166 @@
+import os, json, time, threading, contextlib, contextvars
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Iterator, List, Optional
+
+@dataclass
+class RequestTrace:
+    """Timings and counters for one top-level generate() call."""
+    provider: str
+    model: str
+    n: int
+    ts: float                                # wall-clock start
+    queue_wait: float = 0.0                  # seconds spent waiting on the rate limiter
+    ttfb: Optional[float] = None             # seconds until the first response byte/chunk, when observable
+    latency: float = 0.0                     # seconds for the whole call, retries included
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    tokens_estimated: bool = False           # provider reported no usage; ~4 chars/token
+    retries: int = 0
+    cache_hits: int = 0
+    error: Optional[str] = None              # exception type when the call failed
+
+COLUMNS = [f.name for f in fields(RequestTrace)]
+
+class TelemetryLog:
+    """Columnar block log: traces are buffered and written as one JSON line per block.
+
+    Each line is {"rows": r, "columns": {name: [value, ...]}}, which is compact
+    (field names are written once per block) and loads straight into columns.
+    """
+    def __init__(self, path: str, block_size: int = 256):
+        self.path = str(path)
+        self.block_size = block_size
+        self._rows: List[RequestTrace] = []
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)) or ".", exist_ok=True)
+        self._f = open(self.path, "a")
+
+    def add(self, trace: RequestTrace):
+        with self._lock:
+            self._rows.append(trace)
+            if len(self._rows) >= self.block_size:
+                self._flush()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        block = {"rows": len(self._rows), "columns": {c: [getattr(t, c) for t in self._rows] for c in COLUMNS}}
+        self._f.write(json.dumps(block) + "\n")
+        self._f.flush()
+        self._rows = []
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._f.close()
+
+def read_columns(path: str) -> Dict[str, List[Any]]:
+    """Concatenate every block of a telemetry log into {column: values}."""
+    out: Dict[str, List[Any]] = {c: [] for c in COLUMNS}
+    with open(path) as f:
+        for line in f:
+            try:
+                block = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn write from a crash
+            for c in COLUMNS:
+                out[c].extend(block["columns"].get(c, [None] * block["rows"]))
+    return out
+
+_SINK: Optional[TelemetryLog] = None
+_current: "contextvars.ContextVar[Optional[RequestTrace]]" = contextvars.ContextVar("request_trace", default=None)
+
+def start_log(path: Optional[str], block_size: int = 256) -> Optional[TelemetryLog]:
+    """Send traces of every generate() call in this process to a TelemetryLog at path (None stops recording)."""
+    global _SINK
+    if _SINK is not None:
+        _SINK.close()
+    _SINK = TelemetryLog(path, block_size) if path else None
+    return _SINK
+
+def stop_log():
+    start_log(None)
+
+def current() -> Optional[RequestTrace]:
+    return _current.get()
+
+@contextlib.contextmanager
+def request(provider: str, model: str, n: int) -> Iterator[Optional[RequestTrace]]:
+    """Trace one generate() call. Nested calls (cache and hedge wrappers, fan-out) share the outer trace."""
+    outer = _current.get()
+    if outer is not None:
+        yield outer
+        return
+    if _SINK is None:
+        yield None
+        return
+    trace = RequestTrace(provider, model, n, time.time())
+    token = _current.set(trace)
+    start = time.monotonic()
+    try:
+        yield trace
+    except BaseException as e:
+        trace.error = type(e).__name__
+        raise
+    finally:
+        trace.latency = time.monotonic() - start
+        _current.reset(token)
+        sink = _SINK
+        if sink is not None:
+            sink.add(trace)
+
+def fork() -> Optional[RequestTrace]:
+    """A blank trace for one of several requests raced under the current trace (None when not tracing).
+
+    Run the request under it with traced()/atraced() and merge() it back once it
+    has finished; a loser that is still running when the call's trace is
+    logged then can't change it.
+    """
+    outer = _current.get()
+    return None if outer is None else RequestTrace(outer.provider, outer.model, outer.n, outer.ts)
+
+def traced(trace: Optional[RequestTrace], fn, *args):
+    """fn(*args) with `trace` as the current trace."""
+    token = _current.set(trace)
+    try:
+        return fn(*args)
+    finally:
+        _current.reset(token)
+
+async def atraced(trace: Optional[RequestTrace], fn, *args):
+    """await fn(*args) with `trace` as the current trace."""
+    token = _current.set(trace)
+    try:
+        return await fn(*args)
+    finally:
+        _current.reset(token)
+
+def merge(branch: Optional[RequestTrace]):
+    """Add a finished fork()'s counters to the current trace."""
+    trace = _current.get()
+    if trace is None or branch is None:
+        return
+    trace.queue_wait += branch.queue_wait
+    trace.retries += branch.retries
+    trace.cache_hits += branch.cache_hits
+    if trace.ttfb is None:
+        trace.ttfb = branch.ttfb
+    if branch.input_tokens is not None and branch.output_tokens is not None:
+        trace.input_tokens = (trace.input_tokens or 0) + branch.input_tokens
+        trace.output_tokens = (trace.output_tokens or 0) + branch.output_tokens
+        trace.tokens_estimated = trace.tokens_estimated or branch.tokens_estimated
+
+def first_byte():
+    trace = _current.get()
+    if trace is not None and trace.ttfb is None:
+        trace.ttfb = time.time() - trace.ts
+
+def add_tokens(input_tokens: Optional[int], output_tokens: Optional[int]):
+    trace = _current.get()
+    if trace is not None and input_tokens is not None and output_tokens is not None:
+        trace.input_tokens = (trace.input_tokens or 0) + input_tokens
+        trace.output_tokens = (trace.output_tokens or 0) + output_tokens
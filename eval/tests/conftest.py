@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# the eval modules import each other as top-level modules, as they do when run as scripts
+EVAL_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(EVAL_DIR))
@@ -0,0 +1,4 @@
+"""A minimal suite for the sandbox tests: it reports what the candidate returned as its only message."""
+
+def run_tests(impl):
+    return True, [repr(impl())]
@@ -0,0 +1,68 @@
+"""
+CheckpointLog resume: finished samples come back, and a line torn by a crash
+costs only its own sample. Cells of one model with different settings are
+kept apart.
+"""
+
+from checkpoint import CheckpointLog, model_key
+from run_eval import shard_of
+
+MODEL = {"provider": "synthetic", "model": "s"}
+
+def record(log, sample):
+    log.record(MODEL, "cot", "p", sample, code=f"code{sample}", passed=True, failures=[])
+
+def test_resume_keeps_finished_samples(tmp_path):
+    path = tmp_path / "ckpt.jsonl"
+    log = CheckpointLog(path)
+    record(log, 0)
+    record(log, 2)
+    log.close()
+    log = CheckpointLog(path, resume=True)
+    assert [e and e["code"] for e in log.samples(MODEL, "cot", "p", 3)] == ["code0", None, "code2"]
+    log.close()
+    assert not CheckpointLog(path).done  # without resume the log starts over
+
+def test_torn_line_loses_only_its_own_sample(tmp_path):
+    path = tmp_path / "ckpt.jsonl"
+    log = CheckpointLog(path)
+    record(log, 0)
+    log.close()
+    with open(path, "a") as f:
+        f.write('{"model": {"provider": "synth')  # crashed mid-write
+    log = CheckpointLog(path, resume=True)
+    record(log, 1)
+    log.close()
+    log = CheckpointLog(path, resume=True)
+    assert sorted(key[3] for key in log.done) == [0, 1]
+    log.close()
+
+def test_torn_only_line(tmp_path):
+    path = tmp_path / "ckpt.jsonl"
+    path.write_text('{"model"')
+    log = CheckpointLog(path, resume=True)
+    record(log, 0)
+    log.close()
+    assert [e["sample"] for e in CheckpointLog.read(path)] == [0]
+
+def test_model_key_separates_settings_but_not_pacing():
+    plain = {"provider": "google", "model": "g"}
+    assert model_key(plain) == "google:g"
+    assert model_key({**plain, "rpm": 5, "max_concurrency": 2}) == "google:g"
+    hot, cold = {**plain, "temperature": 1.0}, {**plain, "temperature": 0.2}
+    assert len({model_key(plain), model_key(hot), model_key(cold)}) == 3
+    assert model_key({**plain, "options": {"seed": 1}}) != model_key({**plain, "options": {"seed": 2}})
+    assert model_key({"temperature": 1.0, **plain}) == model_key(hot)  # key order doesn't matter
+
+def test_same_model_with_other_settings_is_its_own_cell(tmp_path):
+    path = tmp_path / "ckpt.jsonl"
+    hot, cold = {**MODEL, "temperature": 1.0}, {**MODEL, "temperature": 0.2}
+    log = CheckpointLog(path)
+    log.record(hot, "cot", "p", 0, code="hot", passed=True, failures=[])
+    log.close()
+    log = CheckpointLog(path, resume=True)
+    assert log.get(hot, "cot", "p", 0)["code"] == "hot"
+    assert log.get(cold, "cot", "p", 0) is None
+    log.close()
+    owners = {(t, j): shard_of({**MODEL, "temperature": t}, "cot", "p", j, 64) for t in (0.2, 1.0) for j in range(8)}
+    assert [owners[0.2, j] for j in range(8)] != [owners[1.0, j] for j in range(8)]
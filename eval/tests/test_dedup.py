@@ -0,0 +1,118 @@
+"""
+Candidate deduplication: equivalent candidates share one execution, verdicts
+are reused across models and runs (but never flaky ones), and only while the
+suite and the helpers it imports are unchanged.
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from dedup import DedupExecutor, VerdictCache, candidate_hash, suite_hash
+
+def touch(path, text):
+    path.write_text(text)
+    os.utime(path, ns=(path.stat().st_mtime_ns + 10**9,) * 2)  # a new mtime even on coarse clocks
+
+def test_suite_hash_covers_local_imports(tmp_path):
+    suite = tmp_path / "test_x.py"
+    touch(tmp_path / "harness.py", "CASES = 1\n")
+    touch(tmp_path / "unrelated.py", "")
+    suite.write_text("import os, sys\nfrom harness import CASES\n")
+    before = suite_hash(suite)
+    touch(tmp_path / "unrelated.py", "X = 1\n")
+    assert suite_hash(suite) == before
+    touch(tmp_path / "harness.py", "CASES = 2\n")
+    assert suite_hash(suite) != before
+
+def test_suite_hash_follows_imports_transitively(tmp_path):
+    suite = tmp_path / "test_x.py"
+    touch(tmp_path / "util.py", "")
+    touch(tmp_path / "harness.py", "import util\n")
+    suite.write_text("import harness\n")
+    before = suite_hash(suite)
+    touch(tmp_path / "util.py", "Y = 1\n")
+    assert suite_hash(suite) != before
+
+SOLUTION = '''
+def add(a, b):
+    """Sum of a and b."""
+    return a + b
+'''
+REFORMATTED = '''
+def add(a,b):
+    # no docstring, different spacing
+    return (a + b)
+'''
+
+def test_candidate_hash_ignores_docstrings_comments_and_formatting():
+    assert candidate_hash(SOLUTION) == candidate_hash(REFORMATTED)
+    assert candidate_hash(SOLUTION) != candidate_hash(SOLUTION.replace("a + b", "b + a"))
+    assert candidate_hash(SOLUTION) != candidate_hash(SOLUTION.replace("add", "plus"))
+    assert candidate_hash("def f(:") == candidate_hash("  def f(:\n")  # unparsable: compared as stripped text
+
+class FakePool:
+    """Answers `result` after `delay` seconds and counts executions."""
+    workers = 1
+
+    def __init__(self, result=(True, [], None), delay=0.0):
+        self.result = result
+        self.delay = delay
+        self.runs = 0
+
+    def run(self, code, func_name, test_path, timeout=None):
+        self.runs += 1
+        return self.result
+
+    async def arun(self, code, func_name, test_path, timeout=None):
+        self.runs += 1
+        await asyncio.sleep(self.delay)
+        return self.result
+
+@pytest.fixture
+def suite(tmp_path):
+    path = tmp_path / "test_add.py"
+    path.write_text("def run_tests(impl):\n    return impl(1, 2) == 3, []\n")
+    return path
+
+def test_verdict_is_reused_across_models_and_runs(tmp_path, suite):
+    verdicts = VerdictCache(tmp_path / "verdicts.sqlite")
+    pool = FakePool()
+    first = DedupExecutor(pool, verdicts)
+    assert first.run(SOLUTION, "add", suite) == (True, [], None)
+    assert first.run(REFORMATTED, "add", suite) == (True, [], None)  # another model's sample
+    verdicts.close()
+    verdicts = VerdictCache(tmp_path / "verdicts.sqlite")  # a later run
+    later = DedupExecutor(pool, verdicts)
+    assert later.run(SOLUTION, "add", suite) == (True, [], None)
+    verdicts.close()
+    assert pool.runs == 1
+    assert (first.executed, first.reused, later.executed, later.reused) == (1, 1, 0, 1)
+
+@pytest.mark.parametrize("result", [
+    (False, ["Timed out after 10s"], None),
+    (False, ["Sandbox worker crashed (exit code -9)"], None),
+    (False, ["Exceeded CPU limit of 10s"], None),
+    (False, ["case0 timed out after 1s"], [["case0", "timeout", 1.0, "CaseTimeout", None, None]]),
+])
+def test_flaky_and_timed_out_verdicts_are_not_cached(tmp_path, suite, result):
+    verdicts = VerdictCache(tmp_path / "verdicts.sqlite")
+    pool = FakePool(result)
+    executor = DedupExecutor(pool, verdicts)
+    executor.run(SOLUTION, "add", suite)
+    executor.run(SOLUTION, "add", suite)
+    assert pool.runs == 2
+    assert verdicts.get(executor._key(SOLUTION, "add", suite)) is None
+    verdicts.close()
+
+def test_concurrent_duplicates_run_once(suite):
+    pool = FakePool(delay=0.05)
+    executor = DedupExecutor(pool)
+
+    async def main():
+        return await asyncio.gather(*(executor.arun(code, "add", suite) for code in (SOLUTION, REFORMATTED, SOLUTION)))
+
+    assert asyncio.run(main()) == [(True, [], None)] * 3
+    assert pool.runs == 1
+    assert (executor.executed, executor.reused) == (1, 2)
@@ -0,0 +1,58 @@
+"""
+Per-case time limits and fail-fast runs (tests/harness.py), and how their
+verdicts are kept apart from full runs in the verdict cache.
+"""
+
+import pytest
+
+from dedup import DedupExecutor, VerdictCache
+from sandbox import SandboxPool, load_suite
+from strategies import TESTS_DIR
+
+ROMAN = TESTS_DIR / "test_int_to_roman.py"
+WRONG = "def int_to_roman(n):\n    return ''\n"
+
+harness = load_suite(TESTS_DIR / "harness.py")
+
+def loop_forever():
+    while True:
+        pass
+
+def test_looping_case_times_out_alone():
+    c = harness.Cases(case_timeout=0.2)
+    c.expect("loop", loop_forever, 1, "loop")
+    c.expect("after", lambda: 1, 1, "after")
+    assert [(r.case_id, r.status) for r in c.results] == [("loop", harness.TIMEOUT), ("after", harness.PASS)]
+    assert c.results[0].exc_type == "CaseTimeout"
+    assert c.results[0].message == "loop timed out after 0.2s"
+
+def test_fail_fast_stops_at_the_first_failure_and_skips_the_scale_tier():
+    suite = load_suite(ROMAN)
+    calls = suite.stress_input.cache_info()
+    results = suite.run_cases(lambda n: "", fail_fast=True, scale=True)
+    assert [(r.case_id, r.status) for r in results] == [("1", harness.FAIL)]
+    after = suite.stress_input.cache_info()
+    assert after.hits + after.misses == calls.hits + calls.misses  # no stress input was built
+    full = suite.run_cases(lambda n: "")
+    assert len(full) == len(suite.KNOWN) + len(suite.OUT_OF_RANGE)
+
+@pytest.fixture
+def verdicts(tmp_path):
+    cache = VerdictCache(tmp_path / "verdicts.sqlite")
+    yield cache
+    cache.close()
+
+def run_with(verdicts, **options):
+    with SandboxPool(1, timeout=10, **options) as pool:
+        executor = DedupExecutor(pool, verdicts)
+        return executor.run(WRONG, "int_to_roman", ROMAN), executor
+
+def test_fail_fast_verdict_never_stands_in_for_a_full_one(verdicts):
+    fast, _ = run_with(verdicts, fail_fast=True)
+    full, executor = run_with(verdicts)
+    assert executor.executed == 1  # the fail-fast verdict wasn't reused for the full run
+    assert len(fast[1]) == 1 and len(full[1]) > 1
+    again, executor = run_with(verdicts)
+    assert executor.reused == 1 and again == full
+    again, executor = run_with(verdicts, fail_fast=True)
+    assert executor.reused == 1 and again == fast
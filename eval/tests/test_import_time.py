@@ -0,0 +1,40 @@
+"""
+Import-time budget for the evaluation CLI.
+Listing problems or summarizing results must not pay for provider SDKs, numpy
+or prompt templates before doing any work.
+"""
+
+import sys
+import subprocess
+from pathlib import Path
+
+import pytest
+
+EVAL_DIR = Path(__file__).resolve().parents[1]
+BUDGET_SECONDS = 0.1
+HEAVY_MODULES = ["numpy", "openai", "anthropic", "google.generativeai", "httpx"]
+
+def import_in_fresh_interpreter(module):
+    """Seconds to import `module` in a new interpreter, and the modules loaded by then."""
+    code = (f"import sys, time; t = time.perf_counter(); import {module}; "
+            f"print(time.perf_counter() - t); print(' '.join(sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=EVAL_DIR, capture_output=True, text=True, check=True)
+    seconds, modules = out.stdout.splitlines()
+    return float(seconds), set(modules.split())
+
+@pytest.mark.parametrize("module", ["report", "run_eval", "model_clients"])
+def test_no_heavy_imports(module):
+    _, loaded = import_in_fresh_interpreter(module)
+    assert not [m for m in HEAVY_MODULES if m in loaded]
+
+def test_templates_parsed_lazily():
+    sys.path.insert(0, str(EVAL_DIR))
+    import strategies
+    strategies.get_templates.cache_clear()
+    assert strategies.get_templates() is strategies.get_templates()
+    assert strategies.get_templates.cache_info().misses == 1
+
+def test_report_cli_import_budget():
+    # best of three, so a cold disk cache doesn't fail the build
+    best = min(import_in_fresh_interpreter("report")[0] for _ in range(3))
+    assert best < BUDGET_SECONDS, f"importing report took {best * 1000:.0f} ms"
@@ -0,0 +1,75 @@
+"""
+pass@k estimator, bootstrap CIs and the adaptive stopping rule.
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from metrics import bootstrap_ci, is_settled, pass_at_k, pass_at_k_interval, summarize_pass_at_k
+
+def exact(n, c, k):
+    return 1 - math.comb(n - c, k) / math.comb(n, k)
+
+def test_fewer_samples_than_k_is_nan():
+    assert np.isnan(pass_at_k(3, 1, [5])[0, 0])
+
+def test_no_successes_is_zero():
+    assert pass_at_k(10, 0, [1, 5, 10])[0].tolist() == [0.0, 0.0, 0.0]
+
+def test_too_few_failures_for_k_is_one():
+    # n - c < k: every k-subset holds a success
+    assert pass_at_k(10, 8, [3, 5])[0].tolist() == [1.0, 1.0]
+
+def test_matches_exact_binomial_ratio():
+    n = np.repeat(np.arange(1, 60), 60)
+    c = np.tile(np.arange(60), 59)
+    keep = c <= n
+    n, c = n[keep], c[keep]
+    ks = [1, 2, 5, 10, 25]
+    est = pass_at_k(n, c, ks)
+    for row, (ni, ci) in enumerate(zip(n, c)):
+        for j, k in enumerate(ks):
+            if k <= ni:
+                assert est[row, j] == pytest.approx(exact(int(ni), int(ci), k), abs=1e-12)
+            else:
+                assert np.isnan(est[row, j])
+
+def test_large_n_stays_finite():
+    est = pass_at_k(5000, 2500, [1, 10, 100])[0]
+    assert est[0] == pytest.approx(0.5) and np.all(np.isfinite(est))
+
+def test_bootstrap_ci_brackets_the_mean():
+    values = np.random.default_rng(1).random((200, 2))
+    lo, hi = bootstrap_ci(values, n_boot=2000)
+    mean = values.mean(axis=0)
+    assert np.all(lo < mean) and np.all(mean < hi)
+    assert np.all(hi - lo < 0.2)
+
+def test_bootstrap_ci_of_constant_values_is_a_point():
+    lo, hi = bootstrap_ci(np.full(50, 0.3), n_boot=500)
+    assert lo == pytest.approx(0.3) and hi == pytest.approx(0.3)
+
+def test_bootstrap_ci_empty_is_nan():
+    lo, hi = bootstrap_ci(np.empty((0,)))
+    assert np.isnan(lo) and np.isnan(hi)
+
+def test_interval_narrows_with_samples_and_settles():
+    lo_few, hi_few = pass_at_k_interval(4, 2, 1)
+    lo_many, hi_many = pass_at_k_interval(400, 200, 1)
+    assert lo_few < lo_many < 0.5 < hi_many < hi_few
+    assert pass_at_k_interval(0, 0, 1) == (0.0, 1.0)
+    assert not is_settled(4, 2, 1, tolerance=0.1)
+    assert is_settled(400, 200, 1, tolerance=0.1)
+
+def record(strategy, n, successes, problem="p"):
+    return {"model": {"provider": "x", "model": "m"}, "strategy": strategy, "problem": problem, "n": n, "successes": successes}
+
+def test_summary_skips_unreachable_k():
+    rows = summarize_pass_at_k([record("self_repair", 1, 1), record("cot", 3, 1)], ks=[1, 3], n_boot=100)
+    assert {(r["strategy"], r["k"]) for r in rows} == {("self_repair", 1), ("cot", 1), ("cot", 3)}
+
+def test_summary_reports_cells_left_out():
+    rows = summarize_pass_at_k([record("cot", 3, 1, "a"), record("cot", 1, 1, "b")], ks=[3], n_boot=100)
+    assert rows[0]["problems"] == 1 and rows[0]["cells"] == 2
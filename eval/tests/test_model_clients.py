@@ -0,0 +1,227 @@
+"""
+Error classification, the shared RateLimiter/CircuitBreaker (on a fake
+clock), per-request limits for clients that fan samples out, and hedging.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import model_clients
+import telemetry
+from model_clients import (FATAL, RATE_LIMIT, RETRYABLE, CircuitBreaker, HedgedClient, HedgePolicy, ModelClient,
+                           ModelConfig, RateLimiter, _Slots, classify_error, close_clients, configure_rate_limit,
+                           get_client)
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": {"retry-after": "0"}})()
+
+class APITimeoutError(Exception):
+    pass
+
+class GoogleError(Exception):
+    code = 503
+
+@pytest.mark.parametrize("exc, kind", [
+    (StatusError(429), RATE_LIMIT),
+    (type("E", (Exception,), {"status_code": 429})("insufficient_quota"), FATAL),
+    (StatusError(503), RETRYABLE),
+    (StatusError(408), RETRYABLE),
+    (GoogleError(), RETRYABLE),
+    (TimeoutError(), RETRYABLE),
+    (ConnectionResetError(), RETRYABLE),
+    (APITimeoutError(), RETRYABLE),
+    (StatusError(400), FATAL),
+    (ValueError("bad prompt"), FATAL),
+])
+def test_classify_error(exc, kind):
+    assert classify_error(exc) == kind
+
+def test_breaker_opens_half_opens_and_closes():
+    clock = Clock()
+    breaker = CircuitBreaker(threshold=2, cooldown=10, max_cooldown=25, clock=clock)
+    breaker.failure()
+    assert breaker.state == "closed" and breaker.wait_time() == 0
+    breaker.failure()
+    assert breaker.state == "open" and breaker.wait_time() == 10
+    breaker.failure()  # already open: in-flight failures don't extend it
+    clock.now += 10
+    assert breaker.state == "half-open" and breaker.wait_time() == 0
+    breaker.failure()  # one failure while half-open trips it again, for twice as long
+    assert breaker.state == "open" and breaker.wait_time() == 20
+    clock.now += 20
+    breaker.failure()
+    assert breaker.wait_time() == 25  # capped at max_cooldown
+    clock.now += 25
+    breaker.success()
+    assert breaker.state == "closed"
+    breaker.failure()
+    assert breaker.state == "closed"
+
+def test_limiter_paces_requests():
+    clock = Clock()
+    limiter = RateLimiter(rpm=60, clock=clock)
+    assert [limiter.reserve() for _ in range(60)] == [0.0] * 60  # a full bucket's burst
+    assert limiter.reserve() == pytest.approx(1.0)
+    clock.now += 1
+    assert limiter.reserve() == pytest.approx(1.0)
+
+def test_limiter_paces_tokens():
+    limiter = RateLimiter(tpm=600, clock=Clock())
+    assert limiter.reserve(tokens=600) == 0
+    assert limiter.reserve(tokens=300) == pytest.approx(30.0)
+    assert limiter.reserve(tokens=10_000) == pytest.approx(90.0)  # one call never owes more than a bucket
+
+def test_penalize_blocks_and_halves_the_rate():
+    clock = Clock()
+    limiter = RateLimiter(rpm=60, clock=clock)
+    for _ in range(60):
+        limiter.reserve()
+    assert limiter.penalize(retry_after=5) == 5
+    assert limiter.reserve() == pytest.approx(5.0)
+    clock.now += 5  # refills 2.5 requests at the halved rate: 30/min
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == pytest.approx(1.0)
+    limiter.succeed()
+    assert limiter._scale == pytest.approx(0.55)
+
+def test_reapplying_the_same_limits_keeps_slots_in_use():
+    cfg = ModelConfig(provider="synthetic", model="s", max_concurrency=1)
+    limiter = get_client(cfg).limiter
+    limiter.acquire_slot()
+    try:
+        assert get_client(cfg).limiter is limiter  # a client built per problem ...
+        assert limiter._slots._free == 0  # ... doesn't hand out a fresh slot
+    finally:
+        limiter.release_slot()
+    configure_rate_limit("synthetic")  # leave the provider unlimited for other tests
+
+def test_slots_hand_over_between_tasks_and_threads():
+    slots = _Slots(1)
+
+    async def main():
+        await slots.aacquire()
+        waiter = asyncio.create_task(slots.aacquire())
+        cancelled = asyncio.create_task(slots.aacquire())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        cancelled.cancel()
+        slots.release()
+        await waiter
+        thread = threading.Thread(target=slots.acquire)
+        thread.start()
+        await asyncio.sleep(0.05)
+        assert thread.is_alive()
+        slots.release()
+        await asyncio.to_thread(thread.join)
+
+    asyncio.run(main())
+    slots.release()
+    assert slots._free == 1 and not slots._waiters
+
+class FanOutClient(ModelClient):
+    """One fake request per sample; the request for sample `fail_at` answers 429 once."""
+    fans_out = True
+
+    def __init__(self, provider, fail_at=None):
+        super().__init__(ModelConfig(provider=provider, model="m", options={"max_fanout": 8}))
+        self.fail_at = fail_at
+        self.sent = []
+        self.in_flight = self.peak = 0
+        self._lock = threading.Lock()
+
+    def _send(self, i):
+        with self._lock:
+            self.sent.append(i)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            time.sleep(0.02)
+            if i == self.fail_at:
+                self.fail_at = None
+                raise StatusError(429)
+            return f"sample-{i}"
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    async def _asend(self, i):
+        return await asyncio.to_thread(self._send, i)
+
+    def _generate(self, prompt, n):
+        return self._fan_out(self._send, range(n), prompt)
+
+    async def _agenerate(self, prompt, n):
+        return await self._afan_out(self._asend, range(n), prompt)
+
+def test_fan_out_holds_one_slot_per_request():
+    configure_rate_limit("fanout-sync", max_concurrency=2)
+    client = FanOutClient("fanout-sync")
+    assert client.generate("p", 6) == [f"sample-{i}" for i in range(6)]
+    assert client.peak == 2
+
+def test_afan_out_holds_one_slot_per_request():
+    configure_rate_limit("fanout-async", max_concurrency=2)
+    client = FanOutClient("fanout-async")
+    assert asyncio.run(client.agenerate("p", 6)) == [f"sample-{i}" for i in range(6)]
+    assert client.peak == 2
+
+def test_rate_limited_request_is_retried_alone():
+    configure_rate_limit("fanout-retry", max_concurrency=4)
+    client = FanOutClient("fanout-retry", fail_at=2)
+    assert client.generate("p", 4) == [f"sample-{i}" for i in range(4)]
+    assert sorted(client.sent) == [0, 1, 2, 2, 3]
+
+def test_async_rate_limited_request_is_retried_alone():
+    configure_rate_limit("fanout-aretry", max_concurrency=4)
+    client = FanOutClient("fanout-aretry", fail_at=1)
+    assert asyncio.run(client.agenerate("p", 4)) == [f"sample-{i}" for i in range(4)]
+    assert sorted(client.sent) == [0, 1, 1, 2, 3]
+
+class SleepyClient(ModelClient):
+    """Answers `text` after `delay` seconds and reports `tokens` output tokens."""
+    def __init__(self, provider, delay, text, tokens):
+        super().__init__(ModelConfig(provider=provider, model="m"))
+        self.delay, self.text, self.tokens = delay, text, tokens
+        self.finished = threading.Event()
+
+    def _generate(self, prompt, n):
+        time.sleep(self.delay)
+        telemetry.add_tokens(1, self.tokens)
+        self.finished.set()
+        return [self.text] * n
+
+    async def _agenerate(self, prompt, n):
+        await asyncio.sleep(self.delay)
+        telemetry.add_tokens(1, self.tokens)
+        self.finished.set()
+        return [self.text] * n
+
+def test_hedge_loser_does_not_touch_the_logged_trace(tmp_path):
+    primary = SleepyClient("hedge-slow", 0.3, "slow", 1000)
+    backup = SleepyClient("hedge-fast", 0.0, "fast", 10)
+    client = HedgedClient(primary, [backup], HedgePolicy(initial_delay=0.05))
+    log = telemetry.start_log(str(tmp_path / "t.jsonl"))
+    try:
+        assert client.generate("p") == ["fast"]
+        assert primary.finished.wait(5)
+        log.flush()
+        assert telemetry.read_columns(log.path)["output_tokens"] == [10]
+    finally:
+        telemetry.stop_log()
+        close_clients()
+    assert model_clients._HEDGE_EXECUTOR is None
+    assert client.generate("p") == ["fast"]  # a later call starts a fresh executor
+    close_clients()
@@ -0,0 +1,72 @@
+"""
+Replay recordings: prompts are logged when a cell starts and results when it
+finishes, so load_recordings must join the two logs by cell, not by line.
+Streamed synthetic completions stop at the end of the code block.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from model_clients import ModelConfig
+from offline_clients import SyntheticClient, load_recordings, prompt_hash
+
+MODEL = {"provider": "google", "model": "gemini"}
+
+def write_logs(tmp_path, prompt_cells, result_cells):
+    with open(tmp_path / "x_prompts.jsonl", "w") as f:
+        for problem in prompt_cells:
+            f.write(json.dumps({"model": MODEL, "strategy": "cot", "problem": problem, "prompt": f"solve {problem}"}) + "\n")
+    with open(tmp_path / "x_results.jsonl", "w") as f:
+        for problem in result_cells:
+            f.write(json.dumps({"model": MODEL, "strategy": "cot", "problem": problem,
+                                "history": [{"code": f"# {problem}"}]}) + "\n")
+
+def test_joined_by_cell_not_line(tmp_path):
+    write_logs(tmp_path, ["a", "b", "c"], ["c", "a", "b"])  # completion order differs from start order
+    index = load_recordings(tmp_path)
+    for problem in "abc":
+        assert index[prompt_hash(f"solve {problem}")] == {"gemini": [f"# {problem}"]}
+
+@pytest.mark.parametrize("prompt_cells, result_cells", [(["a", "b"], ["a"]), (["a"], ["a", "b"])])
+def test_orphan_rows_raise(tmp_path, prompt_cells, result_cells):
+    write_logs(tmp_path, prompt_cells, result_cells)
+    with pytest.raises(ValueError, match="logged in only one"):
+        load_recordings(tmp_path)
+
+class TrackedSynthetic(SyntheticClient):
+    """Counts the chunks the provider streamed and the streams that were closed."""
+    def __init__(self, cfg):
+        super().__init__(cfg)
+        self.streamed = self.closed = 0
+
+    def _stream(self, prompt):
+        try:
+            for piece in super()._stream(prompt):
+                self.streamed += 1
+                yield piece
+        finally:
+            self.closed += 1
+
+    async def _astream(self, prompt):
+        try:
+            async for piece in super()._astream(prompt):
+                self.streamed += 1
+                yield piece
+        finally:
+            self.closed += 1
+
+EPILOGUE = "\n\nThis solution runs in linear time. " * 20
+PROMPT = "Implement def int_to_roman(num: int) -> str:"
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_stream_stops_at_the_closing_fence(use_async):
+    client = TrackedSynthetic(ModelConfig(provider="synthetic", model="s", stream=True, options={"epilogue": EPILOGUE}))
+    outs = asyncio.run(client.agenerate(PROMPT, 2)) if use_async else client.generate(PROMPT, 2)
+    full = client._respond(PROMPT, 1)[0]
+    for out in outs:
+        assert out.startswith("```") and out.rstrip().endswith("```")
+        assert "linear time" not in out
+    assert client.closed == 2
+    assert client.streamed < 2 * len(full) / client.stream_chunk_chars  # the epilogue was never read
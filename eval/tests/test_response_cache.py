@@ -0,0 +1,61 @@
+"""
+ResponseCache keys and write semantics: the first completion stored under a
+key is the one every later reader (resume, replay, other shards) gets.
+"""
+
+import asyncio
+
+from model_clients import ModelClient, ModelConfig
+from response_cache import CachedClient, ResponseCache
+
+CFG = ModelConfig(provider="synthetic", model="m")
+
+class CountingClient(ModelClient):
+    """Answers "<tag>-<call number>" so tests can tell generations apart."""
+    def __init__(self, tag):
+        super().__init__(CFG)
+        self.tag = tag
+        self.calls = 0
+
+    def _generate(self, prompt, n):
+        self.calls += 1
+        return [f"{self.tag}-{self.calls}-{i}" for i in range(n)]
+
+    async def _agenerate(self, prompt, n):
+        return self._generate(prompt, n)
+
+def test_purpose_namespaces_keys():
+    assert ResponseCache.key(CFG, "p", 0) != ResponseCache.key(CFG, "p", 0, "self_repair")
+    assert ResponseCache.key(CFG, "p", 0) == ResponseCache.key(CFG, "p", 0, "")
+
+def test_first_writer_wins(tmp_path):
+    cache = ResponseCache(tmp_path / "c.sqlite")
+    key = ResponseCache.key(CFG, "p", 0)
+    assert cache.put_many(CFG, [(key, "first")]) == {key: "first"}
+    assert cache.put_many(CFG, [(key, "second")]) == {key: "first"}
+    assert cache.get_many([key]) == {key: "first"}
+    assert cache.stats()["bytes"] == len("first")
+
+def test_racing_clients_settle_on_stored_text(tmp_path):
+    cache = ResponseCache(tmp_path / "c.sqlite")
+    a, b = CachedClient(CFG, cache, CountingClient("a")), CachedClient(CFG, cache, CountingClient("b"))
+    # both miss before either stores, as two concurrent cells would
+    keys, found_a, missing_a = a._lookup("p", [0], "")
+    _, found_b, missing_b = b._lookup("p", [0], "")
+    a._store(found_a, missing_a, ["from-a"])
+    b._store(found_b, missing_b, ["from-b"])
+    assert found_a[keys[0]] == found_b[keys[0]] == "from-a"
+
+def test_repair_drafts_do_not_overwrite_scored_samples(tmp_path):
+    client = CachedClient(CFG, ResponseCache(tmp_path / "c.sqlite"), CountingClient("x"))
+    scored = asyncio.run(client.agenerate_at("p", [0]))
+    draft = asyncio.run(client.agenerate_at("p", [0], purpose="self_repair"))
+    assert draft != scored
+    assert asyncio.run(client.agenerate_at("p", [0])) == scored
+
+def test_unset_sampling_keeps_the_default_keys():
+    explicit = ModelConfig(provider="openai", model="m", temperature=0.6, max_tokens=1024)
+    assert ResponseCache.key(ModelConfig(provider="openai", model="m"), "p", 0) == ResponseCache.key(explicit, "p", 0)
+    gemini = ModelConfig(provider="google", model="g")  # sent without a temperature or length cap
+    assert ResponseCache.key(gemini, "p", 0) != ResponseCache.key(ModelConfig(provider="google", model="g", temperature=0.6,
+                                                                              max_tokens=1024), "p", 0)
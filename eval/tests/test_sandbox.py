@@ -0,0 +1,60 @@
+"""
+SandboxPool isolation: a candidate that loops, allocates without bound, exits
+or hangs costs its own worker, never the pool or the orchestrator.
+"""
+
+from pathlib import Path
+
+import pytest
+
+from sandbox import SandboxPool
+
+# a real file, so forkserver workers can load it by path
+SUITE = Path(__file__).resolve().parent / "sandbox_suite.py"
+
+def candidate(body):
+    return "def f():\n" + "".join(f"    {line}\n" for line in body.splitlines())
+
+GETPID = candidate("import os\nreturn os.getpid()")
+
+@pytest.fixture
+def pool():
+    with SandboxPool(1, timeout=10, cpu_seconds=1, memory_mb=256) as pool:
+        yield pool
+
+def assert_still_serves(pool):
+    assert pool.run(candidate("return 1"), "f", SUITE) == (True, ["1"], None)
+
+def test_runs_candidate(pool):
+    assert_still_serves(pool)
+
+def test_infinite_loop_hits_cpu_limit(pool):
+    passed, failures, _ = pool.run(candidate("while True:\n    pass"), "f", SUITE)
+    assert not passed and failures == ["Exceeded CPU limit of 1s"]
+    assert_still_serves(pool)
+
+def test_memory_blowup_is_contained(pool):
+    passed, failures, _ = pool.run(candidate("return len(bytearray(1 << 30))"), "f", SUITE)
+    assert not passed and "memory" in failures[0].lower()
+    assert_still_serves(pool)
+
+@pytest.mark.parametrize("body, code", [("import sys\nsys.exit(3)", 3), ("import os\nos._exit(0)", 0)])
+def test_exit_crashes_only_the_worker(pool, body, code):
+    passed, failures, _ = pool.run(candidate(body), "f", SUITE)
+    assert not passed and failures == [f"Sandbox worker crashed (exit code {code})"]
+    assert_still_serves(pool)
+
+def test_wall_clock_timeout(pool):
+    passed, failures, _ = pool.run(candidate("import time\ntime.sleep(60)"), "f", SUITE, timeout=0.5)
+    assert not passed and failures == ["Timed out after 0.5s"]
+    assert_still_serves(pool)
+
+def test_workers_recycled_after_max_tasks():
+    with SandboxPool(1, max_tasks_per_worker=2) as pool:
+        pids = [pool.run(GETPID, "f", SUITE)[1][0] for _ in range(3)]
+    assert pids[0] == pids[1] != pids[2]
+
+def test_worker_replaced_after_crash(pool):
+    before = pool.run(GETPID, "f", SUITE)[1][0]
+    pool.run(candidate("import os\nos._exit(1)"), "f", SUITE)
+    assert pool.run(GETPID, "f", SUITE)[1][0] != before
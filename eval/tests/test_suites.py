@@ -0,0 +1,18 @@
+"""
+The reference solutions pass every suite, stress tier included: a suite
+whose scale cases a correct, efficient solution can't meet is a broken suite.
+"""
+
+import pytest
+
+from offline_clients import SOLUTIONS_DIR
+from sandbox import execute_candidate, load_suite
+from strategies import TESTS_DIR
+
+@pytest.mark.parametrize("name", sorted(p.stem for p in SOLUTIONS_DIR.glob("*.py")))
+def test_solution_passes_its_suite_at_scale(name):
+    suite = load_suite(TESTS_DIR / f"test_{name}.py")
+    code = (SOLUTIONS_DIR / f"{name}.py").read_text()
+    passed, failures, cases = execute_candidate(code, name, suite, {"scale": True})
+    assert passed, failures
+    assert any(case[0].startswith("scale") for case in cases)
@@ -0,0 +1,64 @@
+"""
+WorkQueue leases: expiry hands a task to the next worker, every lease is an
+attempt, and a task out of attempts is given up on.
+"""
+
+import pytest
+
+from work_queue import WorkQueue
+
+@pytest.fixture
+def queue(tmp_path):
+    q = WorkQueue(tmp_path / "queue.sqlite", max_attempts=2)
+    q.fill(2, "grid")
+    yield q
+    q.close()
+
+def test_tasks_are_leased_once_until_completed(queue):
+    assert queue.lease("a", 60) == 0
+    assert queue.lease("b", 60) == 1
+    assert queue.lease("c", 60) is None
+    queue.complete(0)
+    queue.complete(1)
+    assert queue.finished()
+    assert queue.counts() == {"done": 2}
+
+def test_expired_lease_goes_to_the_next_worker(queue):
+    assert queue.lease("a", -1) == 0  # a died without renewing
+    assert queue.lease("b", 60) == 0
+    queue.release(0, "a")  # a's late failure report doesn't take the task from b
+    assert queue.lease("c", 60) == 1
+    assert queue.lease("c", 60) is None
+
+def test_renew_keeps_the_lease(queue):
+    assert queue.lease("a", -1) == 0
+    queue.renew("a", 60)
+    assert queue.lease("b", 60) == 1
+
+def test_task_out_of_attempts_is_given_up(queue):
+    assert queue.lease("a", 60) == 0
+    queue.release(0, "a")
+    assert queue.lease("b", -1) == 0
+    assert queue.lease("c", 60) == 1  # task 0 has had its max_attempts
+    queue.complete(1)
+    assert queue.finished()
+    assert queue.counts() == {"failed": 1, "done": 1}
+
+def test_live_lease_keeps_the_queue_unfinished(queue):
+    queue.lease("a", 60)
+    queue.lease("a", 60)
+    queue.complete(0)
+    assert not queue.finished()
+    assert queue.counts() == {"done": 1, "leased": 1}
+
+def test_refill_resets_attempts_but_keeps_done_tasks(queue):
+    queue.lease("a", 60)
+    queue.complete(0)
+    queue.lease("a", -1)
+    queue.lease("b", -1)
+    queue.fill(2, "grid")  # resume
+    assert queue.lease("c", 60) == 1
+    queue.fill(2, "other grid")
+    with pytest.raises(ValueError):
+        queue.check("grid")
+    assert queue.counts() == {"pending": 2}
@@ -0,0 +1,100 @@
+import os, time, sqlite3, threading
+from typing import Dict, Optional
+
+class WorkQueue:
+    """SQLite task queue of grid cells that local worker processes lease with a timeout.
+
+    A lease is held until the worker completes the task or stops renewing it; a
+    lease that runs out (the worker died or hung) makes the task available to
+    the next lease() call. Every lease counts as an attempt, and a task that
+    has been attempted max_attempts times is given up on.
+    """
+    def __init__(self, path: str, max_attempts: int = 3):
+        self.path = str(path)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # isolation_level=None: transactions are explicit, so a lease is one BEGIN IMMEDIATE
+        self._db = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY, state TEXT DEFAULT 'pending', worker TEXT,
+            lease_until REAL, attempts INTEGER DEFAULT 0)""")
+
+    def fill(self, tasks: int, grid: str, reset: bool = False):
+        """Queue tasks 0..tasks-1 for the grid fingerprint `grid`; kept as they are if already queued, unless reset."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT value FROM meta WHERE key='grid'").fetchone()
+                if reset or (row and row[0] != grid):
+                    self._db.execute("DELETE FROM tasks")
+                else:
+                    # resuming: every unfinished task gets a fresh set of attempts
+                    self._db.execute("UPDATE tasks SET state='pending', worker=NULL, lease_until=NULL, attempts=0 WHERE state != 'done'")
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES ('grid', ?)", (grid,))
+                self._db.executemany("INSERT OR IGNORE INTO tasks (id) VALUES (?)", ((i,) for i in range(tasks)))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def check(self, grid: str):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key='grid'").fetchone()
+        if not row or row[0] != grid:
+            raise ValueError(f"Work queue {self.path} holds a different grid; refill it from this sweep")
+
+    def lease(self, worker: str, timeout: float) -> Optional[int]:
+        """Claim the next pending (or abandoned) task for `timeout` seconds; None if none is available now."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id FROM tasks WHERE attempts < ? AND (state='pending' OR (state='leased' AND lease_until < ?))"
+                    " ORDER BY id LIMIT 1", (self.max_attempts, now)).fetchone()
+                if row:
+                    self._db.execute("UPDATE tasks SET state='leased', worker=?, lease_until=?, attempts=attempts+1 WHERE id=?",
+                                     (worker, now + timeout, row[0]))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return row[0] if row else None
+
+    def renew(self, worker: str, timeout: float):
+        """Extend every lease `worker` still holds; called periodically while it works."""
+        with self._lock:
+            self._db.execute("UPDATE tasks SET lease_until=? WHERE state='leased' AND worker=?", (time.time() + timeout, worker))
+
+    def complete(self, task: int):
+        with self._lock:
+            self._db.execute("UPDATE tasks SET state='done', worker=NULL, lease_until=NULL WHERE id=?", (task,))
+
+    def release(self, task: int, worker: str):
+        """Hand a task back after a failure, if `worker` still holds it."""
+        with self._lock:
+            self._db.execute("UPDATE tasks SET state='pending', worker=NULL, lease_until=NULL WHERE id=? AND worker=?",
+                             (task, worker))
+
+    def finished(self) -> bool:
+        """True once no task can be leased now or later: all done or given up, and no live leases."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COUNT(*) FROM tasks WHERE state != 'done' AND (attempts < ? OR (state='leased' AND lease_until >= ?))",
+                (self.max_attempts, time.time())).fetchone()
+        return row[0] == 0
+
+    def counts(self) -> Dict[str, int]:
+        """Tasks per state, with tasks out of attempts reported as 'failed'."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT CASE WHEN state != 'done' AND attempts >= ? AND NOT (state='leased' AND lease_until >= ?)"
+                " THEN 'failed' ELSE state END, COUNT(*) FROM tasks GROUP BY 1", (self.max_attempts, time.time())).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -13,7 +13,7 @@ def min_window_substring(s: str, t: str) -> str:
     formed = 0
     left = 0
     min_len = float('inf')
-    result = ""
+    best_left = 0
 
     for right, char in enumerate(s):
         if char in target_counts:
@@ -25,7 +25,7 @@ def min_window_substring(s: str, t: str) -> str:
             current_len = right - left + 1
             if current_len < min_len:
                 min_len = current_len
-                result = s[left:right+1]
+                best_left = left
 
             left_char = s[left]
             if left_char in target_counts:
@@ -34,4 +34,4 @@ def min_window_substring(s: str, t: str) -> str:
                     formed -= 1
             left += 1
 
-    return result
\ No newline at end of file
+    return s[best_left:best_left + min_len] if min_len != float('inf') else ""
\ No newline at end of file
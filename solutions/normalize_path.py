@@ -25,7 +25,8 @@ def normalize_path(path: str) -> str:
     normalized = '/'.join(segments)
     if is_absolute:
         normalized = '/' + normalized
-    if path.endswith('/') and normalized == '':
-        normalized = '/'
+    # a path naming a directory ('/', '.' or '..' last) keeps its trailing slash
+    if normalized and not normalized.endswith('/') and path.split('/')[-1] in ('', '.', '..'):
+        normalized += '/'
     
     return normalized
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""Per-case results for the suites in this directory.
+
+Each suite's run_cases(impl, **options) checks its cases one at a time
+through a Cases collector (options are Cases' keyword arguments) and returns
+one CaseResult per case that ran. run_tests(impl) folds those into the
+(passed, failure messages) pair that older callers expect.
+
+Every suite also has a scale tier, off by default: stress cases built by a
+seeded generator in the suite (stress_input), around a million elements or
+megabytes each, that must finish within a CPU-time budget. They tell an
+O(n log n) candidate from an O(n^2) one, which the small cases can't.
+stress_input is cached per process and skipped once fail_fast has stopped
+the run; mutable inputs go to the candidate as copies.
+"""
+import time, signal, hashlib, threading, contextlib
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, List, Optional, Tuple, Type
+
+PASS, FAIL, ERROR, TIMEOUT = "pass", "fail", "error", "timeout"
+
+@dataclass
+class CaseResult:
+    case_id: str                     # stable within a suite, so results line up across candidates
+    status: str                      # PASS, FAIL (wrong answer), ERROR (raised) or TIMEOUT
+    duration: float                  # seconds spent in the candidate
+    message: str = ""                # what run_tests reports for a case that didn't pass
+    exc_type: Optional[str] = None
+    expected: Optional[str] = None   # digests of expected and actual values, when they differ
+    actual: Optional[str] = None
+
+def digest(value: Any) -> str:
+    return hashlib.blake2b(repr(value).encode("utf-8", "backslashreplace"), digest_size=8).hexdigest()
+
+class CaseTimeout(BaseException):
+    """Raised inside the candidate when a case outlives its time limit.
+
+    A BaseException, so candidate code catching Exception can't swallow it.
+    """
+
+@contextlib.contextmanager
+def time_limit(seconds: Optional[float], cpu: bool = False) -> Iterator[None]:
+    """Raise CaseTimeout after `seconds` of wall-clock time via SIGALRM, or of
+    the process's CPU time via SIGPROF when cpu is set.
+
+    Only the main thread receives signals, so elsewhere (or without
+    setitimer, e.g. on Windows) this does nothing and the sandbox's
+    whole-candidate timeout is the only limit.
+    """
+    if not seconds or not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    timer, signum = (signal.ITIMER_PROF, signal.SIGPROF) if cpu else (signal.ITIMER_REAL, signal.SIGALRM)
+    def expire(signum, frame):
+        raise CaseTimeout()
+    previous = signal.signal(signum, expire)
+    signal.setitimer(timer, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(timer, 0)
+        signal.signal(signum, previous)
+
+class Cases:
+    """Runs checks against a candidate and collects a CaseResult for each.
+
+    case_timeout limits every call into the candidate; fail_fast skips the
+    remaining checks after the first case that doesn't pass, for callers that
+    only need the pass/fail verdict. scale turns on the suite's stress cases.
+    """
+    def __init__(self, case_timeout: Optional[float] = None, fail_fast: bool = False, scale: bool = False):
+        self.case_timeout = case_timeout
+        self.fail_fast = fail_fast
+        self.scale = scale
+        self.results: List[CaseResult] = []
+
+    @property
+    def stopped(self) -> bool:
+        return self.fail_fast and any(r.status != PASS for r in self.results[-1:])
+
+    def _timed_out(self, case_id: str, start: float, message: str):
+        self._add(case_id, TIMEOUT, time.perf_counter() - start, message, exc_type=CaseTimeout.__name__)
+
+    def expect(self, case_id: str, call: Callable[[], Any], expected: Any, label: str,
+               ok: Optional[Callable[[Any], bool]] = None, wrong: Optional[str] = None, budget: Optional[float] = None):
+        """call() should return `expected` (or satisfy ok); label names the input in messages.
+
+        budget is the CPU seconds this case may take, in place of
+        case_timeout (stress cases): CPU time, so that other sandbox workers
+        sharing the cores don't push a candidate over. Pass `wrong` for big
+        inputs: the default message quotes the result.
+        """
+        if self.stopped:
+            return
+        start = time.perf_counter()
+        try:
+            with time_limit(budget, cpu=True) if budget else time_limit(self.case_timeout):
+                got = call()
+            took = time.perf_counter() - start
+            good = ok(got) if ok else got == expected
+        except CaseTimeout:
+            self._timed_out(case_id, start, f"{label} took over {budget}s of CPU" if budget
+                            else f"{label} timed out after {self.case_timeout}s")
+            return
+        except Exception as e:
+            self._add(case_id, ERROR, time.perf_counter() - start, f"{label} raised {e.__class__.__name__}: {e}",
+                      exc_type=e.__class__.__name__)
+            return
+        if good:
+            self._add(case_id, PASS, took)
+        else:
+            self._add(case_id, FAIL, took, wrong or f"{label} -> {got!r}, expected {expected!r}",
+                      expected=digest(expected), actual=digest(got))
+
+    def expect_raises(self, case_id: str, call: Callable[[], Any], exc_type: Type[BaseException], label: str, missing: str):
+        """call() should raise exc_type; `missing` is the message when it returns instead."""
+        if self.stopped:
+            return
+        start = time.perf_counter()
+        try:
+            with time_limit(self.case_timeout):
+                got = call()
+        except CaseTimeout:
+            self._timed_out(case_id, start, f"{label} timed out after {self.case_timeout}s")
+            return
+        except exc_type:
+            self._add(case_id, PASS, time.perf_counter() - start)
+            return
+        except Exception as e:
+            self._add(case_id, ERROR, time.perf_counter() - start,
+                      f"{label} raised {e.__class__.__name__}, expected {exc_type.__name__}", exc_type=e.__class__.__name__)
+            return
+        self._add(case_id, FAIL, time.perf_counter() - start, missing, expected=exc_type.__name__, actual=digest(got))
+
+    def _add(self, case_id: str, status: str, duration: float, message: str = "", **fields):
+        self.results.append(CaseResult(case_id, status, duration, message, **fields))
+
+def summarize(results: List[CaseResult]) -> Tuple[bool, List[str]]:
+    failures = [r.message for r in results if r.status != PASS]
+    return (len(failures) == 0, failures)
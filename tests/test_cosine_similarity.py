@@ -1,35 +1,37 @@
+import os, sys, functools, math, random
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # harness.py sits next to the suites
+from harness import Cases, summarize
 
-def run_tests(impl):
-    failures = []
-    def approx(a,b,eps=1e-9): return abs(a-b) <= eps
-
-    try:
-        if not approx(impl([1,0,0],[1,0,0]), 1.0):
-            failures.append("identical vectors not 1.0")
-    except Exception as e:
-        failures.append(f"identical raised {e.__class__.__name__}: {e}")
+# (a, b, expected, message when wrong, label when it raises)
+CASES = [
+    ([1,0,0], [1,0,0], 1.0, "identical vectors not 1.0", "identical"),
+    ([1,1], [0,0], 0.0, "zero vector should yield 0.0", "zero vector"),
+    ([1,2,3], [4,5,6], (1*4+2*5+3*6)/(math.sqrt(1+4+9)*math.sqrt(16+25+36)), "3D cosine incorrect", "3D"),
+]
 
-    try:
-        if not approx(impl([1,1],[0,0]), 0.0):
-            failures.append("zero vector should yield 0.0")
-    except Exception as e:
-        failures.append(f"zero vector raised {e.__class__.__name__}: {e}")
+@functools.lru_cache(maxsize=None)
+def stress_input(seed: int = 0, n: int = 10**6):
+    """(a, b, expected) for n-element vectors: b parallel to a, then a and b orthogonal."""
+    rng = random.Random(seed)
+    a = [rng.uniform(-1, 1) for _ in range(n)]
+    evens = [x if i % 2 == 0 else 0.0 for i, x in enumerate(a)]
+    odds = [x if i % 2 else 0.0 for i, x in enumerate(a)]
+    return [(a, [3 * x for x in a], 1.0), (evens, odds, 0.0)]
 
-    try:
-        val = impl([1,2,3],[4,5,6])
-        import math
-        expected = (1*4+2*5+3*6)/(math.sqrt(1+4+9)*math.sqrt(16+25+36))
-        if abs(val - expected) > 1e-9:
-            failures.append("3D cosine incorrect")
-    except Exception as e:
-        failures.append(f"3D raised {e.__class__.__name__}: {e}")
+def run_cases(impl, **options):
+    c = Cases(**options)
+    for i, (a, b, expected, wrong, label) in enumerate(CASES):
+        c.expect(f"case{i}", lambda: impl(list(a), list(b)), expected, label,
+                 ok=lambda got: abs(got - expected) <= 1e-9, wrong=wrong)
+    c.expect_raises("length_mismatch", lambda: impl([1,2],[1,2,3]), ValueError, "len mismatch",
+                    missing="Expected ValueError for length mismatch")
 
-    try:
-        impl([1,2],[1,2,3])
-        failures.append("Expected ValueError for length mismatch")
-    except ValueError:
-        pass
-    except Exception as e:
-        failures.append(f"len mismatch raised {e.__class__.__name__}, expected ValueError")
+    if c.scale and not c.stopped:
+        for name, (a, b, expected) in zip(("scale_parallel", "scale_orthogonal"), stress_input()):
+            c.expect(name, lambda: impl(list(a), list(b)), expected, f"{len(a)}-element {name[6:]}",
+                     ok=lambda got: abs(got - expected) <= 1e-9, wrong=f"{len(a)}-element {name[6:]} vectors incorrect",
+                     budget=10.0)
+    return c.results
 
-    return (len(failures) == 0, failures)
+def run_tests(impl):
+    return summarize(run_cases(impl))
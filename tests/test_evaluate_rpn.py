@@ -1,27 +1,43 @@
+import os, sys, functools, random
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # harness.py sits next to the suites
+from harness import Cases, summarize
 
-def run_tests(impl):
-    failures = []
-    cases = [
-        (["2","1","+","3","*"], 9),
-        (["4","13","5","/","+"], 6),
-        (["10","6","9","3","+","-11","*","/","*","17","+","5","+"], 22),
-        (["3","-4","/"], -0)  # trunc toward zero -> 0
-    ]
-    for tokens, exp in cases:
-        try:
-            got = impl(tokens)
-            if got != exp:
-                failures.append(f"{tokens} -> {got!r}, expected {exp!r}")
-        except Exception as e:
-            failures.append(f"{tokens} raised {e.__class__.__name__}: {e}")
+CASES = [
+    (["2","1","+","3","*"], 9),
+    (["4","13","5","/","+"], 6),
+    (["10","6","9","3","+","-11","*","/","*","17","+","5","+"], 22),
+    (["3","-4","/"], -0)  # trunc toward zero -> 0
+]
+
+@functools.lru_cache(maxsize=None)
+def stress_input(seed: int = 0, n: int = 10**6):
+    """Two n-token expressions of + and -: one folded left (stack depth 2), one right (depth n/2)."""
+    rng = random.Random(seed)
+    m = n // 2
+    nums = [rng.randint(-1000, 1000) for _ in range(m)]
+    ops = rng.choices("+-", k=m - 1)
+    flat, left = [str(nums[0])], nums[0]
+    for x, op in zip(nums[1:], ops):
+        flat += [str(x), op]
+        left = left + x if op == "+" else left - x
+    right = nums[-1]
+    for x, op in zip(reversed(nums[:-1]), ops):
+        right = x + right if op == "+" else x - right
+    return [(flat, left), ([str(x) for x in nums] + ops, right)]
+
+def run_cases(impl, **options):
+    c = Cases(**options)
+    for i, (tokens, exp) in enumerate(CASES):
+        c.expect(f"case{i}", lambda: impl(list(tokens)), exp, str(tokens))
 
     # Error: div by zero
-    try:
-        impl(["1","0","/"])
-        failures.append("Expected ValueError for division by zero")
-    except ValueError:
-        pass
-    except Exception as e:
-        failures.append(f"div by zero raised {e.__class__.__name__}, expected ValueError")
+    c.expect_raises("div_by_zero", lambda: impl(["1","0","/"]), ValueError, "div by zero",
+                    missing="Expected ValueError for division by zero")
 
-    return (len(failures) == 0, failures)
+    if c.scale and not c.stopped:
+        for name, (tokens, exp) in zip(("scale_flat", "scale_deep"), stress_input()):
+            c.expect(name, lambda: impl(list(tokens)), exp, f"{len(tokens)} tokens, {name[6:]}", budget=10.0)
+    return c.results
+
+def run_tests(impl):
+    return summarize(run_cases(impl))
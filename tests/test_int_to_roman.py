@@ -1,26 +1,45 @@
+import os, sys, functools, random
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # harness.py sits next to the suites
+from harness import Cases, summarize
 
-def run_tests(impl):
-    failures = []
-    known = {
-        1:'I', 4:'IV', 9:'IX', 58:'LVIII', 1994:'MCMXCIV', 3999:'MMMCMXCIX',
-        44:'XLIV', 945:'CMXLV', 3888:'MMMDCCCLXXXVIII'
-    }
-    for n, r in known.items():
-        try:
-            got = impl(n)
-            if got != r:
-                failures.append(f"{n} -> {got!r}, expected {r!r}")
-        except Exception as e:
-            failures.append(f"{n} raised {e.__class__.__name__}: {e}")
+KNOWN = {
+    1:'I', 4:'IV', 9:'IX', 58:'LVIII', 1994:'MCMXCIV', 3999:'MMMCMXCIX',
+    44:'XLIV', 945:'CMXLV', 3888:'MMMDCCCLXXXVIII'
+}
+OUT_OF_RANGE = [0, -1, 4000, 10000]
+
+NUMERALS = [(1000, "M"), (900, "CM"), (500, "D"), (400, "CD"), (100, "C"), (90, "XC"),
+            (50, "L"), (40, "XL"), (10, "X"), (9, "IX"), (5, "V"), (4, "IV"), (1, "I")]
+
+def _roman(n):
+    out = []
+    for value, numeral in NUMERALS:
+        count, n = divmod(n, value)
+        out.append(numeral * count)
+    return "".join(out)
+
+@functools.lru_cache(maxsize=None)
+def stress_input(seed: int = 0, n: int = 10**5):
+    """n random values in 1..3999 and their numerals. The input range is fixed, so scale here means call volume."""
+    rng = random.Random(seed)
+    values = [rng.randint(1, 3999) for _ in range(n)]
+    return values, [_roman(v) for v in values]
+
+def run_cases(impl, **options):
+    c = Cases(**options)
+    for n, r in KNOWN.items():
+        c.expect(str(n), lambda: impl(n), r, str(n))
 
     # Edge cases
-    for bad in [0, -1, 4000, 10000]:
-        try:
-            impl(bad)
-            failures.append(f"Expected ValueError for {bad}")
-        except ValueError:
-            pass
-        except Exception as e:
-            failures.append(f"{bad} raised {e.__class__.__name__}, expected ValueError")
-
-    return (len(failures) == 0, failures)
+    for bad in OUT_OF_RANGE:
+        c.expect_raises(f"out_of_range_{bad}", lambda: impl(bad), ValueError, str(bad),
+                        missing=f"Expected ValueError for {bad}")
+
+    if c.scale and not c.stopped:
+        values, expected = stress_input()
+        c.expect("scale", lambda: [impl(v) for v in values], expected, f"{len(values)} conversions",
+                 wrong=f"wrong numerals among {len(values)} conversions", budget=10.0)
+    return c.results
+
+def run_tests(impl):
+    return summarize(run_cases(impl))
@@ -1,20 +1,40 @@
+import os, sys, functools, random, string
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # harness.py sits next to the suites
+from harness import Cases, summarize
+
+CASES = [
+    ("A man, a plan, a canal: Panama", True),
+    ("No lemon, no melon!", True),
+    ("race a car", False),
+    ("", True),
+    ("!!!!", True),
+    ("ab@#a", True),
+    ("Aa", True)
+]
+
+@functools.lru_cache(maxsize=None)
+def stress_input(seed: int = 0, n: int = 10**6):
+    """Two sentences around 4 MB, each with n alphanumerics per half: a palindrome, then one with a single mismatch."""
+    rng = random.Random(seed)
+    half = rng.choices(string.ascii_letters + string.digits, k=n)
+    # mostly no separator between characters, otherwise spaces and punctuation
+    def spaced(chars):
+        return "".join(ch + sep for ch, sep in zip(chars, rng.choices(["", "", " ", ", ", "!", "'"], k=len(chars))))
+    mirrored = "".join(reversed(half)).swapcase()
+    wrong = list(mirrored)
+    i = rng.randrange(n)
+    wrong[i] = "0" if wrong[i].lower() != "0" else "1"
+    return [(spaced(half) + spaced(mirrored), True), (spaced(half) + spaced(wrong), False)]
+
+def run_cases(impl, **options):
+    c = Cases(**options)
+    for i, (s, exp) in enumerate(CASES):
+        c.expect(f"case{i}", lambda: impl(s), exp, repr(s))
+
+    if c.scale and not c.stopped:
+        for name, (s, exp) in zip(("scale_palindrome", "scale_mismatch"), stress_input()):
+            c.expect(name, lambda: impl(s), exp, f"{len(s) >> 20} MB {name[6:]}", budget=10.0)
+    return c.results
 
 def run_tests(impl):
-    failures = []
-    cases = [
-        ("A man, a plan, a canal: Panama", True),
-        ("No lemon, no melon!", True),
-        ("race a car", False),
-        ("", True),
-        ("!!!!", True),
-        ("ab@#a", True),
-        ("Aa", True)
-    ]
-    for s, exp in cases:
-        try:
-            got = impl(s)
-            if got != exp:
-                failures.append(f"{s!r} -> {got!r}, expected {exp!r}")
-        except Exception as e:
-            failures.append(f"{s!r} raised {e.__class__.__name__}: {e}")
-    return (len(failures) == 0, failures)
+    return summarize(run_cases(impl))
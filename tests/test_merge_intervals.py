@@ -1,19 +1,42 @@
+import os, sys, functools, random
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # harness.py sits next to the suites
+from harness import Cases, summarize
 
-def run_tests(impl):
-    failures = []
-    def check(inp, expected):
-        try:
-            got = impl(inp)
-            if got != expected:
-                failures.append(f"{inp!r} -> {got!r}, expected {expected!r}")
-        except Exception as e:
-            failures.append(f"{inp!r} raised {e.__class__.__name__}: {e}")
+CASES = [
+    ([(1,3),(2,6),(8,10),(15,18)], [(1,6),(8,10),(15,18)]),
+    ([(1,4),(4,5)], [(1,5)]),
+    ([], []),
+    ([(1,1)], [(1,1)]),
+    ([(5,7),(1,2),(2,3)], [(1,3),(5,7)]),
+    ([(1,5),(2,3)], [(1,5)]),
+]
+
+@functools.lru_cache(maxsize=None)
+def stress_input(seed: int = 0, n: int = 10**6):
+    """About n shuffled intervals that merge into n/10 known blocks: touching chains plus nested pieces."""
+    rng = random.Random(seed)
+    intervals, blocks, start = [], [], 0
+    while len(intervals) < n:
+        cuts = sorted(rng.sample(range(start, start + 1000), 8))
+        intervals += list(zip(cuts, cuts[1:]))
+        for _ in range(3):
+            lo = rng.randint(cuts[0], cuts[-1])
+            intervals.append((lo, rng.randint(lo, cuts[-1])))
+        blocks.append((cuts[0], cuts[-1]))
+        start = cuts[-1] + rng.randint(1, 50)
+    rng.shuffle(intervals)
+    return intervals, blocks
 
-    check([(1,3),(2,6),(8,10),(15,18)], [(1,6),(8,10),(15,18)])
-    check([(1,4),(4,5)], [(1,5)])
-    check([], [])
-    check([(1,1)], [(1,1)])
-    check([(5,7),(1,2),(2,3)], [(1,3),(5,7)])
-    check([(1,5),(2,3)], [(1,5)])
+def run_cases(impl, **options):
+    c = Cases(**options)
+    for i, (inp, expected) in enumerate(CASES):
+        c.expect(f"case{i}", lambda: impl(list(inp)), expected, repr(inp))
 
-    return (len(failures) == 0, failures)
+    if c.scale and not c.stopped:
+        intervals, expected = stress_input()
+        c.expect("scale", lambda: impl(list(intervals)), expected, f"{len(intervals)} intervals",
+                 wrong=f"{len(intervals)} intervals merged wrong", budget=10.0)
+    return c.results
+
+def run_tests(impl):
+    return summarize(run_cases(impl))
@@ -1,20 +1,42 @@
+import os, sys, functools, random
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # harness.py sits next to the suites
+from harness import Cases, summarize
+
+CASES = [
+    ("ADOBECODEBANC", "ABC", "BANC"),
+    ("a", "a", "a"),
+    ("a", "aa", ""),
+    ("ab", "b", "b"),
+    ("ab", "A", ""),
+    ("", "a", ""),
+    ("aa", "aa", "aa"),
+]
+
+@functools.lru_cache(maxsize=None)
+def stress_input(seed: int = 0, n: int = 2 * 2**20):
+    """(s, t, expected) on one n-character s: a window planted in the second half, then a t with no window."""
+    rng = random.Random(seed)
+    filler = "abcdefghijklmnopqrstuvw"  # no x, y or z outside the planted window and the decoys
+    s = rng.choices(filler, k=n)
+    for i in rng.sample(range(n // 4), 1000):
+        s[i] = rng.choice("xz")  # far from the window, so they only make candidates work
+    window = "x" + "".join(rng.choices(filler, k=100)) + "x" + "".join(rng.choices(filler, k=100)) + "y" + \
+             "".join(rng.choices(filler, k=100)) + "z"
+    at = rng.randrange(n // 2, n - len(window))
+    s[at:at + len(window)] = window
+    s = "".join(s)
+    return [(s, "xxyz", window), (s, "yy", "")]
+
+def run_cases(impl, **options):
+    c = Cases(**options)
+    for i, (s, t, exp) in enumerate(CASES):
+        c.expect(f"case{i}", lambda: impl(s,t), exp, f"{s!r},{t!r}")
+
+    if c.scale and not c.stopped:
+        for name, (s, t, exp) in zip(("scale_window", "scale_no_window"), stress_input()):
+            c.expect(name, lambda: impl(s, t), exp, f"{len(s) >> 20} MB s, t={t!r}",
+                     wrong=f"{len(s) >> 20} MB s, t={t!r}: wrong window", budget=10.0)
+    return c.results
 
 def run_tests(impl):
-    failures = []
-    cases = [
-        ("ADOBECODEBANC", "ABC", "BANC"),
-        ("a", "a", "a"),
-        ("a", "aa", ""),
-        ("ab", "b", "b"),
-        ("ab", "A", ""),
-        ("", "a", ""),
-        ("aa", "aa", "aa"),
-    ]
-    for s,t,exp in cases:
-        try:
-            got = impl(s,t)
-            if got != exp:
-                failures.append(f"{s!r},{t!r} -> {got!r}, expected {exp!r}")
-        except Exception as e:
-            failures.append(f"{s!r},{t!r} raised {e.__class__.__name__}: {e}")
-    return (len(failures) == 0, failures)
+    return summarize(run_cases(impl))
@@ -1,26 +1,45 @@
+import os, sys, functools, random, string
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # harness.py sits next to the suites
+from harness import Cases, summarize
 
-def run_tests(impl):
-    failures = []
+CASES = [
+    # Happy paths
+    ('/a//b/./c/../', '/a/b/'),
+    ('a/b/../../c', 'c'),
+    ('../../x', '../../x'),
+    ('/', '/'),
+    ('/././', '/'),
+    ('/../', '/'),
+    ('a//b////c', 'a/b/c'),
+    ('a/./b/./c/', 'a/b/c/'),
+    ('a/../../..', '../../'),
+    ('a/../..', '../'),
+    ('', ''),
+]
 
-    def check(inp, expected):
-        try:
-            got = impl(inp)
-            if got != expected:
-                failures.append(f"{inp!r} -> {got!r}, expected {expected!r}")
-        except Exception as e:
-            failures.append(f"{inp!r} raised {e.__class__.__name__}: {e}")
+@functools.lru_cache(maxsize=None)
+def stress_input(seed: int = 0, n: int = 10**6):
+    """Two absolute paths of about n segments: names mixed with '.', '' and 'name/..' noise, then n/2 levels
+    down and back up."""
+    rng = random.Random(seed)
+    names = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 8))) for _ in range(n // 2)]
+    parts = [""]
+    for name, noise in zip(names, rng.choices(["", "", ".", "", "junk/.."], k=len(names))):
+        parts += [noise, name]
+    noisy = ("/".join(parts), "/" + "/".join(names))
+    deep = ("/" + "d/" * (n // 2) + "../" * (n // 2) + "x", "/x")
+    return [noisy, deep]
 
-    # Happy paths
-    check('/a//b/./c/../', '/a/b/')
-    check('a/b/../../c', 'c')
-    check('../../x', '../../x')
-    check('/', '/')
-    check('/././', '/')
-    check('/../', '/')
-    check('a//b////c', 'a/b/c')
-    check('a/./b/./c/', 'a/b/c/')
-    check('a/../../..', '../../')
-    check('a/../..', '../')
-    check('', '')
+def run_cases(impl, **options):
+    c = Cases(**options)
+    for i, (inp, expected) in enumerate(CASES):
+        c.expect(f"case{i}", lambda: impl(inp), expected, repr(inp))
 
-    return (len(failures) == 0, failures)
+    if c.scale and not c.stopped:
+        for name, (path, expected) in zip(("scale_noisy", "scale_deep"), stress_input()):
+            c.expect(name, lambda: impl(path), expected, f"{len(path) >> 20} MB {name[6:]} path",
+                     wrong=f"{len(path) >> 20} MB {name[6:]} path normalized wrong", budget=10.0)
+    return c.results
+
+def run_tests(impl):
+    return summarize(run_cases(impl))
@@ -1,19 +1,42 @@
+import os, sys, functools, random, string
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # harness.py sits next to the suites
+from harness import Cases, summarize
+
+CASES = [
+    ('a,b,c', ['a','b','c']),
+    ('a,"b,c",d', ['a','b,c','d']),
+    ('"a""b",c', ['a"b','c']),
+    ('', ['']),
+    ('"","",', ['', '', '']),
+    ('" spaced ",x', [' spaced ', 'x'])
+]
+
+@functools.lru_cache(maxsize=None)
+def stress_input(seed: int = 0, n: int = 5 * 10**5):
+    """A line of n fields, a few MB: plain, empty, and quoted ones holding commas and doubled quotes."""
+    rng = random.Random(seed)
+    fields, cells = [], []
+    for kind in rng.choices(["plain", "plain", "empty", "comma", "quote"], k=n):
+        if kind == "empty":
+            field = ""
+        else:
+            field = "".join(rng.choices(string.ascii_letters + " ", k=rng.randint(1, 8)))
+            if kind != "plain":
+                field = field[:2] + ("," if kind == "comma" else '"') + field[2:]
+        fields.append(field)
+        cells.append('"' + field.replace('"', '""') + '"' if kind in ("comma", "quote") else field)
+    return ",".join(cells), fields
+
+def run_cases(impl, **options):
+    c = Cases(**options)
+    for i, (line, exp) in enumerate(CASES):
+        c.expect(f"case{i}", lambda: impl(line), exp, repr(line))
+
+    if c.scale and not c.stopped:
+        line, expected = stress_input()
+        c.expect("scale", lambda: impl(line), expected, f"{len(line) >> 20} MB line of {len(expected)} fields",
+                 wrong=f"{len(line) >> 20} MB line of {len(expected)} fields parsed wrong", budget=10.0)
+    return c.results
 
 def run_tests(impl):
-    failures = []
-    cases = [
-        ('a,b,c', ['a','b','c']),
-        ('a,"b,c",d', ['a','b,c','d']),
-        ('"a""b",c', ['a"b','c']),
-        ('', ['']),
-        ('"","",', ['', '', '']),
-        ('" spaced ",x', [' spaced ', 'x'])
-    ]
-    for line, exp in cases:
-        try:
-            got = impl(line)
-            if got != exp:
-                failures.append(f"{line!r} -> {got!r}, expected {exp!r}")
-        except Exception as e:
-            failures.append(f"{line!r} raised {e.__class__.__name__}: {e}")
-    return (len(failures) == 0, failures)
+    return summarize(run_cases(impl))
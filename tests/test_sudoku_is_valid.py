@@ -1,36 +1,67 @@
+import os, sys, functools, random
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # harness.py sits next to the suites
+from harness import Cases, summarize
 
-def run_tests(impl):
-    failures = []
-    valid = [
-        ["5","3",".",".","7",".",".",".","."],
-        ["6",".",".","1","9","5",".",".","."],
-        [".","9","8",".",".",".",".","6","."],
-        ["8",".",".",".","6",".",".",".","3"],
-        ["4",".",".","8",".","3",".",".","1"],
-        ["7",".",".",".","2",".",".",".","6"],
-        [".","6",".",".",".",".","2","8","."],
-        [".",".",".","4","1","9",".",".","5"],
-        [".",".",".",".","8",".",".","7","9"],
-    ]
-    invalid_row = [row[:] for row in valid]
-    invalid_row[0][0] = "8"
-    invalid_row[0][1] = "8"
-    invalid_box = [row[:] for row in valid]
-    invalid_box[0][0] = "9"
-    invalid_col = [row[:] for row in valid]
-    invalid_col[1][0] = "5"
+VALID = [
+    ["5","3",".",".","7",".",".",".","."],
+    ["6",".",".","1","9","5",".",".","."],
+    [".","9","8",".",".",".",".","6","."],
+    ["8",".",".",".","6",".",".",".","3"],
+    ["4",".",".","8",".","3",".",".","1"],
+    ["7",".",".",".","2",".",".",".","6"],
+    [".","6",".",".",".",".","2","8","."],
+    [".",".",".","4","1","9",".",".","5"],
+    [".",".",".",".","8",".",".","7","9"],
+]
+
+def _with(board, *cells):
+    board = [row[:] for row in board]
+    for r, c, v in cells:
+        board[r][c] = v
+    return board
+
+INVALID = [
+    ("invalid_row", _with(VALID, (0, 0, "8"), (0, 1, "8"))),
+    ("invalid_box", _with(VALID, (0, 0, "9"))),
+    ("invalid_col", _with(VALID, (1, 0, "5"))),
+]
 
-    try:
-        if not impl(valid):
-            failures.append("valid board flagged invalid")
-    except Exception as e:
-        failures.append(f"valid board raised {e.__class__.__name__}: {e}")
+@functools.lru_cache(maxsize=None)
+def stress_input(seed: int = 0, n: int = 2 * 10**4):
+    """n boards, a third each complete, partly blanked, and with one duplicated digit; the board size is fixed,
+    so scale here means call volume."""
+    rng = random.Random(seed)
+    boards, expected = [], []
+    for i in range(n):
+        digits = rng.sample("123456789", 9)
+        rows = [3 * band + r for band in rng.sample(range(3), 3) for r in rng.sample(range(3), 3)]
+        cols = [3 * stack + c for stack in rng.sample(range(3), 3) for c in rng.sample(range(3), 3)]
+        board = [[digits[(3 * (r % 3) + r // 3 + c) % 9] for c in cols] for r in rows]
+        if i % 3 == 1:
+            for cell in rng.sample(range(81), 40):
+                board[cell // 9][cell % 9] = "."
+        elif i % 3 == 2:
+            r, c, other = rng.randrange(9), rng.randrange(9), rng.randrange(9)
+            board[r][c] = board[r][other if other != c else (c + 1) % 9]
+        boards.append(board)
+        expected.append(i % 3 != 2)
+    return boards, expected
 
-    for name, board in [("invalid_row", invalid_row), ("invalid_box", invalid_box), ("invalid_col", invalid_col)]:
-        try:
-            if impl(board):
-                failures.append(f"{name} board flagged valid")
-        except Exception as e:
-            failures.append(f"{name} board raised {e.__class__.__name__}: {e}")
+def run_cases(impl, **options):
+    c = Cases(**options)
+    # every call gets its own copy, so a candidate that writes to the board can't corrupt the tables
+    c.expect("valid", lambda: impl(_with(VALID)), True, "valid board",
+             ok=bool, wrong="valid board flagged invalid")
+    for name, board in INVALID:
+        c.expect(name, lambda: impl(_with(board)), False, f"{name} board",
+                 ok=lambda got: not got, wrong=f"{name} board flagged valid")
 
-    return (len(failures) == 0, failures)
+    if c.scale and not c.stopped:
+        boards, expected = stress_input()
+        c.expect("scale", lambda: [impl([row[:] for row in b]) for b in boards], expected, f"{len(boards)} boards",
+                 ok=lambda got: [bool(g) for g in got] == expected, wrong=f"wrong verdicts among {len(boards)} boards",
+                 budget=10.0)
+    return c.results
+
+def run_tests(impl):
+    return summarize(run_cases(impl))
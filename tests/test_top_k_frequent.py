@@ -1,30 +1,41 @@
+import os, sys, functools, random
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # harness.py sits next to the suites
+from harness import Cases, summarize
 
-def run_tests(impl):
-    failures = []
+CASES = [
+    ([1,1,1,2,2,3], 2, [1,2]),
+    ([4,4,4,5,5,6], 1, [4]),
+    ([3,3,2,2,1], 2, [2,3]),  # tie -> smaller first
+    ([1], 1, [1]),
+]
 
-    def check(nums, k, expected):
-        try:
-            got = impl(nums, k)
-            if got != expected:
-                failures.append(f"{nums!r}, k={k} -> {got!r}, expected {expected!r}")
-        except Exception as e:
-            failures.append(f"{nums!r}, k={k} raised {e.__class__.__name__}: {e}")
+@functools.lru_cache(maxsize=None)
+def stress_input(seed: int = 0, n: int = 10**6, k: int = 10):
+    """n shuffled ints whose k most frequent values are planted, in pairs of equal count (the tie-break matters)."""
+    rng = random.Random(seed)
+    values = rng.sample(range(-10**9, 10**9), n // 20)
+    top, rest = values[:k], values[k:]
+    counts = [2000 - 100 * (i // 2) for i in range(k)]
+    nums = [v for v, count in zip(top, counts) for _ in range(count)]
+    nums += rng.choices(rest, k=n - len(nums))  # about 20 each, far below the planted counts
+    rng.shuffle(nums)
+    return (nums, k), sorted(top, key=lambda v: (-counts[top.index(v)], v))
 
-    check([1,1,1,2,2,3], 2, [1,2])
-    check([4,4,4,5,5,6], 1, [4])
-    check([3,3,2,2,1], 2, [2,3])  # tie -> smaller first
-    check([1], 1, [1])
+def run_cases(impl, **options):
+    c = Cases(**options)
+    for i, (nums, k, expected) in enumerate(CASES):
+        c.expect(f"case{i}", lambda: impl(list(nums), k), expected, f"{nums!r}, k={k}")
 
     # Errors
-    try:
-        impl([1,2,3], 0)
-        failures.append("Expected ValueError for k=0")
-    except ValueError:
-        pass
-    try:
-        impl([1,2,3], 4)
-        failures.append("Expected ValueError for k>unique")
-    except ValueError:
-        pass
+    c.expect_raises("k_zero", lambda: impl([1,2,3], 0), ValueError, "k=0", missing="Expected ValueError for k=0")
+    c.expect_raises("k_above_unique", lambda: impl([1,2,3], 4), ValueError, "k>unique",
+                    missing="Expected ValueError for k>unique")
+
+    if c.scale and not c.stopped:
+        (nums, k), expected = stress_input()
+        c.expect("scale", lambda: impl(list(nums), k), expected, f"{len(nums)} ints, k={k}",
+                 wrong=f"wrong top {k} of {len(nums)} ints", budget=10.0)
+    return c.results
 
-    return (len(failures) == 0, failures)
+def run_tests(impl):
+    return summarize(run_cases(impl))